@@ -0,0 +1,184 @@
+# one pooled HTTP transport shared by every API manager: keep-alive, retries with jitter, per-host limits
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import metrics, span
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the wait before retry n is uniform in
+    [0, min(max_backoff, backoff * 2**n)], so clients that failed together
+    don't retry together. A Retry-After header, when sent, is honoured instead.
+    """
+    attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 8.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def retry_after(response) -> float | None:
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class HttpTransport:
+    """
+    A requests.Session whose connection pools stay open between calls, so a
+    request to a host already talked to skips the TCP and TLS handshakes. Each
+    host gets at most `max_per_host` requests in flight (overridable per host),
+    and the pool keeps that many connections alive for it. Requests that fail
+    with a connection error, a timeout or a retryable status are retried by
+    `retry`. `request` is the blocking interface; `arequest` the asyncio one.
+    The OpenAI SDK sends through its own connection pool, not this session; it
+    uses `host_slot`, `retry` and `timeout` from here.
+
+    Settings:
+        http_max_per_host   concurrent requests and pooled connections per host (default 6)
+        http_host_limits    {host: limit} overrides, e.g. for a rate-limited endpoint
+        http_retries        attempts per request, including the first (default 3)
+        http_backoff        base backoff in seconds (default 0.5), capped at http_backoff_max (8)
+        http_connect_timeout / http_read_timeout   seconds (default 5 / 60)
+    """
+    def __init__(self, config=None, logger: logging.Logger | None = None):
+        get = config.get if config is not None else (lambda key, default=None: default)
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_per_host = get('http_max_per_host', 6)
+        self.host_limits = dict(get('http_host_limits', {}) or {})
+        self.retry = RetryPolicy(get('http_retries', 3), get('http_backoff', 0.5), get('http_backoff_max', 8.0))
+        self.timeout = (get('http_connect_timeout', 5.0), get('http_read_timeout', 60.0))
+
+        self.session = requests.Session()
+        for prefix in ('https://', 'http://'):
+            # retries are ours, so they get jitter and are counted
+            self.session.mount(prefix, HTTPAdapter(pool_connections=16, pool_maxsize=max(self.max_per_host, 1),
+                                                   max_retries=0))
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        # asyncio semaphores belong to one event loop, so each loop gets its own per host
+        self._async_slots = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc
+
+    def limit_for(self, host: str) -> int:
+        return self.host_limits.get(host, self.max_per_host)
+
+    def set_host_limit(self, host: str, limit: int):
+        """Changes one host's concurrency limit; takes effect for requests not yet waiting."""
+        with self._lock:
+            self.host_limits[host] = limit
+            self._host_slots.pop(host, None)
+            for slots in self._async_slots.values():
+                slots.pop(host, None)
+
+    @contextmanager
+    def host_slot(self, url: str):
+        """Holds one of the host's concurrent-request slots, for clients that do their own I/O."""
+        host = self.host(url)
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.limit_for(host))
+        with slot:
+            yield
+
+    def request(self, method: str, url: str, retries: int | None = None, **kwargs) -> requests.Response:
+        """
+        Sends the request and returns the response, retrying transient failures.
+        A final retryable status is returned as is, for the caller's raise_for_status;
+        a final connection error or timeout is raised.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = max(self.retry.attempts if retries is None else retries + 1, 1)
+        with self.host_slot(url):
+            for attempt in range(attempts):
+                response = None
+                try:
+                    with span('http.request'):
+                        response = self.session.request(method, url, **kwargs)
+                    metrics.inc('http.requests')
+                    if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                        return response
+                    reason = f"HTTP {response.status_code}"
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    metrics.inc('http.errors')
+                    if attempt == attempts - 1:
+                        raise
+                    reason = str(e)
+                delay = self.retry.delay(attempt, retry_after(response))
+                self.logger.warning(f"{method} {self.host(url)} failed ({reason}); "
+                                    f"retry {attempt + 1}/{attempts - 1} in {delay:.1f}s.")
+                metrics.inc('http.retries')
+                if response is not None:
+                    response.close()
+                time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        The asyncio interface: waits for a host slot without blocking the loop,
+        then runs the pooled request on a worker thread.
+        """
+        host = self.host(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.setdefault(loop, {})
+            slot = slots.get(host)
+            if slot is None:
+                slot = slots[host] = asyncio.Semaphore(self.limit_for(host))
+        async with slot:
+            return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest('GET', url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest('POST', url, **kwargs)
+
+    def connections_opened(self) -> int:
+        """Connections (and so handshakes) made so far, over every pooled host."""
+        total = 0
+        for adapter in self.session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total += pool.num_connections
+        return total
+
+    def close(self):
+        self.session.close()
@@ -1,22 +1,36 @@
 # Manages all intereactions with the OpenAI chat Completion API
 
 import time
-import openai
-from openai import AuthenticationError, APIConnectionError
+
+from api.http_transport import RETRY_STATUSES, HttpTransport, retry_after
+from api.prompts import DISTRACTION_SYSTEM_PROMPT
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
 
 class OpenAIAPIManager:
-    def __init__(self, logger):
+    # the SDK keeps its own keep-alive pool per client, outside the shared transport's session;
+    # timeouts, retries and the per-host limit still come from the transport so every API behaves alike
+    def __init__(self, logger, transport: HttpTransport | None = None):
         self.logger = logger
+        self.transport = transport or HttpTransport(logger=logger)
         self.client = None
+        self.base_url = DEFAULT_BASE_URL
 
-    def configure(self, api_key: str) -> bool:
-        # Configures the OpenAI client and verifies the API key
+    def configure(self, api_key: str, base_url: str | None = None) -> bool:
+        # Configures the OpenAI client and verifies the API key. base_url targets OpenAI-compatible servers.
+        # openai is imported here rather than at module load: it costs most of a second at startup
+        import openai
         if not api_key or not api_key.startswith("sk-"):
             self.logger.warning("OpenAI API key is missing or invalid.")
             self.client = None
             return False
         try:
-            self.client = openai.OpenAI(api_key=api_key)
+            # one client for the session, so its connections are reused; retries are done here
+            connect_timeout, read_timeout = self.transport.timeout
+            self.client = openai.OpenAI(api_key=api_key, base_url=base_url or None,
+                                        timeout=openai.Timeout(read_timeout, connect=connect_timeout),
+                                        max_retries=0)
+            self.base_url = base_url or DEFAULT_BASE_URL
             self.client.models.list() # Testing the connection
             self.logger.info("OpenAI API client configured and connection successful.")
             return True
@@ -37,6 +51,7 @@ class OpenAIAPIManager:
         if not self.client:
             self.logger.warning("Cannot test connection, API client not configured.")
             return False
+        from openai import AuthenticationError, APIConnectionError
         try:
             self.client.models.list()
             self.logger.info("OpenAI API connection successful.")
@@ -52,44 +67,106 @@ class OpenAIAPIManager:
             return False
 
 
-    def generate_with_retry(self, prompt: str, max_retries=3) -> str | None:
+    @staticmethod
+    def _response_format(schema: dict | None) -> dict:
+        # a schema switches on structured outputs, so the reply is guaranteed to match it
+        if schema is None:
+            return {"type": "json_object"}
+        return {"type": "json_schema",
+                "json_schema": {"name": schema.get("title", "response"), "schema": schema, "strict": True}}
+
+    def generate_with_retry(self, prompt: str, max_retries=3, system_prompt: str = DISTRACTION_SYSTEM_PROMPT,
+                            schema: dict | None = None) -> str | None:
         # Generate a response from teh AI, with retries for transient errors.
         if not self.is_available():
             self.logger.warning("OpenAI client is not available. Cannot generate content.")
             return None
-
-        system_message = (
-            "You are a productivity assistant. Your task is to analyze text from the user's screen"
-            "and identify phrases that are distracting relative to a specific focus topic ."
-            "You must respond ONLY with a valid JSON object containg a single key 'distractions' which is a list of strings. "
-            "Example: {\"distractions\": [\"distracting phrase 1\", \"unrelated news headline\"}. "
-            "If nothing is distracting, respond with {\"distractions\":[]}."
-        )
+        import openai
 
         for attempt in range(max_retries):
             try:
-                response= self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": system_message},
-                        {"role": "user","content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.2,
-                    timeout=25
-                )
+                with self.transport.host_slot(self.base_url):
+                    response= self.client.chat.completions.create(
+                        model="gpt-4o",
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user","content": prompt}
+                        ],
+                        response_format=self._response_format(schema),
+                        temperature=0.2
+                    )
                 return response.choices[0].message.content
             except (openai.APITimeoutError, openai.APIConnectionError) as e:
                 self.logger.warning(f"OpenAI API timeout/connection error (attempt {attempt+1}/{max_retries}):{e}")
-                time.sleep(2 ** attempt)  # Exponential backoff
+                self._backoff(attempt, max_retries)
 
             except openai.APIStatusError as e:
-                self.logger.error(f"OpenAI API status error: {e.status_code} - {e.response}")
-                return None
+                if e.status_code not in RETRY_STATUSES:
+                    self.logger.error(f"OpenAI API status error: {e.status_code} - {e.response}")
+                    return None
+                self.logger.warning(f"OpenAI API returned {e.status_code} (attempt {attempt+1}/{max_retries})")
+                self._backoff(attempt, max_retries, e.response)
 
             except Exception as e:
                 self.logger.error(f"An unexpected error occured during API call (attempt {attempt + 1}): {e}")
-                time.sleep(2)
+                self._backoff(attempt, max_retries)
 
-            self.logger.error("OpenAI API call failed after multiple retries.")
-            return None
+        self.logger.error("OpenAI API call failed after multiple retries.")
+        return None
+
+    def _backoff(self, attempt: int, max_retries: int, response=None):
+        # jittered exponential backoff from the shared retry policy; no wait after the last attempt
+        if attempt < max_retries - 1:
+            time.sleep(self.transport.retry.delay(attempt, retry_after(response)))
+
+    def stream_with_retry(self, prompt: str, max_retries=3, system_prompt: str = DISTRACTION_SYSTEM_PROMPT,
+                          schema: dict | None = None):
+        """
+        Yields the response text in chunks as the model produces it. Retries only
+        happen before the first chunk; closing the generator aborts the request.
+        """
+        if not self.is_available():
+            self.logger.warning("OpenAI client is not available. Cannot generate content.")
+            return
+        import openai
+
+        for attempt in range(max_retries):
+            # the host slot is held until the stream is read or closed
+            with self.transport.host_slot(self.base_url):
+                try:
+                    stream = self.client.chat.completions.create(
+                        model="gpt-4o",
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user","content": prompt}
+                        ],
+                        response_format=self._response_format(schema),
+                        temperature=0.2,
+                        stream=True
+                    )
+                except (openai.APITimeoutError, openai.APIConnectionError) as e:
+                    self.logger.warning(f"OpenAI API timeout/connection error (attempt {attempt+1}/{max_retries}):{e}")
+                    stream, response = None, None
+                except openai.APIStatusError as e:
+                    if e.status_code not in RETRY_STATUSES:
+                        self.logger.error(f"OpenAI API status error: {e.status_code} - {e.response}")
+                        return
+                    self.logger.warning(f"OpenAI API returned {e.status_code} (attempt {attempt+1}/{max_retries})")
+                    stream, response = None, e.response
+                except Exception as e:
+                    self.logger.error(f"An unexpected error occured during API call (attempt {attempt + 1}): {e}")
+                    stream, response = None, None
+
+                if stream is not None:
+                    try:
+                        for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    except (openai.APITimeoutError, openai.APIConnectionError) as e:
+                        self.logger.warning(f"OpenAI stream interrupted: {e}")
+                    finally:
+                        stream.close()
+                    return
+            self._backoff(attempt, max_retries, response)
+
+        self.logger.error("OpenAI API stream failed after multiple retries.")
@@ -0,0 +1,294 @@
+"""
+Routes text analysis requests between the configured AI backends (OpenAI and
+the Worker endpoint). Each backend keeps a rolling window of latencies and
+outcomes; requests go to the fastest healthy one, and with hedging enabled a
+request that hasn't answered within that backend's p90 is also sent to the
+next one. Whichever answers first wins.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from api.prompts import DISTRACTION_SYSTEM_PROMPT
+
+OPENAI = "OpenAI"
+WORKER = "Worker Endpoint"
+
+_END = object()
+
+
+class WorkerTextProvider:
+    """Adapts WorkerTextAPIManager to the prompt-in, text-out interface of OpenAIAPIManager."""
+    def __init__(self, worker_api_manager, get_url):
+        self.worker = worker_api_manager
+        self.get_url = get_url
+
+    def is_available(self) -> bool:
+        url = self.get_url()
+        return bool(url) and url.startswith("http")
+
+    def generate_with_retry(self, prompt: str, max_retries=3, system_prompt: str = DISTRACTION_SYSTEM_PROMPT,
+                            schema: dict | None = None) -> str | None:
+        # the worker has no structured outputs; callers validate the reply themselves
+        result = self.worker.generate_with_retry(prompt, system_prompt, self.get_url(), max_retries)
+        # the worker hands back parsed JSON; callers expect the raw response text
+        return json.dumps(result) if result is not None else None
+
+
+class ProviderStats:
+    """
+    Rolling latency and outcome window for one backend. Latency is the time to
+    the first output: the first streamed chunk, or the whole answer otherwise.
+    A backend that fails repeatedly is benched for `cooldown` seconds and then
+    gets one request to prove itself again.
+    """
+    def __init__(self, window: int = 50, outcome_window: int = 20, max_error_rate: float = 0.5,
+                 failure_threshold: int = 2, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=outcome_window)
+        self.max_error_rate = max_error_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float | None, ok: bool):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold or self._error_rate() > self.max_error_rate:
+                self.down_until = time.monotonic() + self.cooldown
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def _error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def snapshot(self) -> dict:
+        return {
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'error_rate': self.error_rate,
+            'healthy': self.healthy,
+            'samples': len(self.latencies),
+        }
+
+
+class ProviderRouter:
+    """
+    Presents several backends as one API manager (`is_available`,
+    `generate_with_retry`, `stream_with_retry`), so the monitor doesn't know
+    which one answered. Keyword options such as `system_prompt` and `schema`
+    are passed through to whichever backend runs the request.
+
+    Settings read per request:
+        hedge_requests        race a second backend when the first is slow (default True)
+        hedge_default_delay   hedge delay before a backend has any latency samples (default 5.0)
+        hedge_min_delay       lower bound on the p90-based hedge delay (default 0.5)
+
+    `on_hedge(prompt, options)`, if set, is called for every backup request,
+    so budgets can count it.
+    """
+    # the preferred backend keeps the lead unless another is this much faster
+    PREFERENCE_MARGIN = 1.25
+
+    def __init__(self, config, providers: dict, logger, preferred: str | None = None):
+        self.config = config
+        self.providers = providers
+        self.logger = logger
+        self.stats = {name: ProviderStats() for name in providers}
+        self.preferred = preferred if preferred in providers else next(iter(providers))
+        self.on_hedge = None
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(providers), thread_name_prefix="provider")
+
+    def set_preferred(self, name: str):
+        if name in self.providers and name != self.preferred:
+            self.preferred = name
+            self.logger.info(f"Preferred AI provider set to '{name}'.")
+
+    def is_available(self) -> bool:
+        return any(provider.is_available() for provider in self.providers.values())
+
+    def ranked(self) -> list[str]:
+        """Available backends, healthy ones first, fastest first; unmeasured ones go by preference."""
+        def key(name):
+            p50 = self.stats[name].percentile(0.5)
+            if p50 is None:
+                score = 0.0 if name == self.preferred else float('inf')
+            else:
+                score = p50 / self.PREFERENCE_MARGIN if name == self.preferred else p50
+            return (not self.stats[name].healthy, score, name != self.preferred)
+
+        return sorted((name for name, p in self.providers.items() if p.is_available()), key=key)
+
+    def hedge_delay(self, name: str) -> float:
+        p90 = self.stats[name].percentile(0.9)
+        if p90 is None:
+            return self.config.get('hedge_default_delay', 5.0)
+        return max(p90, self.config.get('hedge_min_delay', 0.5))
+
+    def _plan(self) -> tuple[str | None, str | None, float | None]:
+        # picks the primary, the backup, and how long the primary gets before the backup joins
+        order = self.ranked()
+        if not order:
+            self.logger.warning("No AI provider is available.")
+            return None, None, None
+        primary = order[0]
+        backup = order[1] if len(order) > 1 else None
+        delay = self.hedge_delay(primary) if backup and self.config.get('hedge_requests', True) else None
+        return primary, backup, delay
+
+    def generate_with_retry(self, prompt: str, max_retries=3, **options) -> str | None:
+        primary, backup, delay = self._plan()
+        if primary is None:
+            return None
+
+        pending = {self._executor.submit(self._call, primary, prompt, max_retries, options)}
+        hedged = backup is None
+        while pending:
+            done, pending = wait(pending, timeout=None if hedged else delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    return result
+            if not hedged:
+                # the primary is slow or has failed: the backup races it or replaces it
+                hedged = True
+                self._log_hedge(primary, backup, delay, failed=bool(done))
+                self._count_hedge(prompt, options)
+                pending.add(self._executor.submit(self._call, backup, prompt, max_retries, options))
+        return None
+
+    def _call(self, name: str, prompt: str, max_retries: int, options: dict) -> str | None:
+        start = time.monotonic()
+        result = None
+        try:
+            result = self.providers[name].generate_with_retry(prompt, max_retries, **options)
+        except Exception as e:
+            self.logger.error(f"AI provider '{name}' raised an error: {e}")
+        finally:
+            self.stats[name].record(time.monotonic() - start, result is not None)
+        return result
+
+    def stream_with_retry(self, prompt: str, max_retries=3, **options):
+        """
+        Yields response text from whichever backend produces output first.
+        Backends without streaming deliver their whole answer as one chunk.
+        Closing the generator aborts every request still in flight.
+        """
+        primary, backup, delay = self._plan()
+        if primary is None:
+            return
+
+        events = queue.Queue()
+        cancels = {}
+
+        def launch(name):
+            cancels[name] = threading.Event()
+            self._executor.submit(self._pump, name, prompt, max_retries, options, events, cancels[name])
+
+        launch(primary)
+        deadline = time.monotonic() + delay if delay is not None else None
+        running, winner = 1, None
+        try:
+            while running:
+                timeout = max(deadline - time.monotonic(), 0) if deadline is not None and winner is None else None
+                try:
+                    name, chunk = events.get(timeout=timeout)
+                except queue.Empty:
+                    self._log_hedge(primary, backup, delay, failed=False)
+                    self._count_hedge(prompt, options)
+                    launch(backup)
+                    running, deadline = running + 1, None
+                    continue
+
+                if chunk is _END:
+                    running -= 1
+                    if name == winner:
+                        return
+                    if winner is None and backup and backup not in cancels:
+                        self._log_hedge(primary, backup, delay, failed=True)
+                        self._count_hedge(prompt, options)
+                        launch(backup)
+                        running, deadline = running + 1, None
+                    continue
+
+                if winner is None:
+                    winner = name
+                    for other, cancel in cancels.items():
+                        if other != name:
+                            cancel.set()
+                if name == winner:
+                    yield chunk
+        finally:
+            for cancel in cancels.values():
+                cancel.set()
+
+    def _pump(self, name: str, prompt: str, max_retries: int, options: dict, events: queue.Queue,
+              cancel: threading.Event):
+        # runs one backend for stream_with_retry, forwarding its output until cancelled
+        provider = self.providers[name]
+        start = time.monotonic()
+        first = None
+        try:
+            if hasattr(provider, 'stream_with_retry'):
+                stream = provider.stream_with_retry(prompt, max_retries, **options)
+                try:
+                    for chunk in stream:
+                        if first is None:
+                            first = time.monotonic() - start
+                        if cancel.is_set():
+                            break
+                        events.put((name, chunk))
+                finally:
+                    stream.close()
+            else:
+                text = provider.generate_with_retry(prompt, max_retries, **options)
+                if text is not None:
+                    first = time.monotonic() - start
+                    if not cancel.is_set():
+                        events.put((name, text))
+        except Exception as e:
+            self.logger.error(f"AI provider '{name}' raised an error: {e}")
+        finally:
+            self.stats[name].record(first, first is not None)
+            events.put((name, _END))
+
+    def _log_hedge(self, primary: str, backup: str, delay: float | None, failed: bool):
+        if failed:
+            self.logger.warning(f"AI provider '{primary}' failed; retrying on '{backup}'.")
+        else:
+            self.logger.debug(f"AI provider '{primary}' silent after {delay:.2f}s; hedging with '{backup}'.")
+
+    def _count_hedge(self, prompt: str, options: dict):
+        if self.on_hedge is not None:
+            self.on_hedge(prompt, options)
+
+    def snapshot(self) -> dict:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,14 @@
 import logging
-import time
+import re
 import requests
 import json
 
+from api.http_transport import HttpTransport
+
 class WorkerTextAPIManager:
-    def __init__(self, logger):
+    def __init__(self, logger, transport: HttpTransport | None = None):
         self.logger = logger
+        self.transport = transport or HttpTransport(logger=logger)
 
     def test_connection(self, api_url: str) -> bool:
         """
@@ -23,8 +26,8 @@ class WorkerTextAPIManager:
             }
             headers = {'Content-Type': 'application/json'}
 
-            # Use requests.post() to match the worker's expected method
-            response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+            # a POST to match the worker's expected method; a test isn't retried
+            response = self.transport.post(api_url, headers=headers, json=payload, timeout=15, retries=0)
 
             response.raise_for_status() 
             self.logger.info("Worker API connection successful.")
@@ -51,33 +54,30 @@ class WorkerTextAPIManager:
 
         headers = {'Content-Type': 'application/json'}
 
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(api_url, headers = headers, json=payload, timeout=60)
-                response.raise_for_status()
-
-                data = response.json()
-                # The worker returns a JSON object with a 'response' key containing the AI's text.
-                response_str = data.get('response', '{}')
+        # connection errors, timeouts and 429/5xx answers are retried by the transport
+        try:
+            response = self.transport.post(api_url, headers=headers, json=payload, timeout=60,
+                                           retries=max_retries - 1)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.logger.error(f"Worker API call failed after {max_retries} attempts: {e}")
+            return None
+        try:
+            data = response.json()
+        except ValueError as e:
+            self.logger.warning(f"Worker did not return valid JSON: {e}")
+            return None
 
+        # The worker returns a JSON object with a 'response' key containing the AI's text.
+        response_str = data.get('response', '{}')
+        try:
+            return json.loads(response_str)
+        except json.JSONDecodeError:
+            self.logger.warning(f"Worker did not return valid inner JSON: {response_str}")
+            match = re.search(r'\{.*\}', response_str, re.DOTALL)
+            if match:
                 try:
-                    inner_data = json.loads(response_str)
-                    return inner_data
+                    return json.loads(match.group(0))
                 except json.JSONDecodeError:
-                    self.logger.warning(f"Worker did not return valid inner JSON: {response_str}")
-                    match = re.search(r'\{.*\}', response_str, re.DOTALL)
-                    if match:
-                        try:
-                            return json.loads(match.group(0))
-                        except json.JSONDecodeError:
-                            pass
-                        return None
-                except requests.exceptions.RequestsException as e:
-                    self.logger.warning(f"Worker API request failed (attempt {attempt + 1}/{max_retries}): {e}")
-                    time.sleep(2**attempt) 
-            except Exception as e:
-                    self.logger.error(f"An unexpected error occurred during Worker API call (attempt { attempt + 1}):{e}")
-                    time.sleep(2)
-
-            self.logger.error("Worker API call failed after multiple retries")
+                    pass
             return None
@@ -1,26 +1,31 @@
 import os
 import logging
 import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox
 
-# Third-party
-import keyboard
+# Third-party (keyboard and pystray are imported when the hotkey and tray icon are set up)
 import pytesseract
 from PIL import Image
-from pystray import Icon as pystray_Icon, Menu as pystray_Menu, MenuItem as pystray_MenuItem
 
 # local imports
 from config import ConfigManager
+from api.http_transport import HttpTransport
 from api.openai_manager import OpenAIAPIManager
 from api.worker_api import WorkerTextAPIManager
 from api.vision_api_manager import VisionAPIManager
+from api.provider_router import OPENAI, WORKER, ProviderRouter, WorkerTextProvider
 from core.video_feature_manager import VideoFeatureManager
+from core.engine_process import MonitorEngineProcess
 from core.focus_monitor_manager import FocusMonitorManager 
 from ui.main_window import MainWindow
 from ui.overlay import SmartOverlayManager
 from utils import windows_utils
-from utils.constants import APP_VERSION, UPDATE_CHECK_URL, TESSERACT_CMD_PATH
+from utils.constants import APP_VERSION, UPDATE_CHECK_URL, TESSERACT_CMD_PATH, DIAGNOSTICS_DIR
+from utils.metrics import metrics
+from utils.profiling import MemoryTracer, SamplingProfiler
 
 # configure Tesseract
 try:
@@ -34,22 +39,54 @@ class OptimizedProductivitySuite:
         self.root = root
         self.logger = logging.getLogger(__name__)
         self.config = ConfigManager()
+        metrics.enabled = self.config.get('metrics_enabled', True)
+        self.profiler = SamplingProfiler(self.config.get('profiler_interval', 0.01))
+        self.memory_tracer = MemoryTracer()
 
-        self.api_manager = OpenAIAPIManager(self.logger)
-        self.worker_api_manager = WorkerTextAPIManager(self.logger)
-        self.vision_api_manager = VisionAPIManager(self.logger)
-        self.video_manager = VideoFeatureManager(self.logger, self.root, self.vision_api_manager)
+        # one pooled transport, so connections to each API host are reused across managers;
+        # the OpenAI SDK keeps its own connection pool but takes its timeouts and limits from it
+        self.http = HttpTransport(self.config, self.logger)
+        self.api_manager = OpenAIAPIManager(self.logger, self.http)
+        self.worker_api_manager = WorkerTextAPIManager(self.logger, self.http)
+        self.vision_api_manager = VisionAPIManager(self.logger, self.http)
+        self.video_manager = VideoFeatureManager(self.logger, self.root, self.vision_api_manager, self.config)
         self.overlay_manager = SmartOverlayManager(self.root)
+        self.provider_router = ProviderRouter(
+            self.config,
+            {
+                OPENAI: self.api_manager,
+                WORKER: WorkerTextProvider(
+                    self.worker_api_manager,
+                    lambda: self.config.get('worker_url') or os.getenv("WORKER_API_URL", ""),
+                ),
+            },
+            self.logger,
+            preferred=self.config.get('provider', OPENAI),
+        )
 
         monitor_ui_callbacks = {
             'on_start': self._on_monitoring_started,
             'on_stop': self._on_monitoring_stopped,
+            'on_budget': self._on_budget_update,
             'show_message': self.show_ui_message,
         }
-        self.monitor_manager = FocusMonitorManager(
-            self.root, self.config, self.api_manager, 
-            self.overlay_manager, monitor_ui_callbacks, self.logger
-        )
+        # 'process' (the default) runs the analysis in a child process, so it can't stall or crash the UI;
+        # 'thread' keeps it in this process
+        if self.config.get('monitor_engine', 'process') == 'process':
+            self.monitor_manager = MonitorEngineProcess(
+                self.root, self.config, self.provider_router,
+                self.overlay_manager, monitor_ui_callbacks, self.logger,
+                engine_settings=lambda: {
+                    'api_key': self.ui.settings_tab.api_key_entry.get() or os.getenv("OPENAI_API_KEY"),
+                    'worker_url': self.config.get('worker_url') or os.getenv("WORKER_API_URL", ""),
+                    'provider': self.provider_router.preferred,
+                },
+            )
+        else:
+            self.monitor_manager = FocusMonitorManager(
+                self.root, self.config, self.provider_router,
+                self.overlay_manager, monitor_ui_callbacks, self.logger
+            )
 
         self.tray_icon = None
 
@@ -64,6 +101,12 @@ class OptimizedProductivitySuite:
             'get_version': lambda: APP_VERSION,
             'select_video': self.video_manager.select_video,
             'start_video_processing': self.video_manager.start_video_processing,
+            'get_metrics': metrics.snapshot,
+            'reset_metrics': self.reset_metrics,
+            'export_metrics': self.export_metrics,
+            'toggle_profiler': self.toggle_profiler,
+            'toggle_memory_trace': self.toggle_memory_trace,
+            'memory_snapshot': self.memory_snapshot,
         }
         self.ui = MainWindow(root, app_callbacks)
         self.video_manager.register_ui_tabs(self.ui.video_tab)
@@ -84,6 +127,10 @@ class OptimizedProductivitySuite:
 
         self.ui.load_settings()
 
+        provider_var = self.ui.distraction_tab.provider_var
+        provider_var.trace_add('write', lambda *_: self.provider_router.set_preferred(provider_var.get()))
+        self.provider_router.set_preferred(provider_var.get())
+
         if hasattr(self.ui.settings_tab, 'worker_url_entry') and self.ui.settings_tab.worker_url_entry:
             if not self.ui.settings_tab.worker_url_entry.get():
                 worker_url_from_env = os.getenv("WORKER_API_URL")
@@ -93,21 +140,61 @@ class OptimizedProductivitySuite:
         else:
             self.logger.warning("'worker_url_entry' UI element not found on settings tab.")
 
-        self.configure_api_from_settings()
+        # nothing slow runs before the first window is drawn
+        self.root.after_idle(self._deferred_startup)
+
+    def _deferred_startup(self):
+        """Sets up the hotkey and tray icon, then runs the startup health checks in parallel."""
         self._setup_keyboard_shortcuts()
         self._setup_tray_icon()
-        self.check_for_updates()
-        self._verify_tesseract()
+        self._export_metrics_periodically()
 
-    def _verify_tesseract(self):
-        """Checks for Tesseract installation and logs/shows an error if not found."""
+        # Tk widgets are read here, on the UI thread; the checks themselves only do I/O
+        api_key = self._api_key_from_settings()
+        base_url = self.config.get('openai_base_url')
+        self.ui.connection_label.config(text="API: checking...", style="TLabel")
+        checks = {
+            'openai': lambda: self.api_manager.configure(api_key, base_url=base_url),
+            'tesseract': self._tesseract_version,
+            'updates': self._latest_version,
+        }
+        executor = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix="health-check")
+        for name, check in checks.items():
+            future = executor.submit(check)
+            future.add_done_callback(lambda f, name=name: self.root.after(0, self._on_health_check, name, f))
+        executor.shutdown(wait=False)
+
+    def _on_health_check(self, name, future):
+        """Shows the outcome of one startup check; runs on the UI thread."""
         try:
-            pytesseract.get_tesseract_version()
-            self.logger.info(f"Tesseract version {pytesseract.get_tesseract_version()} found.")
+            result = future.result()
+        except Exception as e:
+            self.logger.warning(f"Startup check '{name}' failed: {e}")
+            result = None
+        if name == 'openai':
+            self._show_api_status(bool(result))
+        elif name == 'tesseract':
+            self._show_tesseract_status(result)
+        elif name == 'updates' and result:
+            self.ui.show_message("info", "Update Available", f"A new version ({result}) is available!")
+
+    def _tesseract_version(self):
+        """Returns the installed Tesseract version, or None if it can't be found."""
+        try:
+            return pytesseract.get_tesseract_version()
         except pytesseract.TesseractNotFoundError:
-            msg = 'Tesseract OCR is not found. Please install it and ensure the path in utils/constants.py is correct.'
-            self.logger.error(msg)
-            self.ui.show_message('error', 'Tesseract Not Found', msg)
+            return None
+
+    def _show_tesseract_status(self, version):
+        """Logs/shows an error if Tesseract was not found."""
+        if version is not None:
+            self.logger.info(f"Tesseract version {version} found.")
+            self.ui.ocr_label.config(text=f"OCR: Tesseract {version}", style="Success.TLabel")
+            return
+        msg = 'Tesseract OCR is not found. Please install it and ensure the path in utils/constants.py is correct.'
+        self.logger.error(msg)
+        self.ui.ocr_label.config(text="OCR: missing", style="Error.TLabel")
+        self.ui.show_message('error', 'Tesseract Not Found', msg)
 
     def _on_monitoring_started(self):
         """Callback function to update UI when monitoring starts."""
@@ -121,14 +208,20 @@ class OptimizedProductivitySuite:
         self.ui.distraction_tab.start_button.config(state='normal')
         self.ui.distraction_tab.stop_button.config(state='disabled')
         self.ui.status_label.config(text="Status: Idle")
+        self.ui.budget_label.config(text="")
+
+    def _on_budget_update(self, text: str):
+        """Shows the monitor's live budget usage in the status bar."""
+        if self.monitor_manager.monitoring:
+            self.ui.budget_label.config(text=text)
         
     def show_ui_message(self, *args):
         """Helper to allow managers to show messages in the UI."""
         self.ui.show_message(*args)
         
 
-    def configure_api_from_settings(self):
-        """Configures the OpenAI API manager from settings or .env file."""
+    def _api_key_from_settings(self):
+        """The OpenAI API key from the settings tab, falling back to the .env file."""
         api_key = self.ui.settings_tab.api_key_entry.get()
         if not api_key:
             api_key = os.getenv("OPENAI_API_KEY")
@@ -136,11 +229,18 @@ class OptimizedProductivitySuite:
                 self.ui.settings_tab.api_key_entry.delete(0, 'end')
                 self.ui.settings_tab.api_key_entry.insert(0, api_key)
                 self.logger.info("Loaded OpenAI API key from .env file.")
+        return api_key
 
-        if self.api_manager.configure(api_key):
+    def _show_api_status(self, online):
+        if online:
             self.ui.connection_label.config(text="API: Online", style="Success.TLabel")
         else:
             self.ui.connection_label.config(text="API: Offline", style="Error.TLabel")
+
+    def configure_api_from_settings(self):
+        """Configures the OpenAI API manager from settings or .env file."""
+        api_key = self._api_key_from_settings()
+        self._show_api_status(self.api_manager.configure(api_key, base_url=self.config.get('openai_base_url')))
     
     def test_openai_api(self):
         """Tests the OpenAI API connection using the key from the UI."""
@@ -190,6 +290,7 @@ class OptimizedProductivitySuite:
     def _setup_keyboard_shortcuts(self):
         """Registers global hotkeys."""
         try:
+            import keyboard
             toggle_func = lambda: self.monitor_manager.toggle_monitoring(
                 get_focus_topic_func=lambda: self.ui.distraction_tab.focus_entry.get().strip()
             )
@@ -200,6 +301,7 @@ class OptimizedProductivitySuite:
 
     def _setup_tray_icon(self):
         """Initializes and runs the system tray icon."""
+        from pystray import Icon as pystray_Icon, Menu as pystray_Menu, MenuItem as pystray_MenuItem
         image = Image.new('RGB', (64, 64), 'black')
         toggle_func = lambda: self.monitor_manager.toggle_monitoring(
                 get_focus_topic_func=lambda: self.ui.distraction_tab.focus_entry.get().strip()
@@ -213,6 +315,64 @@ class OptimizedProductivitySuite:
         self.tray_icon = pystray_Icon("FocusSuite", image, "FocusSuite", menu)
         threading.Thread(target=self.tray_icon.run, daemon=True).start()
 
+    def reset_metrics(self):
+        metrics.reset()
+        # the engine process keeps its own totals
+        if isinstance(self.monitor_manager, MonitorEngineProcess):
+            self.monitor_manager.reset_metrics()
+
+    def export_metrics(self):
+        """Writes the current metrics as JSON and Prometheus text files; returns a status line for the UI."""
+        try:
+            json_path, prom_path = metrics.export(DIAGNOSTICS_DIR, time.strftime('metrics-%Y%m%d-%H%M%S'))
+        except OSError as e:
+            self.logger.error(f"Could not export metrics: {e}")
+            return f"Export failed: {e}"
+        self.logger.info(f"Metrics exported to {json_path} and {prom_path}.")
+        return f"Exported {json_path} and {prom_path}"
+
+    def _export_metrics_periodically(self):
+        # always the same file names, so a Prometheus textfile collector can scrape them
+        interval = self.config.get('metrics_export_interval', 0)
+        if not interval:
+            return
+        try:
+            metrics.export(DIAGNOSTICS_DIR)
+        except OSError as e:
+            self.logger.warning(f"Periodic metrics export failed: {e}")
+        self.root.after(int(interval * 1000), self._export_metrics_periodically)
+
+    def toggle_profiler(self, enabled):
+        """Starts the sampling profiler, or stops it and writes the collapsed stacks."""
+        if enabled:
+            self.profiler.reset()
+            self.profiler.start()
+            self.logger.info("Sampling profiler started.")
+            return "Profiling all threads; untick to write the collapsed stacks."
+        self.profiler.stop()
+        os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+        path = self.profiler.write(os.path.join(DIAGNOSTICS_DIR, time.strftime('profile-%Y%m%d-%H%M%S.folded')))
+        hottest = ", ".join(f"{frame} x{count}" for frame, count in self.profiler.top_functions(5))
+        self.logger.info(f"Profiler wrote {self.profiler.samples} samples to {path}. Hottest frames: {hottest}")
+        return f"{self.profiler.samples} samples written to {path}"
+
+    def toggle_memory_trace(self, enabled):
+        if enabled:
+            self.memory_tracer.start()
+            self.logger.info("Allocation tracing started.")
+            return "Tracing allocations; take snapshots to see where memory goes."
+        self.memory_tracer.stop()
+        self.logger.info("Allocation tracing stopped.")
+        return "Allocation tracing stopped."
+
+    def memory_snapshot(self):
+        if not self.memory_tracer.running:
+            return "Tick 'Trace allocations' first."
+        os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+        path = self.memory_tracer.snapshot(os.path.join(DIAGNOSTICS_DIR, time.strftime('memory-%Y%m%d-%H%M%S.txt')))
+        self.logger.info(f"Memory snapshot written to {path}.")
+        return f"Snapshot written to {path}"
+
     def hide_to_tray(self):
         """Hides the main window."""
         self.root.withdraw()
@@ -225,25 +385,25 @@ class OptimizedProductivitySuite:
     def quit_app(self):
         """Shuts down the application cleanly."""
         self.logger.info("Quit command received. Shutting down.")
-        self.monitor_manager.stop_monitoring()
+        self.monitor_manager.shutdown()
+        self.provider_router.shutdown()
+        self.profiler.stop()
+        self.http.close()
         if self.tray_icon:
             self.tray_icon.stop()
         self.root.destroy()
         self.root.quit()
 
-    def check_for_updates(self):
-        """Checks for new application versions in a background thread."""
-        def run_check():
-            try:
-                response = requests.get(UPDATE_CHECK_URL, timeout=5)
-                response.raise_for_status()
-                latest_version = response.text.strip()
-                if latest_version > APP_VERSION:
-                    self.logger.info(f"New version available: {latest_version}")
-                    self.root.after(0, self.ui.show_message, "info", "Update Available", f"A new version ({latest_version}) is available!")
-                else:
-                    self.logger.info("Application is up to date.")
-            except requests.RequestException as e:
-                self.logger.warning(f"Could not check for updates: {e}")
-        
-        threading.Thread(target=run_check, daemon=True).start()
\ No newline at end of file
+    def _latest_version(self):
+        """Returns the newer version available, or None if up to date or the check failed."""
+        try:
+            response = self.http.get(UPDATE_CHECK_URL, timeout=5, retries=0)
+            response.raise_for_status()
+            latest_version = response.text.strip()
+            if latest_version > APP_VERSION:
+                self.logger.info(f"New version available: {latest_version}")
+                return latest_version
+            self.logger.info("Application is up to date.")
+        except requests.RequestException as e:
+            self.logger.warning(f"Could not check for updates: {e}")
+        return None
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Per-frame capture cost of each available screen-capture backend.
+
+Run from the FocusSuite directory (under Xvfb on headless Linux, e.g.
+`xvfb-run -s "-screen 0 1920x1080x24" python -m benchmarks.bench_capture`):
+    python -m benchmarks.bench_capture --frames 50
+    python -m benchmarks.bench_capture --replay path/to/recording
+"""
+
+import argparse
+import time
+
+from utils.capture_backends import PILCaptureBackend, ReplayCaptureBackend, X11CaptureBackend
+
+
+def bench(backend, frames: int):
+    window = backend.get_active_window()
+    if window is None:
+        print(f"  {backend.name:<7} no active window, skipped")
+        return
+    bbox = window.bbox
+    backend.grab(bbox)  # warm-up: lazily opened handles and first decode
+    backend.frames_grabbed = 0
+    backend.grab_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(frames):
+        if isinstance(backend, ReplayCaptureBackend):
+            window = backend.get_active_window()
+            if window is None:
+                break
+            bbox = window.bbox
+        image = backend.grab(bbox)
+    wall = time.perf_counter() - start
+    megapixels = image.width * image.height / 1e6
+    print(f"  {backend.name:<7} {backend.mean_grab_ms:8.2f} ms/frame  {image.width}x{image.height}  "
+          f"{megapixels * backend.frames_grabbed / wall:8.1f} MP/s  ({backend.frames_grabbed} frames)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--replay", help="directory with a recorded frame sequence")
+    args = parser.parse_args()
+
+    factories = [("x11", X11CaptureBackend), ("pil", PILCaptureBackend)]
+    if args.replay:
+        factories.append(("replay", lambda: ReplayCaptureBackend(args.replay, loop=True)))
+
+    print("capture cost per frame")
+    for name, factory in factories:
+        try:
+            backend = factory()
+        except Exception as e:
+            print(f"  {name:<7} unavailable: {e}")
+            continue
+        try:
+            bench(backend, args.frames)
+        except Exception as e:
+            print(f"  {name:<7} failed: {e}")
+        finally:
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Per-frame cost of the change-detection cascade versus the previous full-map SSIM.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.bench_change_detection --frames 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from skimage.metrics import structural_similarity as ssim
+
+from core.change_detection import ChangeDetector
+
+
+def make_sequence(n_frames: int, seed: int = 0) -> np.ndarray:
+    """Synthetic 256x144 screen thumbnails: long static runs, small edits, scrolls and cuts."""
+    rng = np.random.default_rng(seed)
+    frames = np.empty((n_frames, 144, 256), dtype=np.uint8)
+    page = rng.integers(0, 256, size=(600, 256), dtype=np.uint8)
+    offset = 0
+    for i in range(n_frames):
+        event = rng.random()
+        if event < 0.02:
+            page = rng.integers(0, 256, size=(600, 256), dtype=np.uint8)
+            offset = 0
+        elif event < 0.06:
+            offset = (offset + int(rng.integers(4, 30))) % (600 - 144)
+        elif event < 0.10:
+            y, x = rng.integers(0, 590), rng.integers(0, 226)
+            page[y:y + 8, x:x + 30] = rng.integers(0, 256, size=(8, 30), dtype=np.uint8)
+        frame = page[offset:offset + 144].copy()
+        noise = rng.random(frame.shape) < 0.002
+        frame[noise] ^= 0x08
+        frames[i] = frame
+    return frames
+
+
+def bench_legacy(frames, threshold):
+    decisions = []
+    start = time.perf_counter()
+    last = frames[0]
+    for frame in frames[1:]:
+        score, _ = ssim(last, frame, full=True)
+        changed = score <= threshold
+        decisions.append(changed)
+        if changed:
+            last = frame
+    return time.perf_counter() - start, decisions
+
+
+def bench_cascade(frames, detector):
+    decisions = []
+    metrics = {}
+    start = time.perf_counter()
+    last = frames[0]
+    for frame in frames[1:]:
+        result = detector.compare(last, frame)
+        metrics[result.metric] = metrics.get(result.metric, 0) + 1
+        decisions.append(result.changed)
+        if result.changed:
+            last = frame
+    return time.perf_counter() - start, decisions, metrics
+
+
+def bench_batched(frames, detector, batch_size):
+    kept = 0
+    start = time.perf_counter()
+    reference = frames[0]
+    for batch_start in range(1, len(frames), batch_size):
+        stack = frames[batch_start:batch_start + batch_size]
+        pos = 0
+        while pos < len(stack):
+            i = detector.first_change(reference, stack[pos:])
+            if i < 0:
+                break
+            pos += i
+            reference = stack[pos]
+            kept += 1
+            pos += 1
+    return time.perf_counter() - start, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--batch", type=int, default=16)
+    args = parser.parse_args()
+
+    frames = make_sequence(args.frames)
+    detector = ChangeDetector(ssim_threshold=args.threshold)
+    n = len(frames) - 1
+
+    legacy_time, legacy = bench_legacy(frames, args.threshold)
+    cascade_time, cascade, metrics = bench_cascade(frames, detector)
+    batched_time, kept = bench_batched(frames, detector, args.batch)
+    agreement = np.mean(np.asarray(legacy) == np.asarray(cascade)) * 100
+
+    print(f"{n} comparisons of 256x144 thumbnails")
+    print(f"  ssim(full=True)   {legacy_time / n * 1e6:9.1f} us/frame  ({sum(legacy)} changes)")
+    print(f"  cascade           {cascade_time / n * 1e6:9.1f} us/frame  ({sum(cascade)} changes, "
+          f"{agreement:.1f}% agree with legacy)")
+    print(f"  cascade, batched  {batched_time / n * 1e6:9.1f} us/frame  ({kept} changes, batch={args.batch})")
+    print("  decided by: " + ", ".join(f"{k}={v}" for k, v in sorted(metrics.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+UI-thread responsiveness while the focus monitor runs: replays a recorded
+screen sequence against a local stub LLM, with the engine on threads in the UI
+process ('thread') or in a child process fed through shared memory ('process'),
+while the main thread runs a 60 Hz tick the way the Tk mainloop would.
+
+Reports how late the ticks fire (the stutter a user sees), the main process's
+CPU time, and how many box updates reached the overlay.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.record_screen --out recordings/feed --seconds 60
+    python -m benchmarks.bench_engine recordings/feed --latency 0.2
+    python -m benchmarks.bench_engine recordings/feed --modes process --settings '{"ocr_workers": 4}'
+"""
+
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from api.openai_manager import OpenAIAPIManager
+from benchmarks.bench_monitor_latency import BenchConfig, start_stub
+from core.engine_process import AfterLoop, MonitorEngineProcess
+from core.focus_monitor_manager import FocusMonitorManager
+from utils.capture_backends import ReplayCaptureBackend
+
+TICK_MS = 16
+
+
+class EngineBenchConfig(BenchConfig):
+    @property
+    def settings(self) -> dict:
+        return dict(self)
+
+
+class CountingOverlay:
+    def __init__(self):
+        self.updates = 0
+
+    def update_or_create_overlay(self, areas):
+        self.updates += 1
+
+    def set_screen_bbox(self, bbox):
+        pass
+
+    def hide(self):
+        pass
+
+
+def run(mode: str, args, base_url: str, logger: logging.Logger) -> dict:
+    loop = AfterLoop(logger)
+    config = EngineBenchConfig(capture_interval=args.interval, **json.loads(args.settings))
+    overlay = CountingOverlay()
+    api = OpenAIAPIManager(logger)
+    if not api.configure("sk-benchmark", base_url=base_url):
+        raise RuntimeError("Could not configure the API client against the stub.")
+    callbacks = {'show_message': lambda *a: logger.error(a)}
+    backend = ReplayCaptureBackend(args.recording, realtime=True)
+    if mode == 'process':
+        engine = MonitorEngineProcess(
+            loop, config, api, overlay, callbacks, logger,
+            engine_settings=lambda: {'api_key': "sk-benchmark", 'openai_base_url': base_url},
+        )
+        engine.capture_backend = backend
+    else:
+        engine = FocusMonitorManager(loop, config, api, overlay, callbacks, logger, capture_backend=backend)
+
+    lateness = []
+
+    def tick(due):
+        now = time.monotonic()
+        lateness.append(now - due)
+        loop.after(TICK_MS, tick, now + TICK_MS / 1000)
+
+    loop.after(TICK_MS, tick, time.monotonic() + TICK_MS / 1000)
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    engine.start_monitoring(args.topic)
+    deadline = None
+    while deadline is None or time.monotonic() < deadline:
+        loop.run_once(0.005)
+        if deadline is None and backend.exhausted:
+            deadline = time.monotonic() + args.drain
+    engine.shutdown()
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    late_ms = np.array(lateness) * 1000
+    return {
+        'mode': mode,
+        'ticks': len(late_ms),
+        'late_p50_ms': float(np.percentile(late_ms, 50)),
+        'late_p99_ms': float(np.percentile(late_ms, 99)),
+        'late_max_ms': float(late_ms.max()),
+        'missed_frames': int((late_ms > TICK_MS).sum()),
+        'ui_cpu_share': cpu / wall if wall else 0.0,
+        'overlay_updates': overlay.updates,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="directory written by benchmarks.record_screen")
+    parser.add_argument("--modes", default="thread,process")
+    parser.add_argument("--topic", default="writing python code")
+    parser.add_argument("--interval", type=float, default=0.5, help="capture interval in seconds")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub time to first token")
+    parser.add_argument("--distract", default="news,sports,video,trending")
+    parser.add_argument("--settings", default="{}", help="extra monitor settings as a JSON object")
+    parser.add_argument("--drain", type=float, default=3.0, help="seconds to run after the last frame")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("bench")
+    proc, base_url = start_stub(args.latency, 0.005, args.distract, None)
+    try:
+        print(f"{'mode':<9}{'ticks':>7}{'late p50':>10}{'late p99':>10}{'late max':>10}{'missed':>8}"
+              f"{'UI CPU':>8}{'updates':>9}")
+        for mode in args.modes.split(","):
+            r = run(mode.strip(), args, base_url, logger)
+            print(f"{r['mode']:<9}{r['ticks']:>7}{r['late_p50_ms']:>8.1f}ms{r['late_p99_ms']:>8.1f}ms"
+                  f"{r['late_max_ms']:>8.1f}ms{r['missed_frames']:>8}{r['ui_cpu_share'] * 100:>7.0f}%"
+                  f"{r['overlay_updates']:>9}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
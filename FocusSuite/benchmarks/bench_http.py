@@ -0,0 +1,96 @@
+"""
+Per-request HTTP cost: a new connection per call (bare requests.post, as the
+API managers used to do) versus the shared pooled HttpTransport, sequentially,
+from a thread pool and through the asyncio interface.
+
+Against the local stub only the TCP handshake is saved; pass --url with an
+HTTPS endpoint that accepts POST to see the TLS handshake disappear too.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.bench_http --requests 200 --threads 8
+    python -m benchmarks.bench_http --url https://example.com/ --requests 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api.http_transport import HttpTransport
+from benchmarks.llm_stub_server import StubBehaviour, StubServer
+
+PAYLOAD = {"system": "benchmark", "user": "breaking news\ncode x"}
+
+
+def timed(call, n: int) -> list[float]:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label: str, latencies: list[float], connections: int | str):
+    latencies = sorted(latencies)
+    p90 = latencies[int(0.9 * (len(latencies) - 1))]
+    print(f"  {label:<22} p50 {statistics.median(latencies) * 1000:7.2f} ms  p90 {p90 * 1000:7.2f} ms  "
+          f"connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--url", help="endpoint to POST to instead of the local stub")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = StubServer(StubBehaviour(latency=0.0)).start()
+        url = server.base_url.rsplit("/v1", 1)[0] + "/worker"
+
+    def bare():
+        requests.post(url, json=PAYLOAD, timeout=30).close()
+
+    print(f"{args.requests} POSTs to {url}")
+    report("new connection each", timed(bare, args.requests), args.requests)
+
+    transport = HttpTransport()
+    report("pooled transport", timed(lambda: transport.post(url, json=PAYLOAD).close(), args.requests),
+           transport.connections_opened())
+
+    for label, call in (("bare, threaded", bare),
+                        ("pooled, threaded", lambda: transport.post(url, json=PAYLOAD).close())):
+        before = transport.connections_opened()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(lambda _: call(), range(args.requests)))
+        elapsed = time.perf_counter() - start
+        connections = args.requests if label.startswith("bare") else transport.connections_opened() - before
+        print(f"  {label:<22} {args.requests / elapsed:7.1f} req/s with {args.threads} threads  "
+              f"connections {connections}")
+
+    async def gather():
+        responses = await asyncio.gather(*(transport.apost(url, json=PAYLOAD) for _ in range(args.requests)))
+        for response in responses:
+            response.close()
+
+    before = transport.connections_opened()
+    start = time.perf_counter()
+    asyncio.run(gather())
+    elapsed = time.perf_counter() - start
+    print(f"  {'pooled, asyncio':<22} {args.requests / elapsed:7.1f} req/s, at most "
+          f"{transport.limit_for(transport.host(url))} in flight  connections {transport.connections_opened() - before}")
+
+    transport.close()
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+End-to-end latency of the focus monitor: replays a recorded screen sequence
+through the real FocusMonitorManager pipeline against a local stub LLM and
+reports per-stage latency percentiles, time-to-overlay, call rates and CPU time.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.record_screen --out recordings/feed --seconds 60
+    python -m benchmarks.bench_monitor_latency recordings/feed --latency 1.5 --distract news,sports
+    python -m benchmarks.bench_monitor_latency recordings/feed --json current.json --baseline baseline.json
+    python -m benchmarks.bench_monitor_latency recordings/feed --tail-prob 0.1 --tail-latency 8 --worker-latency 2
+
+With --worker-latency a second stub plays the Worker endpoint and requests go
+through the provider router, so hedging against a slow tail can be measured.
+
+With --baseline the run exits non-zero if any p50/p90 or call rate regresses
+by more than --tolerance, so it can gate changes in CI.
+"""
+
+import argparse
+import json
+import logging
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from api.openai_manager import OpenAIAPIManager
+from api.provider_router import OPENAI, WORKER, ProviderRouter, WorkerTextProvider
+from api.worker_api import WorkerTextAPIManager
+from core import screen_analyzer
+from core.focus_monitor_manager import FocusMonitorManager
+from core.ocr_index import OcrIndex
+from utils.capture_backends import ReplayCaptureBackend
+
+
+class BenchConfig(dict):
+    """In-memory stand-in for ConfigManager."""
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+    def set(self, key, value):
+        self[key] = value
+
+    def save(self):
+        pass
+
+
+class HeadlessRoot:
+    """Stands in for Tk: `after` callbacks run at once, serialized like the Tk loop."""
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def after(self, ms, func, *args):
+        with self._lock:
+            func(*args)
+
+
+class RecordingOverlay:
+    def __init__(self):
+        self.updates = 0
+
+    def update_or_create_overlay(self, areas):
+        self.updates += 1
+
+    def hide(self):
+        pass
+
+
+class StageTimes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage: str, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                stage: {
+                    'n': len(values),
+                    'p50_ms': float(np.percentile(values, 50) * 1000),
+                    'p90_ms': float(np.percentile(values, 90) * 1000),
+                    'p99_ms': float(np.percentile(values, 99) * 1000),
+                }
+                for stage, values in self.samples.items() if values
+            }
+
+
+class TimedAPI:
+    """Proxy around the API manager that records full and first-token latency."""
+    def __init__(self, inner, times: StageTimes):
+        self.inner = inner
+        self.times = times
+
+    def is_available(self):
+        return self.inner.is_available()
+
+    def generate_with_retry(self, prompt, *args, **kwargs):
+        return self.times.wrap('llm', self.inner.generate_with_retry)(prompt, *args, **kwargs)
+
+    def stream_with_retry(self, prompt, *args, **kwargs):
+        start = time.perf_counter()
+        first = True
+        try:
+            for chunk in self.inner.stream_with_retry(prompt, *args, **kwargs):
+                if first:
+                    self.times.add('llm_first_token', time.perf_counter() - start)
+                    first = False
+                yield chunk
+        finally:
+            self.times.add('llm', time.perf_counter() - start)
+
+
+class InstrumentedMonitor(FocusMonitorManager):
+    """Records capture time per screen generation and when its first box reaches the overlay."""
+    def __init__(self, *args, times: StageTimes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.times = times
+        self.captured_at = {}
+        self.first_box_seen = set()
+        put = self._analysis_slot.put
+
+        def tracking_put(frame):
+            self.captured_at[frame.generation] = frame.captured_at
+            put(frame)
+        self._analysis_slot.put = tracking_put
+
+    def _apply_result(self, generation, distractions, *args, **kwargs):
+        super()._apply_result(generation, distractions, *args, **kwargs)
+        if distractions and generation in self.captured_at and generation not in self.first_box_seen:
+            self.first_box_seen.add(generation)
+            self.times.add('time_to_first_box', time.monotonic() - self.captured_at[generation])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency: float, per_token: float, distract: str, answers: str | None,
+               tail_latency: float = 0.0, tail_prob: float = 0.0, seed: int = 0):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.llm_stub_server", "--port", str(port),
+           "--latency", str(latency), "--per-token", str(per_token), "--distract", distract,
+           "--tail-latency", str(tail_latency), "--tail-prob", str(tail_prob), "--seed", str(seed)]
+    if answers:
+        cmd += ["--answers", answers]
+    # a separate process keeps the stub's CPU time out of the measurement
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/models", timeout=1).read()
+            return proc, base_url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Stub LLM server did not start.")
+
+
+def stub_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=2) as response:
+        return json.loads(response.read())
+
+
+def run(args) -> dict:
+    times = StageTimes()
+    stubs = [start_stub(args.latency, args.per_token, args.distract, args.answers,
+                        args.tail_latency, args.tail_prob)]
+    if args.worker_latency is not None:
+        stubs.append(start_stub(args.worker_latency, args.per_token, args.distract, args.answers,
+                                args.tail_latency, args.tail_prob, seed=1))
+    base_url = stubs[0][1]
+    original_ocr = screen_analyzer.pytesseract.image_to_data
+    original_areas_for = OcrIndex.areas_for
+    try:
+        screen_analyzer.pytesseract.image_to_data = times.wrap('ocr', original_ocr)
+        OcrIndex.areas_for = times.wrap('map', original_areas_for)
+
+        logger = logging.getLogger("bench")
+        api = OpenAIAPIManager(logger)
+        if not api.configure("sk-benchmark", base_url=base_url):
+            raise RuntimeError("Could not configure the API client against the stub.")
+
+        config = BenchConfig(capture_interval=args.interval, **json.loads(args.settings))
+        if len(stubs) > 1:
+            worker_url = f"{stubs[1][1]}/worker"
+            api = ProviderRouter(config, {
+                OPENAI: api,
+                WORKER: WorkerTextProvider(WorkerTextAPIManager(logger), lambda: worker_url),
+            }, logger)
+        backend = ReplayCaptureBackend(args.recording)
+        backend.grab = times.wrap('capture', backend.grab)
+        monitor = InstrumentedMonitor(
+            HeadlessRoot(), config, TimedAPI(api, times), RecordingOverlay(),
+            {'show_message': lambda *a: logger.error(a)}, logger, capture_backend=backend, times=times,
+        )
+        monitor.change_detector.compare = times.wrap('change_detect', monitor.change_detector.compare)
+
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        monitor.start_monitoring(args.topic)
+        while not backend.exhausted:
+            time.sleep(0.05)
+        time.sleep(args.drain)
+        monitor.stop_monitoring()
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        stages = times.summary()
+        minutes = wall / 60
+        llm_requests = sum(stub_stats(url)['requests'] for _, url in stubs)
+        llm_prompt_chars = sum(stub_stats(url)['prompt_chars'] for _, url in stubs)
+        return {
+            'recording': args.recording,
+            'frames': len(backend.entries),
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'cpu_share': cpu / wall if wall else 0.0,
+            'ocr_calls_per_min': stages.get('ocr', {}).get('n', 0) / minutes,
+            'llm_calls_per_min': llm_requests / minutes,
+            'llm_prompt_chars': llm_prompt_chars,
+            'filter': monitor.analyzer.relevance_filter.report(),
+            'stages': stages,
+        }
+    finally:
+        screen_analyzer.pytesseract.image_to_data = original_ocr
+        OcrIndex.areas_for = original_areas_for
+        for proc, _ in stubs:
+            proc.terminate()
+            proc.wait(timeout=5)
+
+
+def print_report(report: dict):
+    print(f"{report['frames']} frames in {report['wall_seconds']:.1f} s wall, "
+          f"{report['cpu_seconds']:.2f} s CPU ({report['cpu_share'] * 100:.1f}% of one core)")
+    print(f"OCR calls/min {report['ocr_calls_per_min']:.1f}   LLM calls/min {report['llm_calls_per_min']:.1f}   "
+          f"prompt chars {report['llm_prompt_chars']}")
+    filtered = report['filter']
+    print(f"Relevance filter decided {filtered['decided']}/{filtered['seen']} lines locally, "
+          f"~{filtered['tokens_saved']} LLM tokens saved")
+    print(f"{'stage':<18}{'n':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for stage, s in sorted(report['stages'].items()):
+        print(f"{stage:<18}{s['n']:>6}{s['p50_ms']:>10.1f}{s['p90_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for stage, base in baseline.get('stages', {}).items():
+        current = report['stages'].get(stage)
+        if current is None:
+            continue
+        for key in ('p50_ms', 'p90_ms'):
+            if current[key] > base[key] * (1 + tolerance) and current[key] - base[key] > 1.0:
+                found.append(f"{stage} {key}: {base[key]:.1f} -> {current[key]:.1f}")
+    for key in ('ocr_calls_per_min', 'llm_calls_per_min', 'cpu_share'):
+        if report[key] > baseline.get(key, float('inf')) * (1 + tolerance):
+            found.append(f"{key}: {baseline[key]:.2f} -> {report[key]:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="directory written by benchmarks.record_screen")
+    parser.add_argument("--topic", default="writing python code")
+    parser.add_argument("--interval", type=float, default=0.5, help="capture interval in seconds")
+    parser.add_argument("--latency", type=float, default=1.5, help="stub time to first token")
+    parser.add_argument("--per-token", type=float, default=0.005)
+    parser.add_argument("--distract", default="news,sports,video,trending")
+    parser.add_argument("--answers", help="JSON file of canned answers for the stub")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="latency of the stub's slow requests")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="share of stub requests that are slow")
+    parser.add_argument("--worker-latency", type=float, help="also start a Worker stub and route between both")
+    parser.add_argument("--settings", default="{}", help="extra monitor settings as a JSON object")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait after the last frame")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        if found:
+            print("Regressions against baseline:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Tk main-thread time per overlay update: the previous delete-and-recreate
+redraw versus the reconciling, coalescing SmartOverlayManager.
+
+Run from the FocusSuite directory (under Xvfb on headless Linux, e.g.
+`xvfb-run -s "-screen 0 1920x1080x24" python -m benchmarks.bench_overlay`):
+    python -m benchmarks.bench_overlay --updates 500 --boxes 60
+"""
+
+import argparse
+import random
+import time
+import tkinter as tk
+
+from core.models import DistractionArea
+from ui.overlay import SmartOverlayManager
+
+
+def make_updates(n_updates: int, n_boxes: int, seed: int = 0) -> list[list[DistractionArea]]:
+    """Box sets as the monitor produces them: repeats, scrolls, streamed additions and full changes."""
+    rng = random.Random(seed)
+
+    def page():
+        return [DistractionArea(rng.randrange(0, 1600), rng.randrange(0, 900), rng.randrange(40, 300), 18, 1.0,
+                                text=f"line {rng.randrange(10 ** 6)}") for _ in range(n_boxes)]
+
+    current = page()
+    updates = []
+    for _ in range(n_updates):
+        event = rng.random()
+        if event < 0.05:
+            current = page()
+        elif event < 0.35:
+            dy = rng.choice((-40, -20, 20, 40))
+            current = [DistractionArea(a.x, a.y + dy, a.width, a.height, a.confidence, a.text) for a in current]
+        elif event < 0.55:
+            current = current[1:] + page()[:1]
+        updates.append(list(current))
+    return updates
+
+
+def bench_legacy(root, updates) -> float:
+    # the previous update_or_create_overlay: delete every rectangle, recreate them all
+    canvas = tk.Canvas(root, width=1920, height=1080)
+    canvas.pack()
+    drawn = []
+    start = time.perf_counter()
+    for areas in updates:
+        for rect in drawn:
+            canvas.delete(rect)
+        drawn.clear()
+        for area in areas:
+            drawn.append(canvas.create_rectangle(area.x, area.y, area.x + area.width, area.y + area.height,
+                                                 fill='black', outline='red', width=1))
+        root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    canvas.destroy()
+    return elapsed
+
+
+def bench_reconcile(root, updates) -> tuple[float, SmartOverlayManager]:
+    overlay = SmartOverlayManager(root)
+    start = time.perf_counter()
+    for areas in updates:
+        overlay.update_or_create_overlay(areas)
+        root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    overlay.destroy()
+    return elapsed, overlay
+
+
+def bench_burst(root, updates, burst: int) -> SmartOverlayManager:
+    # results queued faster than Tk runs them, as under bursty screen changes
+    overlay = SmartOverlayManager(root)
+    for i in range(0, len(updates), burst):
+        for areas in updates[i:i + burst]:
+            root.after(0, overlay.update_or_create_overlay, areas)
+        root.update()
+    overlay.destroy()
+    return overlay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--boxes", type=int, default=60)
+    parser.add_argument("--burst", type=int, default=8)
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.withdraw()
+    updates = make_updates(args.updates, args.boxes)
+    legacy = bench_legacy(root, updates)
+    reconcile, overlay = bench_reconcile(root, updates)
+    burst = bench_burst(root, updates, args.burst)
+    root.destroy()
+
+    n = len(updates)
+    print(f"{n} overlay updates of ~{args.boxes} boxes")
+    print(f"  delete + recreate   {legacy / n * 1000:8.3f} ms/update")
+    print(f"  reconcile           {reconcile / n * 1000:8.3f} ms/update  (draw only {overlay.mean_draw_ms:.3f} ms)")
+    print(f"  bursts of {args.burst:<3}       {burst.updates_drawn} draws for {n} updates "
+          f"({burst.updates_coalesced} coalesced), {burst.mean_draw_ms:.3f} ms/draw")
+
+
+if __name__ == "__main__":
+    main()
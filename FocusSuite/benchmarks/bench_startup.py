@@ -0,0 +1,102 @@
+"""
+Startup cost: module import time of `app` (and of what it now defers), and
+time from process start to the first drawn window.
+
+Run from the FocusSuite directory (time to first window needs a display,
+e.g. `xvfb-run python -m benchmarks.bench_startup`):
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# imported by the first window before, now loaded on first use
+DEFERRED_MODULES = ("openai", "core.video_processor", "keyboard", "pystray")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# runs in a child process: builds the app and exits once the first window is mapped
+_FIRST_WINDOW_SCRIPT = """
+import sys, time, tkinter as tk
+from dotenv import load_dotenv
+load_dotenv()
+from app import OptimizedProductivitySuite
+root = tk.Tk()
+root.geometry("800x600")
+app = OptimizedProductivitySuite(root)
+def mapped(_event):
+    print(f"first-window {time.time() - float(sys.argv[1]):.4f}", flush=True)
+    root.after(0, root.destroy)
+root.bind("<Map>", mapped)
+root.mainloop()
+"""
+
+
+def import_times(module: str) -> tuple[float, list[tuple[str, float]]]:
+    """Cumulative import time of `module` in a fresh interpreter, and what its direct imports cost, by package."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    packages = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1e6, len(match.group(3)) // 2, match.group(4)
+        # children are listed before their parent, two spaces deeper per level
+        if depth == 0 and name == module:
+            total = cumulative
+        elif depth == 1:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + cumulative
+    return total, sorted(packages.items(), key=lambda item: -item[1])
+
+
+def time_to_first_window() -> float | None:
+    started = time.time()
+    result = subprocess.run([sys.executable, "-c", _FIRST_WINDOW_SCRIPT, str(started)],
+                            capture_output=True, text=True, timeout=120)
+    for line in result.stdout.splitlines():
+        if line.startswith("first-window "):
+            return float(line.split()[1])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, top = import_times("app")
+        totals.append(total)
+    print(f"import app: median {statistics.median(totals) * 1000:.0f} ms over {args.runs} runs")
+    for name, seconds in top[:args.top]:
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+
+    print("deferred until first use:")
+    for module in DEFERRED_MODULES:
+        try:
+            total, _ = import_times(module)
+            print(f"  {module:<28} {total * 1000:8.1f} ms")
+        except RuntimeError as e:
+            print(f"  {module:<28} not importable ({e})")
+
+    windows = [time_to_first_window() for _ in range(args.runs)]
+    windows = [w for w in windows if w is not None]
+    if windows:
+        print(f"time to first window: median {statistics.median(windows) * 1000:.0f} ms over {len(windows)} runs")
+    else:
+        print("time to first window: no window was shown (no display?)")
+
+
+if __name__ == "__main__":
+    main()
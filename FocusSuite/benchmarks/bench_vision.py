@@ -0,0 +1,97 @@
+"""
+Frame analysis throughput of the local ONNX vision backend: frames per second
+through VideoProcessor's batching for a range of batch sizes, with the
+per-stage split between decoding and the forward pass.
+
+Frames come from a directory of images (e.g. the frames a video run extracted)
+or are generated. The model and labels are the user's own; for a quick check
+any ImageNet classifier exported to ONNX with its class list works.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.bench_vision --model mobilenetv2.onnx --labels imagenet.txt --prompt "a dog" --frames 512
+    python -m benchmarks.bench_vision --model yolov8n.onnx --labels coco.txt --input-size 640 --prompt person --batches 1,4
+"""
+
+import argparse
+import glob
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from core.blur_timeline import FrameTable
+from core.progress import ProgressBus
+from core.video_processor import VideoProcessor
+from core.vision_backends import OnnxVisionBackend, load_labels
+from utils.metrics import metrics
+
+
+def synthetic_frames(directory: str, n: int, size=(1280, 720)) -> list[str]:
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        image = cv2.GaussianBlur(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), (31, 31), 0)
+        path = os.path.join(directory, f"frame_{i:06d}.jpg")
+        cv2.imwrite(path, image)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", required=True, help="ONNX classifier or detector")
+    parser.add_argument("--labels", required=True, help="class names, one per line in output order")
+    parser.add_argument("--prompt", required=True, help="must name at least one class")
+    parser.add_argument("--frames-dir", help="directory of .jpg/.png frames instead of generated ones")
+    parser.add_argument("--frames", type=int, default=256, help="number of generated frames")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--threads", type=int, default=0, help="OpenCV threads (0: its default)")
+    parser.add_argument("--batches", default="1,8,32")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("bench")
+    # frames are laid out as a video run stores them, so a FrameTable finds them
+    temp_dir = tempfile.mkdtemp(prefix="bench_vision_")
+    if args.frames_dir:
+        sources = sorted(glob.glob(os.path.join(args.frames_dir, "*.jpg")) + glob.glob(os.path.join(args.frames_dir, "*.png")))
+        paths = [os.path.join(temp_dir, f"frame_{i:06d}.jpg") for i in range(len(sources))]
+        for source, path in zip(sources, paths):
+            os.symlink(os.path.abspath(source), path)
+    else:
+        paths = synthetic_frames(temp_dir, args.frames)
+
+    try:
+        print(f"{len(paths)} frames, {os.path.basename(args.model)} at {args.input_size}px, "
+              f"{args.threads or cv2.getNumThreads()} threads")
+        print(f"{'batch':>6}{'frames/s':>11}{'decode ms/frame':>17}{'forward ms/frame':>18}{'blurred':>9}")
+        for batch_size in (int(b) for b in args.batches.split(",")):
+            backend = OnnxVisionBackend(args.model, load_labels(args.labels), input_size=args.input_size,
+                                        batch_size=batch_size, threads=args.threads)
+            if not backend.supports(args.prompt):
+                parser.error(f"no class of the model matches '{args.prompt}'")
+            # one warm-up pass, so the first batch's allocations aren't counted
+            backend.analyze_batch(paths[:batch_size], args.prompt)
+            metrics.reset()
+            frames = FrameTable(temp_dir, capacity=len(paths))
+            for i in range(len(paths)):
+                frames.append(i)
+            start = time.perf_counter()
+            VideoProcessor(logger, ProgressBus())._analyze_frames(frames, args.prompt, backend)
+            elapsed = time.perf_counter() - start
+            backend.close()
+            stats = metrics.snapshot()['histograms']
+            decode = stats['vision.decode']['sum'] / len(paths) * 1000
+            forward = stats['vision.forward']['sum'] / len(paths) * 1000
+            print(f"{batch_size:>6}{len(paths) / elapsed:>11.1f}{decode:>17.2f}{forward:>18.2f}"
+                  f"{int(frames.blur.sum()):>9}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
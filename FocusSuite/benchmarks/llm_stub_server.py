@@ -0,0 +1,223 @@
+"""
+A local OpenAI-compatible chat completion server with fixed latency and canned
+answers, so monitor benchmarks don't depend on the network or the model. Any
+other POST path speaks the Worker endpoint protocol ({"system", "user"} in,
+{"response"} out).
+
+Run from the FocusSuite directory:
+    python -m benchmarks.llm_stub_server --port 8765 --latency 1.5 --distract news,sports
+    python -m benchmarks.llm_stub_server --latency 1.0 --tail-latency 8 --tail-prob 0.1
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_TEXT_RE = re.compile(r'Text: "(.*)"\s*$', re.DOTALL)
+_NUMBERED_LINE_RE = re.compile(r'^\[(\d+)\] (.*)$', re.MULTILINE)
+
+
+class StubBehaviour:
+    """
+    Decides what the stub answers. A line of the user text is reported as a
+    distraction when it contains any of the `distract_words`; `answers` can
+    instead map a substring of the prompt to a fixed distraction list. Prompts
+    made of numbered "[n] line" rows get the line-ID answer {"ids": [...]}. A
+    `tail_prob` share of requests waits `tail_latency` instead of `latency`.
+    """
+    def __init__(self, latency: float = 1.0, per_token: float = 0.0, distract_words=(), answers=None,
+                 tail_latency: float = 0.0, tail_prob: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.per_token = per_token
+        self.tail_latency = tail_latency
+        self.tail_prob = tail_prob
+        self._random = random.Random(seed)
+        self.distract_words = [w.lower() for w in distract_words if w]
+        self.answers = answers or {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_chars = 0
+        self.completion_chars = 0
+
+    def answer(self, prompt: str) -> str:
+        numbered = _NUMBERED_LINE_RE.findall(prompt)
+        if numbered:
+            canned = [d.lower() for needle, ds in self.answers.items() if needle.lower() in prompt.lower() for d in ds]
+            ids = [int(n) for n, line in numbered
+                   if any(w in line.lower() for w in self.distract_words) or any(d in line.lower() for d in canned)]
+            return json.dumps({"ids": ids})
+        for needle, distractions in self.answers.items():
+            if needle.lower() in prompt.lower():
+                return json.dumps({"distractions": distractions})
+        match = _TEXT_RE.search(prompt)
+        text = match.group(1) if match else prompt
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        distractions = [line for line in lines if any(w in line.lower() for w in self.distract_words)]
+        return json.dumps({"distractions": distractions})
+
+    def delay(self) -> float:
+        with self.lock:
+            slow = self._random.random() < self.tail_prob
+        return self.tail_latency if slow else self.latency
+
+    def record(self, prompt: str, completion: str):
+        with self.lock:
+            self.requests += 1
+            self.prompt_chars += len(prompt)
+            self.completion_chars += len(completion)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "prompt_chars": self.prompt_chars,
+                "completion_chars": self.completion_chars,
+            }
+
+
+def _make_handler(behaviour: StubBehaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes; without this a kept-alive
+        # connection stalls ~40 ms on delayed ACKs, which real API servers don't
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json({"object": "list", "data": [
+                    {"id": "gpt-4o", "object": "model", "created": 0, "owned_by": "stub"}
+                ]})
+            elif self.path.rstrip("/").endswith("/stats"):
+                self._send_json(behaviour.stats())
+            else:
+                self._send_json({"error": {"message": "not found"}}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._worker(request)
+                return
+
+            prompt = next((m.get("content", "") for m in reversed(request.get("messages", []))
+                           if m.get("role") == "user"), "")
+            completion = behaviour.answer(prompt)
+            behaviour.record(prompt, completion)
+            time.sleep(behaviour.delay())
+
+            if request.get("stream"):
+                self._stream(completion)
+            else:
+                time.sleep(behaviour.per_token * len(completion) / 4)
+                self._send_json({
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": completion}}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(completion) // 4,
+                              "total_tokens": (len(prompt) + len(completion)) // 4},
+                })
+
+        def _worker(self, request: dict):
+            prompt = request.get("user", "")
+            completion = behaviour.answer(prompt)
+            behaviour.record(prompt, completion)
+            time.sleep(behaviour.delay() + behaviour.per_token * len(completion) / 4)
+            self._send_json({"response": completion})
+
+        def _stream(self, completion: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            # roughly one token per four characters
+            pieces = [completion[i:i + 4] for i in range(0, len(completion), 4)] + [None]
+            try:
+                for piece in pieces:
+                    delta = {"content": piece} if piece is not None else {}
+                    chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                             "model": "gpt-4o", "choices": [{"index": 0, "delta": delta,
+                                                             "finish_reason": None if piece else "stop"}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                    if piece and behaviour.per_token:
+                        time.sleep(behaviour.per_token)
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _write_chunk(self, text: str):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class StubServer:
+    """Runs the stub on a background thread; `base_url` is ready for `openai.OpenAI`."""
+    def __init__(self, behaviour: StubBehaviour, host: str = "127.0.0.1", port: int = 0):
+        self.behaviour = behaviour
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(behaviour))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--distract", default="", help="comma-separated words that mark a line distracting")
+    parser.add_argument("--answers", help="JSON file mapping prompt substrings to distraction lists")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="latency of the slow requests")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="share of requests that are slow")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    answers = None
+    if args.answers:
+        with open(args.answers, 'r') as f:
+            answers = json.load(f)
+    behaviour = StubBehaviour(args.latency, args.per_token, args.distract.split(","), answers,
+                              args.tail_latency, args.tail_prob, args.seed)
+    server = StubServer(behaviour, args.host, args.port)
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Records a timestamped sequence of active-window captures for replay benchmarks.
+
+Run from the FocusSuite directory:
+    python -m benchmarks.record_screen --out recordings/ide --seconds 60 --interval 0.5
+
+Writes one PNG per distinct frame plus `manifest.jsonl`, which
+ReplayCaptureBackend reads back with the recorded titles and geometry.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from utils.capture_backends import REPLAY_MANIFEST, create_capture_backend
+
+
+def record(out_dir: str, seconds: float, interval: float, backend_name: str = 'auto') -> int:
+    os.makedirs(out_dir, exist_ok=True)
+    backend = create_capture_backend({'capture_backend': backend_name})
+    last_digest = None
+    last_file = None
+    written = 0
+    start = time.monotonic()
+    with open(os.path.join(out_dir, REPLAY_MANIFEST), 'w') as manifest:
+        try:
+            while time.monotonic() - start < seconds:
+                tick = time.monotonic()
+                window = backend.get_active_window()
+                if window is not None:
+                    image = backend.grab(window.bbox)
+                    digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+                    # unchanged frames reuse the previous file so idle periods cost no disk
+                    if digest != last_digest:
+                        last_file = f"{written:06d}.png"
+                        image.save(os.path.join(out_dir, last_file))
+                        last_digest = digest
+                        written += 1
+                    manifest.write(json.dumps({
+                        't': round(tick - start, 4), 'file': last_file,
+                        'bbox': list(window.bbox), 'title': window.title, 'handle': window.handle,
+                    }) + "\n")
+                time.sleep(max(0.0, interval - (time.monotonic() - tick)))
+        finally:
+            backend.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--backend", default='auto', choices=['auto', 'pil', 'x11'])
+    args = parser.parse_args()
+    written = record(args.out, args.seconds, args.interval, args.backend)
+    print(f"Recorded {written} distinct frames to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
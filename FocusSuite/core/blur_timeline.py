@@ -0,0 +1,174 @@
+# compact bookkeeping for the video feature: analyzed frames as a structured array, blur as run-length intervals
+
+import os
+
+import numpy as np
+
+# one row per extracted (unique) frame: 9 bytes instead of a dict per frame
+FRAME_DTYPE = np.dtype([('index', np.int64), ('blur', np.bool_)])
+
+
+class FrameTable:
+    """
+    The unique frames of a video, in the order they were extracted (so by
+    ascending `index` in the source video). Row i's image is stored at
+    `path(i)`; the path is derived, not kept. Appends grow the array by
+    doubling, so extraction stays amortized O(1) per frame.
+    """
+    def __init__(self, directory: str, capacity: int = 1024):
+        self.directory = directory
+        self._data = np.zeros(max(capacity, 1), dtype=FRAME_DTYPE)
+        self._size = 0
+
+    def append(self, index: int) -> str:
+        """Adds the frame at `index` of the source video and returns the path to write its image to."""
+        if self._size == len(self._data):
+            grown = np.zeros(2 * len(self._data), dtype=FRAME_DTYPE)
+            grown[:self._size] = self._data
+            self._data = grown
+        self._data[self._size] = (index, False)
+        self._size += 1
+        return self.path(self._size - 1)
+
+    def path(self, row: int) -> str:
+        return os.path.join(self.directory, f"frame_{row:06d}.jpg")
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The filled part of the table, as a view."""
+        return self._data[:self._size]
+
+    @property
+    def index(self) -> np.ndarray:
+        return self.rows['index']
+
+    @property
+    def blur(self) -> np.ndarray:
+        return self.rows['blur']
+
+
+class BlurTimeline:
+    """
+    The blurred frames of a video as sorted, disjoint half-open runs
+    [start, end) with a gap of at least one frame between runs, kept as two
+    int64 arrays. Memory and every operation scale with the number of runs,
+    not the length of the video. Set operations, smoothing and filtering are
+    vectorized and return a new timeline.
+    """
+    def __init__(self, starts=(), ends=()):
+        # assumed normalized; use `from_runs` for arbitrary intervals
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    @classmethod
+    def from_runs(cls, starts, ends) -> 'BlurTimeline':
+        """Any intervals, possibly empty, unsorted, overlapping or touching; merged into runs."""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if len(starts) == 0:
+            return cls()
+        order = np.argsort(starts, kind='stable')
+        starts, ends = starts[order], ends[order]
+        reach = np.maximum.accumulate(ends)
+        # a run begins where an interval starts past everything before it
+        first = np.flatnonzero(np.r_[True, starts[1:] > reach[:-1]])
+        last = np.r_[first[1:] - 1, len(starts) - 1]
+        return cls(starts[first], reach[last])
+
+    @classmethod
+    def from_mask(cls, mask) -> 'BlurTimeline':
+        edges = np.diff(np.r_[0, np.asarray(mask, dtype=np.int8), 0])
+        return cls(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+    @classmethod
+    def from_keyframes(cls, indices, blurred, total: int) -> 'BlurTimeline':
+        """Each analyzed frame's verdict holds until the next analyzed frame, the last one until `total`."""
+        indices = np.asarray(indices, dtype=np.int64)
+        blurred = np.asarray(blurred, dtype=bool)
+        if len(indices) == 0:
+            return cls()
+        order = np.argsort(indices, kind='stable')
+        indices, blurred = indices[order], blurred[order]
+        ends = np.r_[indices[1:], max(total, indices[-1] + 1)]
+        return cls.from_runs(indices[blurred], ends[blurred])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.ends.tolist())
+
+    def __repr__(self):
+        return f"BlurTimeline({len(self)} runs, {self.frame_count} frames)"
+
+    def __eq__(self, other):
+        return (isinstance(other, BlurTimeline) and np.array_equal(self.starts, other.starts)
+                and np.array_equal(self.ends, other.ends))
+
+    @property
+    def frame_count(self) -> int:
+        return int((self.ends - self.starts).sum())
+
+    def __contains__(self, frame: int) -> bool:
+        i = np.searchsorted(self.starts, frame, side='right') - 1
+        return bool(i >= 0 and frame < self.ends[i])
+
+    def union(self, *others: 'BlurTimeline') -> 'BlurTimeline':
+        """Frames blurred in any timeline, e.g. the verdicts for several prompts."""
+        timelines = (self, *others)
+        return BlurTimeline.from_runs(np.concatenate([t.starts for t in timelines]),
+                                      np.concatenate([t.ends for t in timelines]))
+
+    __or__ = union
+
+    def complement(self, total: int) -> 'BlurTimeline':
+        """The frames of [0, total) that are not blurred."""
+        clipped = self.clip(total)
+        return BlurTimeline.from_runs(np.r_[0, clipped.ends], np.r_[clipped.starts, total])
+
+    def intersection(self, other: 'BlurTimeline') -> 'BlurTimeline':
+        total = int(max(self.ends[-1] if len(self) else 0, other.ends[-1] if len(other) else 0))
+        return self.complement(total).union(other.complement(total)).complement(total)
+
+    __and__ = intersection
+
+    def clip(self, total: int) -> 'BlurTimeline':
+        return BlurTimeline.from_runs(np.minimum(self.starts, total), np.minimum(self.ends, total))
+
+    def dilate(self, before: int, after: int, total: int | None = None) -> 'BlurTimeline':
+        """Widens every run, e.g. to start blurring a little before a detection."""
+        ends = self.ends + after
+        if total is not None:
+            ends = np.minimum(ends, total)
+        return BlurTimeline.from_runs(np.maximum(self.starts - before, 0), ends)
+
+    def close_gaps(self, max_gap: int) -> 'BlurTimeline':
+        """Joins runs separated by at most `max_gap` unblurred frames, so the blur doesn't flicker."""
+        if len(self) < 2 or max_gap <= 0:
+            return self
+        split = self.starts[1:] - self.ends[:-1] > max_gap
+        return BlurTimeline(self.starts[np.r_[True, split]], self.ends[np.r_[split, True]])
+
+    def drop_shorter(self, min_length: int) -> 'BlurTimeline':
+        """Removes runs shorter than `min_length` frames, e.g. a single misjudged frame."""
+        keep = self.ends - self.starts >= min_length
+        return BlurTimeline(self.starts[keep], self.ends[keep])
+
+    def segments(self, total: int):
+        """Yields (start, end, blurred) for consecutive segments covering [0, total), for a render loop."""
+        clipped = self.clip(total)
+        bounds = np.r_[0, np.column_stack((clipped.starts, clipped.ends)).ravel(), total].tolist()
+        for i in range(len(bounds) - 1):
+            if bounds[i + 1] > bounds[i]:
+                yield bounds[i], bounds[i + 1], i % 2 == 1
+
+    def to_mask(self, total: int) -> np.ndarray:
+        mask = np.zeros(total, dtype=bool)
+        for start, end in self.clip(total):
+            mask[start:end] = True
+        return mask
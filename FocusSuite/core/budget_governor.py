@@ -0,0 +1,243 @@
+# keeps continuous monitoring inside token, call-rate and CPU budgets
+
+import os
+import threading
+import time
+from collections import deque
+
+from api.prompts import DISTRACTION_SYSTEM_PROMPT
+from core.relevance_filter import CHARS_PER_TOKEN
+from utils.metrics import metrics
+
+# throttle levels: (capture interval factor, chunk size factor, relevance threshold offset, exemplar threshold offset)
+THROTTLE_LEVELS = (
+    (1.0, 1.0, 0.0, 0.0),
+    (1.5, 1.5, -0.05, -0.03),
+    (2.5, 2.0, -0.10, -0.06),
+    (4.0, 3.0, -0.15, -0.10),
+)
+
+
+class BudgetGovernor:
+    """
+    Tracks AI calls, estimated tokens and process CPU time in rolling windows
+    and turns them into a throttle level. Higher levels capture less often,
+    pack more lines per AI call and let the relevance filter decide more lines
+    locally. When a hard budget is spent, `allow_analysis` says no until the
+    window rolls over. Each AI request also reserves a call slot before it is
+    sent, so the chunks of one screen can't overshoot the call budget together.
+
+    Settings (0 disables a budget):
+        budget_tokens_per_hour   estimated prompt + completion tokens (default 60000)
+        budget_calls_per_minute  AI requests (default 6)
+        budget_cpu_share         share of one core, including OCR subprocesses (default 0.25)
+    """
+    def __init__(self, config, logger, adapt_every: float = 10.0):
+        self.config = config
+        self.logger = logger
+        self.adapt_every = adapt_every
+        self.level = 0
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._tokens = deque()
+        self._tokens_total = 0
+        # requests reserved but not yet recorded
+        self._reserved = 0
+        self._cpu_share = 0.0
+        self._cpu_sample = None
+        self._last_adapt = time.monotonic()
+
+    def budgets(self) -> dict:
+        return {
+            'tokens_per_hour': self.config.get('budget_tokens_per_hour', 60000),
+            'calls_per_minute': self.config.get('budget_calls_per_minute', 6),
+            'cpu_share': self.config.get('budget_cpu_share', 0.25),
+        }
+
+    def record_call(self, prompt_chars: int, completion_chars: int):
+        tokens = (prompt_chars + completion_chars) // CHARS_PER_TOKEN
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append(now)
+            self._tokens.append((now, tokens))
+            self._tokens_total += tokens
+
+    def reserve_call(self) -> bool:
+        """Holds a call slot for a request about to be sent; False while the call or token budget is spent."""
+        budgets = self.budgets()
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._spent(budgets):
+                return False
+            self._reserved += 1
+            return True
+
+    def release_call(self):
+        """Frees a slot from `reserve_call` once its request is recorded or was never sent."""
+        with self._lock:
+            self._reserved = max(self._reserved - 1, 0)
+
+    def _spent(self, budgets: dict) -> bool:
+        if budgets['calls_per_minute'] and len(self._calls) + self._reserved >= budgets['calls_per_minute']:
+            return True
+        return bool(budgets['tokens_per_hour']) and self._tokens_total >= budgets['tokens_per_hour']
+
+    def _expire(self, now: float):
+        while self._calls and now - self._calls[0] > 60:
+            self._calls.popleft()
+        while self._tokens and now - self._tokens[0][0] > 3600:
+            self._tokens_total -= self._tokens.popleft()[1]
+
+    def sample_cpu(self):
+        """Updates the CPU share from process (and finished child process) time since the last sample."""
+        times = os.times()
+        cpu = times.user + times.system + times.children_user + times.children_system
+        now = time.monotonic()
+        if self._cpu_sample is not None:
+            last_cpu, last_now = self._cpu_sample
+            if now - last_now > 0:
+                share = (cpu - last_cpu) / (now - last_now)
+                # smoothed, so one OCR burst doesn't swing the throttle
+                self._cpu_share = 0.7 * self._cpu_share + 0.3 * share
+        self._cpu_sample = (cpu, now)
+
+    def usage(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            recent = sum(tokens for at, tokens in self._tokens if now - at <= 300)
+            return {
+                'calls_per_minute': len(self._calls),
+                'tokens_per_hour': self._tokens_total,
+                # the last five minutes scaled up, so a burst shows before the hour fills
+                'tokens_per_hour_projected': recent * 12,
+                'cpu_share': self._cpu_share,
+            }
+
+    def pressure(self, usage: dict | None = None) -> float:
+        """Highest fraction of any budget in use; above 1.0 means over budget."""
+        usage = usage or self.usage()
+        budgets = self.budgets()
+        ratios = [0.0]
+        if budgets['tokens_per_hour']:
+            tokens = max(usage['tokens_per_hour'], usage['tokens_per_hour_projected'])
+            ratios.append(tokens / budgets['tokens_per_hour'])
+        if budgets['calls_per_minute']:
+            ratios.append(usage['calls_per_minute'] / budgets['calls_per_minute'])
+        if budgets['cpu_share']:
+            ratios.append(usage['cpu_share'] / budgets['cpu_share'])
+        return max(ratios)
+
+    def adapt(self) -> bool:
+        """Steps the throttle level up or down at most once per `adapt_every` seconds. Returns True on change."""
+        now = time.monotonic()
+        if now - self._last_adapt < self.adapt_every:
+            return False
+        self._last_adapt = now
+        pressure = self.pressure()
+        level = self.level
+        if pressure > 0.8 and level < len(THROTTLE_LEVELS) - 1:
+            level += 1
+        elif pressure < 0.5 and level > 0:
+            level -= 1
+        if level == self.level:
+            return False
+        self.logger.info(f"Budget pressure {pressure:.0%}: throttle level {self.level} -> {level}.")
+        self.level = level
+        return True
+
+    def allow_analysis(self) -> bool:
+        """False while the call or token budget is fully spent, counting requests in flight."""
+        budgets = self.budgets()
+        with self._lock:
+            self._expire(time.monotonic())
+            return not self._spent(budgets)
+
+    def capture_interval(self, base: float) -> float:
+        return base * THROTTLE_LEVELS[self.level][0]
+
+    def chunk_scale(self) -> float:
+        return THROTTLE_LEVELS[self.level][1]
+
+    def filter_offsets(self) -> tuple[float, float]:
+        return THROTTLE_LEVELS[self.level][2:]
+
+    def describe(self) -> str:
+        usage = self.usage()
+        budgets = self.budgets()
+
+        def part(value, budget, fmt):
+            return f"{fmt(value)}/{fmt(budget)}" if budget else fmt(value)
+
+        return (
+            f"AI {part(usage['calls_per_minute'], budgets['calls_per_minute'], str)} calls/min | "
+            f"{part(usage['tokens_per_hour'], budgets['tokens_per_hour'], lambda v: f'{v / 1000:.1f}k')} tokens/h | "
+            f"CPU {part(usage['cpu_share'], budgets['cpu_share'], lambda v: f'{v:.0%}')} | "
+            f"throttle {self.level}"
+        )
+
+
+class BudgetedAPI:
+    """
+    Wraps an API manager so every request is counted against the governor's
+    budgets and reported to the metrics registry. A router's hedged backup
+    requests are counted too.
+    """
+    def __init__(self, api_manager, governor: BudgetGovernor):
+        self.api_manager = api_manager
+        self.governor = governor
+        if hasattr(api_manager, 'on_hedge'):
+            api_manager.on_hedge = self._record_hedge
+
+    def reserve_call(self) -> bool:
+        return self.governor.reserve_call()
+
+    def release_call(self):
+        self.governor.release_call()
+
+    def is_available(self) -> bool:
+        return self.api_manager.is_available()
+
+    @staticmethod
+    def _prompt_chars(prompt: str, options: dict) -> int:
+        return len(prompt) + len(options.get('system_prompt', DISTRACTION_SYSTEM_PROMPT))
+
+    def _record(self, prompt: str, options: dict, completion_chars: int, seconds: float):
+        prompt_chars = self._prompt_chars(prompt, options)
+        self.governor.record_call(prompt_chars, completion_chars)
+        metrics.observe('api.request', seconds)
+        metrics.inc('api.calls')
+        metrics.inc('api.tokens', (prompt_chars + completion_chars) // CHARS_PER_TOKEN)
+        metrics.inc('api.bytes_uploaded', len(prompt.encode()) + len(options.get('system_prompt', DISTRACTION_SYSTEM_PROMPT).encode()))
+
+    def _record_hedge(self, prompt: str, options: dict):
+        # the backup's prompt is sent again; its completion is mostly cancelled, so only the prompt counts
+        prompt_chars = self._prompt_chars(prompt, options)
+        self.governor.record_call(prompt_chars, 0)
+        metrics.inc('api.hedged_calls')
+        metrics.inc('api.tokens', prompt_chars // CHARS_PER_TOKEN)
+
+    def generate_with_retry(self, prompt: str, *args, **options) -> str | None:
+        start = time.perf_counter()
+        result = self.api_manager.generate_with_retry(prompt, *args, **options)
+        self._record(prompt, options, len(result or ""), time.perf_counter() - start)
+        return result
+
+    def stream_with_retry(self, prompt: str, *args, **options):
+        if not hasattr(self.api_manager, 'stream_with_retry'):
+            result = self.generate_with_retry(prompt, *args, **options)
+            if result:
+                yield result
+            return
+        completion_chars = 0
+        start = time.perf_counter()
+        stream = self.api_manager.stream_with_retry(prompt, *args, **options)
+        try:
+            for chunk in stream:
+                if not completion_chars:
+                    metrics.observe('api.first_token', time.perf_counter() - start)
+                completion_chars += len(chunk)
+                yield chunk
+        finally:
+            stream.close()
+            self._record(prompt, options, completion_chars, time.perf_counter() - start)
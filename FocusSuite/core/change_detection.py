@@ -0,0 +1,148 @@
+# shared screen/frame change detection used by the focus monitor and the video processor
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class ChangeResult:
+    """Outcome of one comparison; `metric` names the cascade step that decided it."""
+    changed: bool
+    score: float
+    metric: str
+
+
+def _block_means(gray: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    # area-averages the last two axes down to rows x cols; works on single frames and stacks
+    h, w = gray.shape[-2:]
+    row_starts = np.linspace(0, h, rows + 1).astype(np.intp)[:-1]
+    col_starts = np.linspace(0, w, cols + 1).astype(np.intp)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float32), row_starts, axis=-2), col_starts, axis=-1)
+    counts = np.outer(np.diff(np.append(row_starts, h)), np.diff(np.append(col_starts, w)))
+    return sums / counts
+
+
+def difference_hash(gray: np.ndarray) -> np.ndarray:
+    """64-bit difference hash (as 64 booleans per frame) of a frame or a stack of frames."""
+    means = _block_means(gray, 8, 9)
+    return (means[..., 1:] > means[..., :-1]).reshape(*gray.shape[:-2], 64)
+
+
+def mean_ssim(a: np.ndarray, b: np.ndarray, win: int = 7, data_range: float = 255) -> float:
+    """
+    Mean SSIM with skimage's default uniform 7x7 window, without returning the
+    similarity map. Only windows fully inside the image are averaged, which is
+    exactly the region skimage crops to, so scores match `structural_similarity`.
+    """
+    # OpenCV is imported on first use, so it stays off the app's startup path
+    import cv2
+
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    pad = (win - 1) // 2
+
+    def box(x):
+        return cv2.boxFilter(x, -1, (win, win), borderType=cv2.BORDER_REFLECT)[pad:-pad, pad:-pad]
+
+    ux, uy = box(a), box(b)
+    uxx, uyy, uxy = box(a * a), box(b * b), box(a * b)
+    cov_norm = win * win / (win * win - 1)
+    vx = cov_norm * (uxx - ux * ux)
+    vy = cov_norm * (uyy - uy * uy)
+    vxy = cov_norm * (uxy - ux * uy)
+    c1 = (0.01 * data_range) ** 2
+    c2 = (0.03 * data_range) ** 2
+    s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+    return float(s.mean(dtype=np.float64))
+
+
+def histogram(gray: np.ndarray, bins: int = 32) -> np.ndarray:
+    hist = np.bincount((gray.ravel() >> 3).astype(np.intp), minlength=bins).astype(np.float32)
+    return hist / max(gray.size, 1)
+
+
+_hanning_windows = {}
+
+
+def estimate_translation(previous: np.ndarray, current: np.ndarray, min_response: float = 0.2,
+                         max_mad: float = 6.0) -> tuple[float, float] | None:
+    """
+    Detects a pure translation (scroll or pan) between two grayscale thumbnails by
+    phase correlation. Returns the sub-pixel (dx, dy) that moves `previous` onto
+    `current`, or None if the frames aren't a clean shift of each other.
+    """
+    import cv2
+
+    if previous.shape != current.shape:
+        return None
+    h, w = previous.shape
+    window = _hanning_windows.get((w, h))
+    if window is None:
+        window = _hanning_windows[(w, h)] = cv2.createHanningWindow((w, h), cv2.CV_32F)
+    (dx, dy), response = cv2.phaseCorrelate(previous.astype(np.float32), current.astype(np.float32), window)
+    if response < min_response:
+        return None
+    ix, iy = int(round(dx)), int(round(dy))
+    if (ix == 0 and iy == 0) or abs(ix) > w // 2 or abs(iy) > h // 2:
+        return None
+
+    # the overlapping part must match once shifted, otherwise it's not a pure translation
+    moved = current[max(iy, 0):h + min(iy, 0), max(ix, 0):w + min(ix, 0)]
+    source = previous[max(-iy, 0):h + min(-iy, 0), max(-ix, 0):w + min(-ix, 0)]
+    if float(np.abs(moved.astype(np.int16) - source).mean()) > max_mad:
+        return None
+    return float(dx), float(dy)
+
+
+class ChangeDetector:
+    """
+    Decides whether two grayscale thumbnails differ meaningfully. Cheap metrics
+    run first (mean absolute difference, difference hash, histogram distance) and
+    only inconclusive pairs pay for SSIM, which is computed without its full map.
+    """
+    def __init__(self, ssim_threshold: float = 0.98, mad_same: float = 0.1, mad_changed: float = 20.0,
+                 hash_changed: int = 16, hist_changed: float = 0.3):
+        self.ssim_threshold = ssim_threshold
+        self.mad_same = mad_same
+        self.mad_changed = mad_changed
+        self.hash_changed = hash_changed
+        self.hist_changed = hist_changed
+
+    def compare(self, previous: np.ndarray, current: np.ndarray) -> ChangeResult:
+        if previous.shape != current.shape:
+            return ChangeResult(True, 0.0, "shape")
+        mad = float(np.abs(previous.astype(np.int16) - current).mean())
+        return self._cascade(previous, current, mad)
+
+    def first_change(self, reference: np.ndarray, stack: np.ndarray) -> int:
+        """
+        Returns the index of the first frame in `stack` (N x H x W) that differs
+        from `reference`, or -1. The mean absolute difference of the whole stack is
+        computed in one vectorized pass; only ambiguous frames go through the rest
+        of the cascade.
+        """
+        if len(stack) == 0:
+            return -1
+        mads = np.abs(stack.astype(np.int16) - reference).mean(axis=(1, 2))
+        for i in np.flatnonzero(mads >= self.mad_same):
+            if mads[i] > self.mad_changed or self._cascade(reference, stack[i], float(mads[i])).changed:
+                return int(i)
+        return -1
+
+    def _cascade(self, previous: np.ndarray, current: np.ndarray, mad: float) -> ChangeResult:
+        if mad < self.mad_same:
+            return ChangeResult(False, mad, "mad")
+        if mad > self.mad_changed:
+            return ChangeResult(True, mad, "mad")
+
+        hash_distance = int(np.count_nonzero(difference_hash(previous) != difference_hash(current)))
+        if hash_distance > self.hash_changed:
+            return ChangeResult(True, float(hash_distance), "dhash")
+
+        hist_distance = float(np.abs(histogram(previous) - histogram(current)).sum()) / 2
+        if hist_distance > self.hist_changed:
+            return ChangeResult(True, hist_distance, "histogram")
+
+        score = mean_ssim(previous, current)
+        return ChangeResult(score <= self.ssim_threshold, float(score), "ssim")
@@ -0,0 +1,507 @@
+# runs the focus monitor engine in a child process, so its CPU work never competes with Tk for the GIL
+
+import heapq
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image
+
+from core.models import BoxSet
+from utils.capture_backends import CaptureBackend, create_capture_backend
+from utils.metrics import metrics, span
+
+# how often the UI process drains engine events
+ENGINE_POLL_MS = 20
+# how often the engine sends its metrics to the UI process
+METRICS_INTERVAL = 2.0
+
+
+class SharedFrameWriter:
+    """UI side: copies grabbed frames into a shared memory segment, replaced by a larger one when needed."""
+    def __init__(self):
+        self.shm = None
+
+    def write(self, image: Image.Image) -> tuple:
+        """Returns the (segment name, mode, size) header the engine needs to read the frame back."""
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+        pixels = np.asarray(image)
+        if self.shm is None or self.shm.size < pixels.nbytes:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(pixels.nbytes, 1))
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=self.shm.buf)[...] = pixels
+        return self.shm.name, image.mode, image.size
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Opens a segment another process owns, without handing it to this process's resource tracker."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # before 3.13 attaching registers the segment too, so the tracker would warn about it or unlink it at exit
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class CaptureServer:
+    """
+    UI side: answers the engine's capture calls from a daemon thread, with
+    the real backend. Window queries are answered over the pipe; frames are
+    written to shared memory and only their header is sent.
+    """
+    CALLS = ('get_active_window', 'list_windows', 'screen_bbox')
+
+    def __init__(self, backend: CaptureBackend, conn, logger: logging.Logger):
+        self.backend = backend
+        self.conn = conn
+        self.logger = logger
+        self.frames = SharedFrameWriter()
+        self.thread = threading.Thread(target=self._serve, name="capture-server", daemon=True)
+
+    def start(self) -> 'CaptureServer':
+        self.thread.start()
+        return self
+
+    def _serve(self):
+        while True:
+            try:
+                method, *args = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                if method == 'grab':
+                    image = self.backend.grab(*args)
+                    with span('capture.share'):
+                        reply = (True, self.frames.write(image))
+                elif method in self.CALLS:
+                    reply = (True, getattr(self.backend, method)())
+                else:
+                    reply = (False, f"unknown capture call '{method}'")
+            except Exception as e:
+                reply = (False, str(e))
+            try:
+                self.conn.send(reply)
+            except OSError:
+                break
+        self.conn.close()
+        self.frames.close()
+
+
+class SharedMemoryCaptureBackend(CaptureBackend):
+    """Engine side: a capture backend whose calls are served by the UI process's CaptureServer."""
+    def __init__(self, conn, remote_name: str = "remote"):
+        super().__init__()
+        self.name = f"{remote_name} via shared memory"
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._shm = None
+
+    def _call(self, method: str, *args):
+        with self._lock:
+            return self._request(method, *args)
+
+    def _request(self, method: str, *args):
+        # the caller holds the lock
+        self._conn.send((method, *args))
+        ok, value = self._conn.recv()
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def get_active_window(self):
+        return self._call('get_active_window')
+
+    def list_windows(self):
+        return self._call('list_windows')
+
+    def screen_bbox(self):
+        return self._call('screen_bbox')
+
+    def _grab(self, bbox: tuple) -> Image.Image:
+        # the lock is held until the frame is copied out: the next grab overwrites the segment
+        with self._lock:
+            name, mode, size = self._request('grab', tuple(bbox))
+            if self._shm is None or self._shm.name != name:
+                if self._shm is not None:
+                    self._shm.close()
+                self._shm = attach_shared_memory(name)
+            nbytes = size[0] * size[1] * Image.getmodebands(mode)
+            with self._shm.buf[:nbytes] as pixels:
+                return Image.frombytes(mode, size, pixels)
+
+    def close(self):
+        with self._lock:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm = None
+
+
+class AfterLoop:
+    """
+    Stands in for the Tk root outside the UI process: `after` callbacks from
+    any thread run, in due order, on the thread that calls `run_once`.
+    """
+    def __init__(self, logger: logging.Logger | None = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._timers = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def after(self, ms: int, func, *args):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + ms / 1000, self._seq, func, args))
+            self._cond.notify()
+            return self._seq
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def run_once(self, timeout: float):
+        """Waits up to `timeout` for callbacks to fall due and runs them."""
+        with self._cond:
+            now = time.monotonic()
+            if not self._timers or self._timers[0][0] > now:
+                wait = timeout if not self._timers else min(timeout, self._timers[0][0] - now)
+                self._cond.wait(max(wait, 0))
+                now = time.monotonic()
+            due = []
+            while self._timers and self._timers[0][0] <= now:
+                due.append(heapq.heappop(self._timers))
+        for _, _, func, args in due:
+            try:
+                func(*args)
+            except Exception as e:
+                self.logger.error(f"Engine callback {getattr(func, '__name__', func)} failed: {e}")
+
+
+class _ForwardingConfig:
+    """The engine's settings: a snapshot whose saved changes are sent to the UI process, which owns the file."""
+    def __init__(self, settings: dict, events):
+        self.settings = dict(settings)
+        self._events = events
+        self._changed = {}
+
+    def get(self, key, default=None):
+        return self.settings.get(key, default)
+
+    def set(self, key, value):
+        self.settings[key] = value
+        self._changed[key] = value
+
+    def save(self):
+        if self._changed:
+            self._events.put(('config', self._changed))
+            self._changed = {}
+
+
+class _OverlayRelay:
+    """Sends what the engine would draw to the UI process's overlay."""
+    def __init__(self, events):
+        self._events = events
+
+    def update_or_create_overlay(self, areas):
+        self._events.put(('boxes', BoxSet.from_areas(areas)))
+
+    def set_screen_bbox(self, bbox):
+        self._events.put(('screen_bbox', bbox))
+
+    def hide(self):
+        self._events.put(('hide',))
+
+
+class _EventLogHandler(logging.handlers.QueueHandler):
+    # records are formatted here (prepare) so they pickle; the UI process handles them as its own
+    def enqueue(self, record):
+        self.queue.put(('log', record))
+
+
+def _build_api(config, logger):
+    """The engine's own provider router, set up like the UI's from the settings snapshot."""
+    from api.http_transport import HttpTransport
+    from api.openai_manager import OpenAIAPIManager
+    from api.provider_router import OPENAI, WORKER, ProviderRouter, WorkerTextProvider
+    from api.worker_api import WorkerTextAPIManager
+
+    transport = HttpTransport(config, logger)
+    openai_manager = OpenAIAPIManager(logger, transport)
+    openai_manager.configure(config.get('api_key'), base_url=config.get('openai_base_url'))
+    worker = WorkerTextProvider(WorkerTextAPIManager(logger, transport), lambda: config.get('worker_url', ''))
+    return ProviderRouter(config, {OPENAI: openai_manager, WORKER: worker}, logger,
+                          preferred=config.get('provider', OPENAI))
+
+
+def engine_main(settings: dict, focus_topic: str, capture_conn, events, commands):
+    """Entry point of the engine process: runs a FocusMonitorManager until told to stop."""
+    from core.focus_monitor_manager import FocusMonitorManager
+
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(_EventLogHandler(events))
+    root_logger.setLevel(logging.DEBUG)
+    logger = logging.getLogger('engine')
+    metrics.enabled = settings.get('metrics_enabled', True)
+
+    config = _ForwardingConfig(settings, events)
+    loop = AfterLoop(logger)
+    backend = SharedMemoryCaptureBackend(capture_conn, settings.get('engine_capture_backend', 'remote'))
+    manager = FocusMonitorManager(
+        loop, config, _build_api(config, logger), _OverlayRelay(events),
+        {
+            'on_budget': lambda text: events.put(('budget', text)),
+            'show_message': lambda *args: events.put(('message', args)),
+        },
+        logger, capture_backend=backend,
+    )
+    manager.start_monitoring(focus_topic)
+
+    parent = multiprocessing.parent_process()
+    last_metrics = 0.0
+    while manager.monitoring:
+        loop.run_once(0.05)
+        try:
+            command = commands.get_nowait()
+        except queue.Empty:
+            command = None
+        if command == 'stop' or (parent is not None and not parent.is_alive()):
+            manager.shutdown()
+            break
+        if command == 'reset_metrics':
+            metrics.reset()
+            events.put(('metrics_reset',))
+        if time.monotonic() - last_metrics >= METRICS_INTERVAL:
+            last_metrics = time.monotonic()
+            events.put(('metrics', metrics.snapshot()))
+    # results queued while stopping still carry config and log events
+    loop.run_once(0)
+    events.put(('metrics', metrics.snapshot()))
+    events.put(('stopped',))
+    backend.close()
+
+
+class MonitorEngineProcess:
+    """
+    Runs the FocusMonitorManager engine in a separate process and presents the
+    same start/stop interface to the app.
+
+    The UI process keeps the capture backend and serves grabs on a thread;
+    the pixels cross into the engine through shared memory, not a pickle.
+    Resizing, change detection, OCR, the AI calls and box mapping all run in
+    the engine. Only boxes (as BoxSet columns), status, settings changes,
+    log records and metrics come back, on a queue the Tk thread drains every
+    ENGINE_POLL_MS.
+
+    If the engine dies, the app keeps running. The overlay is cleared and the
+    engine is restarted up to 'engine_max_restarts' times per session.
+    """
+    def __init__(self, root, config, api_manager, overlay_manager, ui_callbacks, logger, engine_settings=None):
+        self.root = root
+        self.config = config
+        self.api_manager = api_manager
+        self.overlay_manager = overlay_manager
+        self.ui_callbacks = ui_callbacks
+        self.logger = logger
+        # extra settings for the engine that live outside the config, e.g. the API key entered in the UI
+        self.engine_settings = engine_settings or (lambda: {})
+
+        self.monitoring = False
+        self.focus_topic = ""
+        self.capture_backend = None
+        self.process = None
+        self.capture_server = None
+        self.restarts = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._events = None
+        self._commands = None
+        self._engine_stopped = False
+        # snapshots the engine sent before a reset reached it are stale
+        self._metrics_reset_pending = False
+        self._poll_id = None
+
+    def start_monitoring(self, focus_topic: str):
+        """Validates inputs and starts the engine process."""
+        if not focus_topic:
+            self.ui_callbacks['show_message']('warning', "Input Required", "Please enter a focus topic.")
+            return
+        if not self.api_manager.is_available():
+            self.ui_callbacks['show_message']('error', "API Error", "API is not configured or offline. Cannot start.")
+            return
+        if self.process is not None:
+            self.logger.warning("The previous monitor engine is still shutting down; try again in a moment.")
+            return
+
+        self.focus_topic = focus_topic
+        self.config.set('last_focus_topic', self.focus_topic)
+        self.config.save()
+        self.monitoring = True
+        self.restarts = 0
+        if self.ui_callbacks.get('on_start'):
+            self.ui_callbacks['on_start']()
+
+        if self.capture_backend is None:
+            self.capture_backend = create_capture_backend(self.config, self.logger)
+        self._spawn()
+        self.logger.info(f"Monitoring started for topic: '{self.focus_topic}' "
+                         f"(engine pid {self.process.pid}, capture: {self.capture_backend.name})")
+
+    def stop_monitoring(self):
+        """Asks the engine to stop; it saves its state and exits on its own, and is reaped by `_poll`."""
+        if not self.monitoring:
+            return
+        self.monitoring = False
+        if self._commands is not None:
+            self._commands.put('stop')
+        self.overlay_manager.hide()
+        if self.ui_callbacks.get('on_stop'):
+            self.ui_callbacks['on_stop']()
+        self.logger.info("Monitoring stopped.")
+
+    def toggle_monitoring(self, get_focus_topic_func):
+        """Toggles the monitoring state."""
+        if self.monitoring:
+            self.stop_monitoring()
+        else:
+            self.start_monitoring(get_focus_topic_func())
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stops monitoring and waits for the engine, so its last settings changes are saved."""
+        self.stop_monitoring()
+        if self.process is not None:
+            # the engine can't exit while its last events don't fit in the queue, so keep reading it
+            deadline = time.monotonic() + timeout
+            while self.process.is_alive() and time.monotonic() < deadline:
+                self._drain()
+                self.process.join(0.05)
+            self._drain()
+            self._reap()
+        if self.capture_backend is not None:
+            self.capture_backend.close()
+
+    def reset_metrics(self):
+        """Asks a running engine to clear its own metrics, which it otherwise keeps sending."""
+        if self._commands is not None:
+            self._metrics_reset_pending = True
+            self._commands.put('reset_metrics')
+
+    def _spawn(self):
+        settings = dict(self.config.settings)
+        settings.update(self.engine_settings())
+        settings['engine_capture_backend'] = self.capture_backend.name
+        parent_conn, child_conn = self._context.Pipe()
+        self._events = self._context.Queue()
+        self._commands = self._context.Queue()
+        self._engine_stopped = False
+        self._metrics_reset_pending = False
+        self.process = self._context.Process(
+            target=engine_main, name="focus-engine", daemon=True,
+            args=(settings, self.focus_topic, child_conn, self._events, self._commands),
+        )
+        self.process.start()
+        child_conn.close()
+        self.capture_server = CaptureServer(self.capture_backend, parent_conn, self.logger).start()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(ENGINE_POLL_MS, self._poll)
+
+    def _poll(self):
+        # runs on the Tk thread
+        self._poll_id = None
+        self._drain()
+        if self.process is not None and not self.process.is_alive():
+            # whatever the engine sent before exiting has arrived once its queue is empty
+            self._drain()
+            exitcode = self.process.exitcode
+            crashed = not self._engine_stopped
+            self._reap()
+            if crashed and self.monitoring:
+                self._on_engine_crash(exitcode)
+            elif self.monitoring:
+                # the engine declined to start (e.g. its API check failed); its message says why
+                self.monitoring = False
+                self.overlay_manager.hide()
+                if self.ui_callbacks.get('on_stop'):
+                    self.ui_callbacks['on_stop']()
+        if self.process is not None:
+            self._poll_id = self.root.after(ENGINE_POLL_MS, self._poll)
+
+    def _drain(self):
+        while self._events is not None:
+            try:
+                event = self._events.get_nowait()
+            except (queue.Empty, OSError, EOFError):
+                return
+            self._handle(event)
+
+    def _handle(self, event: tuple):
+        kind = event[0]
+        if kind == 'boxes':
+            if self.monitoring:
+                self.overlay_manager.update_or_create_overlay(event[1])
+        elif kind == 'hide':
+            self.overlay_manager.hide()
+        elif kind == 'screen_bbox':
+            self.overlay_manager.set_screen_bbox(event[1])
+        elif kind == 'budget':
+            if self.monitoring and self.ui_callbacks.get('on_budget'):
+                self.ui_callbacks['on_budget'](event[1])
+        elif kind == 'message':
+            self.ui_callbacks['show_message'](*event[1])
+        elif kind == 'config':
+            for key, value in event[1].items():
+                self.config.set(key, value)
+            self.config.save()
+        elif kind == 'log':
+            record = event[1]
+            logger = logging.getLogger(record.name)
+            if logger.isEnabledFor(record.levelno):
+                logger.handle(record)
+        elif kind == 'metrics':
+            if not self._metrics_reset_pending:
+                metrics.set_remote('engine', event[1])
+        elif kind == 'metrics_reset':
+            self._metrics_reset_pending = False
+        elif kind == 'stopped':
+            self._engine_stopped = True
+
+    def _reap(self):
+        if self.process.is_alive():
+            self.logger.warning("Monitor engine did not exit in time; terminating it.")
+            self.process.terminate()
+            self.process.join(1)
+        self.process = None
+        self.capture_server = None
+        self._events.close()
+        self._commands.close()
+        self._events = self._commands = None
+
+    def _on_engine_crash(self, exitcode):
+        self.overlay_manager.hide()
+        max_restarts = self.config.get('engine_max_restarts', 3)
+        if self.restarts < max_restarts:
+            self.restarts += 1
+            self.logger.error(f"Monitor engine exited unexpectedly (code {exitcode}); "
+                              f"restarting it ({self.restarts}/{max_restarts}).")
+            self._spawn()
+            return
+        self.logger.error(f"Monitor engine exited unexpectedly (code {exitcode}); giving up after "
+                          f"{max_restarts} restarts.")
+        self.monitoring = False
+        if self.ui_callbacks.get('on_stop'):
+            self.ui_callbacks['on_stop']()
+        self.ui_callbacks['show_message']('error', "Monitoring Stopped",
+                                          "The monitoring engine stopped unexpectedly. See the log for details.")
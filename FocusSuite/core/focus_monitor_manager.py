@@ -1,15 +1,18 @@
-import json
 import logging
 import threading
 import time
 
 import numpy as np
-import pytesseract
-from PIL import ImageGrab
-from skimage.metrics import structural_similarity as ssim
 
-from core.models import DistractionArea
-from utils import windows_utils
+from core.budget_governor import BudgetedAPI, BudgetGovernor
+from core.change_detection import ChangeDetector, estimate_translation
+from core.models import BoxSet, CaptureFrame
+from core.multi_window import MultiWindowMonitor
+from core.pipeline import GenerationCounter, LatestSlot
+from core.screen_analyzer import ScreenAnalyzer
+from core.window_cache import WindowCache, window_key
+from utils.capture_backends import create_capture_backend, matches_whitelist
+from utils.metrics import metrics, span
 
 
 class FocusMonitorManager:
@@ -17,8 +20,25 @@ class FocusMonitorManager:
     Manages the entire screen distraction monitoring feature.
     This class encapsulates the state, logic, and processing loop for identifying
     and reporting on-screen distractions.
+
+    Capture and analysis run as separate stages joined by a latest-wins slot, so a
+    slow AI call never blocks capture. Every significant screen change advances the
+    screen generation; results from an older generation are dropped.
+
+    Boxes are kept window-relative. When the window only moves they are redrawn at
+    the new position; when its content only scrolls they are shifted and just the
+    newly exposed strip is analyzed. The last complete result of recently used
+    windows is cached, so switching back to an unchanged window restores its boxes
+    at once and only revalidates them in the background.
+
+    A budget governor counts AI calls, tokens and CPU time; as usage nears the
+    configured budgets it stretches the capture interval, enlarges AI chunks and
+    loosens the relevance filter, and it pauses analysis once a budget is spent.
+
+    With 'monitor_mode' set to 'multi_window' every visible window on every
+    monitor is watched instead, by a MultiWindowMonitor.
     """
-    def __init__(self, root, config, api_manager, overlay_manager, ui_callbacks, logger):
+    def __init__(self, root, config, api_manager, overlay_manager, ui_callbacks, logger, capture_backend=None):
         self.root = root
         self.config = config
         self.api_manager = api_manager
@@ -28,7 +48,31 @@ class FocusMonitorManager:
 
         self.monitoring = False
         self.monitor_thread = None
+        self.analysis_thread = None
         self.focus_topic = ""
+        self.capture_backend = capture_backend
+
+        self.governor = BudgetGovernor(self.config, self.logger)
+        self.analyzer = ScreenAnalyzer(self.config, BudgetedAPI(self.api_manager, self.governor), self.logger)
+        self.change_detector = ChangeDetector(ssim_threshold=0.98)
+        self.screen_generation = GenerationCounter()
+        self._analysis_slot = LatestSlot()
+
+        # what the overlay currently shows, in window coordinates, and whether it covers the whole window
+        self._shown_lock = threading.Lock()
+        self._shown_areas = BoxSet()
+        self._shown_complete = False
+        # the window-relative strip still being analyzed after a scroll; boxes outside it are valid
+        self._shown_pending = None
+        self._strip_failed = threading.Event()
+        self._window_bbox = None
+        self._translations_since_full = 0
+        self.window_cache = WindowCache(self.config.get('window_cache_size', 16))
+        self._window_key = None
+        self._budget_blocked = False
+        self._last_budget_report = 0.0
+        self._last_budget_log = 0.0
+        self.multi_window = None
 
     def start_monitoring(self, focus_topic: str):
         """Validates inputs and starts the monitoring loop in a background thread."""
@@ -47,22 +91,50 @@ class FocusMonitorManager:
         if self.ui_callbacks.get('on_start'):
             self.ui_callbacks['on_start']() 
 
-        self.logger.info(f"Monitoring started for topic: '{self.focus_topic}'")
+        if self.capture_backend is None:
+            self.capture_backend = create_capture_backend(self.config, self.logger)
+        self.logger.info(f"Monitoring started for topic: '{self.focus_topic}' (capture: {self.capture_backend.name})")
+        self._analysis_slot.reopen()
+        # cached boxes were judged against the previous topic
+        self.window_cache.clear()
+        self._window_key = None
+        self._strip_failed.clear()
+        if self.config.get('monitor_mode', 'active_window') == 'multi_window':
+            self._start_multi_window()
+            return
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.analysis_thread = threading.Thread(target=self._analysis_loop, daemon=True)
         self.monitor_thread.start()
+        self.analysis_thread.start()
 
     def stop_monitoring(self):
         """Stops the monitoring loop and cleans up."""
         self.monitoring = False
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=2)
+        self.screen_generation.advance()
+        self._analysis_slot.close()
+        if self.multi_window is not None:
+            self.multi_window.stop()
+            self.multi_window = None
+        for thread in (self.monitor_thread, self.analysis_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=2)
         self.overlay_manager.hide()
+
+        self.analyzer.log_filter_report()
+        self.config.set('learned_chrome', self.analyzer.relevance_filter.learned_stoplists())
+        self.config.save()
         
         if self.ui_callbacks.get('on_stop'):
             self.ui_callbacks['on_stop']()
 
         self.logger.info("Monitoring stopped.")
 
+    def shutdown(self):
+        """Stops monitoring, if running, and releases the analyzer's worker threads."""
+        if self.monitoring:
+            self.stop_monitoring()
+        self.analyzer.shutdown()
+
     def toggle_monitoring(self, get_focus_topic_func):
         """Toggles the monitoring state."""
         if self.monitoring:
@@ -71,91 +143,294 @@ class FocusMonitorManager:
             topic = get_focus_topic_func()
             self.start_monitoring(topic)
             
+    def _start_multi_window(self):
+        self.overlay_manager.set_screen_bbox(self.capture_backend.screen_bbox())
+        self.multi_window = MultiWindowMonitor(
+            self.config, self.logger, self.capture_backend, self.analyzer, self.governor,
+            publish=lambda areas: self.root.after(0, self._draw_composite, areas),
+            on_tick=self._update_budget,
+        )
+        self.multi_window.start(self.focus_topic)
+
+    def _draw_composite(self, areas: BoxSet):
+        # runs on the Tk thread; the boxes are already in screen coordinates
+        if self.monitoring and self.multi_window is not None:
+            self.overlay_manager.update_or_create_overlay(areas)
+
     def _monitor_loop(self):
-        """The main loop that captures, compares, and processes screenshots."""
+        """Capture stage: grabs the active window and hands significant changes to analysis."""
         last_screenshot_gray = None
         self.logger.info("Monitor loop started.")
         while self.monitoring:
-            time.sleep(2) 
+            time.sleep(self.governor.capture_interval(self.config.get('capture_interval', 2.0)))
+            self._update_budget()
+
+            window = self.capture_backend.get_active_window()
+            if window is None:
+                continue
 
-            if windows_utils.is_whitelisted(self.config.get('whitelist', [])):
-                self.overlay_manager.hide()
+            if matches_whitelist(window.title, self.config.get('whitelist', [])):
+                if last_screenshot_gray is not None:
+                    self._remember_window(last_screenshot_gray)
+                    self._window_key = None
+                    self._invalidate_screen()
+                last_screenshot_gray = None
                 continue
 
+            bbox = window.bbox
             try:
-                bbox = windows_utils.get_active_window_bbox()
-                if not bbox:
-                    continue
-                screenshot = ImageGrab.grab(bbox=bbox)
+                with span('monitor.grab'):
+                    screenshot = self.capture_backend.grab(bbox)
             except Exception as e:
                 self.logger.error(f"Failed to grab screenshot: {e}")
+                metrics.inc('monitor.grab_errors')
                 continue
+            metrics.inc('monitor.frames')
+            self.logger.debug(
+                f"Captured {screenshot.width}x{screenshot.height} via {self.capture_backend.name} "
+                f"in {self.capture_backend.last_grab_seconds * 1000:.1f} ms "
+                f"(mean {self.capture_backend.mean_grab_ms:.1f} ms)."
+            )
+
+            with span('monitor.downscale'):
+                current_screenshot_small = screenshot.resize((256, 144))
+                current_screenshot_gray = np.array(current_screenshot_small.convert('L'))
 
-            current_screenshot_small = screenshot.resize((256, 144))
-            current_screenshot_gray = np.array(current_screenshot_small.convert('L'))
+            key = window_key(window)
+            if key != self._window_key:
+                previous_key = self._window_key
+                self._remember_window(last_screenshot_gray)
+                self._window_key = key
+                if self._restore_window(window, current_screenshot_gray, screenshot):
+                    last_screenshot_gray = current_screenshot_gray
+                    continue
+                # only a retitled window (same handle and size) is still worth comparing against
+                if previous_key is None or key[0] is None or (previous_key[0], previous_key[2:]) != (key[0], key[2:]):
+                    last_screenshot_gray = None
 
-            if last_screenshot_gray is not None:
-                score, _ = ssim(last_screenshot_gray, current_screenshot_gray, full=True)
-                if score > 0.98: 
+            # a strip whose analysis failed leaves its part of the window unchecked
+            retry_full = self._strip_failed.is_set()
+            if last_screenshot_gray is not None and not retry_full:
+                with span('monitor.change_detection'):
+                    change = self.change_detector.compare(last_screenshot_gray, current_screenshot_gray)
+                if not change.changed:
+                    metrics.inc('monitor.frames_unchanged')
+                    if bbox != self._window_bbox:
+                        self._follow_window(bbox)
                     continue
-                self.logger.info(f"Significant screen change detected (SSIM Score: {score:.4f}).")
+
+            # the reference frame is kept, so the change is picked up again once budget frees up
+            if not self._budget_allows(bbox):
+                continue
+
+            if retry_full:
+                self.logger.info("Scrolled strip could not be analyzed; analyzing the whole window.")
+            elif last_screenshot_gray is not None:
+                if self._reuse_translated(last_screenshot_gray, current_screenshot_gray, screenshot, bbox):
+                    last_screenshot_gray = current_screenshot_gray
+                    continue
+                self.logger.info(f"Significant screen change detected ({change.metric}: {change.score:.4f}).")
 
             last_screenshot_gray = current_screenshot_gray
-            distractions = self._process_screenshot(screenshot)
-            
-            if not self.monitoring: 
-                break
+            self._translations_since_full = 0
+            self._strip_failed.clear()
+            generation = self._invalidate_screen(bbox)
+            self._analysis_slot.put(CaptureFrame(generation, screenshot, bbox, time.monotonic()))
 
-            adjusted_distractions = []
-            for d in distractions:
-                d.x += bbox[0]
-                d.y += bbox[1]
-                adjusted_distractions.append(d)
+    def _remember_window(self, gray):
+        """Stores the outgoing window's boxes, if they are a complete result for its last capture."""
+        if not self.config.get('window_cache', True) or self._window_key is None or gray is None:
+            return
+        with self._shown_lock:
+            areas, complete = self._shown_areas, self._shown_complete
+        if complete:
+            self.window_cache.put(self._window_key, gray, areas)
 
-            self.root.after(0, self.overlay_manager.update_or_create_overlay, adjusted_distractions)
-            
-    def _process_screenshot(self, screenshot: 'Image.Image') -> list[DistractionArea]:
+    def _restore_window(self, window, gray, screenshot) -> bool:
         """
-        Performs OCR on the screenshot, sends text to the AI for analysis,
-        and maps distracting phrases back to their coordinates.
+        Shows the cached boxes of a window switched back to, if its content still
+        matches, and queues a revalidation that doesn't hold them back.
         """
-        try:
-            ocr_data = pytesseract.image_to_data(
-                screenshot, output_type=pytesseract.Output.DICT, config='--psm 6'
-            )
-            full_text = " ".join([word for i, word in enumerate(ocr_data['text']) if word.strip() and int(ocr_data['conf'][i]) > 40])
-            if not full_text:
-                return []
-
-            prompt = f"Review the text from a screen. The user's goal is '{self.focus_topic}'. Identify unrelated text. Text: \"{full_text[:3000]}\""
-            response_text = self.api_manager.generate_with_retry(prompt)
-            if not response_text:
-                return []
-
-            data = json.loads(response_text)
-            distracting_phrases = data.get("distractions", [])
-            if not isinstance(distracting_phrases, list) or not distracting_phrases:
-                return []
-
-            self.logger.info(f"Distractions found: {distracting_phrases}")
-
-            distraction_areas = []
-            for phrase in distracting_phrases:
-                phrase_words = phrase.lower().strip().split()
-                if not phrase_words: continue
-
-                for i in range(len(ocr_data['text']) - len(phrase_words) + 1):
-                    ocr_phrase_segment = [ocr_data['text'][i + j].lower() for j in range(len(phrase_words))]
-                    if " ".join(phrase_words) in " ".join(ocr_phrase_segment):
-                        x = ocr_data['left'][i]
-                        y = ocr_data['top'][i]
-                        w = (ocr_data['left'][i + len(phrase_words) - 1] + ocr_data['width'][i + len(phrase_words) - 1]) - x
-                        h = max(ocr_data['height'][k] for k in range(i, i + len(phrase_words)))
-                        distraction_areas.append(DistractionArea(x, y, w, h, 1.0, phrase))
-            return distraction_areas
-        except json.JSONDecodeError as e:
-            self.logger.warning(f"Could not parse JSON from API response: {response_text}. Error: {e}")
-            return []
-        except Exception as e:
-            self.logger.error(f"Error processing screenshot: {e}")
-            return []
\ No newline at end of file
+        if not self.config.get('window_cache', True):
+            return False
+        entry = self.window_cache.get(self._window_key)
+        if entry is None:
+            return False
+        if self.change_detector.compare(entry.fingerprint, gray).changed:
+            self.window_cache.discard(self._window_key)
+            return False
+
+        self.logger.info(f"Restored {len(entry.areas)} cached boxes for window '{window.title}'.")
+        metrics.inc('window_cache.hits')
+        self._translations_since_full = 0
+        self._strip_failed.clear()
+        generation = self.screen_generation.advance()
+        self._window_bbox = window.bbox
+        self.root.after(0, self._apply_result, generation, entry.areas, True)
+        if self.config.get('window_cache_revalidate', True) and self.governor.allow_analysis():
+            self._analysis_slot.put(CaptureFrame(generation, screenshot, window.bbox, time.monotonic(), revalidate=True))
+        return True
+
+    def _update_budget(self):
+        """Samples usage, applies throttle level changes and reports usage to the UI and log."""
+        self.governor.sample_cpu()
+        if self.governor.adapt():
+            self.analyzer.apply_throttle(self.governor.chunk_scale(), *self.governor.filter_offsets())
+
+        now = time.monotonic()
+        if now - self._last_budget_report < self.config.get('budget_report_interval', 5.0):
+            return
+        self._last_budget_report = now
+        text = self.governor.describe()
+        if self.ui_callbacks.get('on_budget'):
+            self.root.after(0, self.ui_callbacks['on_budget'], text)
+        if now - self._last_budget_log >= 60:
+            self._last_budget_log = now
+            self.logger.info(f"Budget usage: {text}")
+
+    def _budget_allows(self, bbox: tuple) -> bool:
+        if self.governor.allow_analysis():
+            self._budget_blocked = False
+            return True
+        if not self._budget_blocked:
+            self._budget_blocked = True
+            self.logger.warning(f"AI budget spent ({self.governor.describe()}); analysis paused until it frees up.")
+            # the boxes on screen belong to content that has changed
+            self._invalidate_screen(bbox)
+        return False
+
+    def _follow_window(self, bbox: tuple):
+        """The window moved but its content didn't: redraw the same boxes at the new position."""
+        self._window_bbox = bbox
+        self.root.after(0, self._redraw, self.screen_generation.value)
+
+    def _reuse_translated(self, previous_gray, current_gray, screenshot, bbox) -> bool:
+        """
+        If the content only scrolled, shifts the shown boxes and queues just the newly
+        exposed strip for analysis. A strip from an earlier scroll that is still being
+        analyzed moves along and is analyzed together with the new one, so scrolls
+        chain up to `max_translation_reuse`. Returns False when a full analysis is needed.
+        """
+        if not self.config.get('scroll_reuse', True) or self._window_bbox is None:
+            return False
+        previous_size = (self._window_bbox[2] - self._window_bbox[0], self._window_bbox[3] - self._window_bbox[1])
+        if previous_size != screenshot.size:
+            return False
+        with self._shown_lock:
+            shown, complete, pending = self._shown_areas, self._shown_complete, self._shown_pending
+        if (not complete and pending is None) or self._translations_since_full >= self.config.get('max_translation_reuse', 8):
+            return False
+
+        with span('monitor.scroll_estimate'):
+            shift = estimate_translation(previous_gray, current_gray)
+        if shift is None:
+            return False
+        width, height = screenshot.size
+        dx = round(shift[0] * width / current_gray.shape[1])
+        dy = round(shift[1] * height / current_gray.shape[0])
+        if (dx and dy) or (not dx and not dy):
+            return False
+
+        # the exposed strip, padded so lines cut in half at its edge are read whole
+        margin = self.config.get('scroll_strip_margin', 40)
+        if dy < 0:
+            strip = (0, max(height + dy - margin, 0), width, height)
+        elif dy > 0:
+            strip = (0, 0, width, min(dy + margin, height))
+        elif dx < 0:
+            strip = (max(width + dx - margin, 0), 0, width, height)
+        else:
+            strip = (0, 0, min(dx + margin, width), height)
+        if not complete:
+            left, top = max(pending[0] + dx, 0), max(pending[1] + dy, 0)
+            right, bottom = min(pending[2] + dx, width), min(pending[3] + dy, height)
+            if left < right and top < bottom:
+                strip = (min(strip[0], left), min(strip[1], top), max(strip[2], right), max(strip[3], bottom))
+
+        moved = shown.translate(dx, dy)
+        kept = moved[moved.centers_within((0, 0, width, height)) & ~moved.centers_within(strip)]
+
+        self._translations_since_full += 1
+        metrics.inc('monitor.scroll_reuses')
+        self.logger.debug(f"Content scrolled by ({dx}, {dy}); kept {len(kept)} boxes, analyzing strip {strip}.")
+        generation = self.screen_generation.advance()
+        self._window_bbox = bbox
+        self.root.after(0, self._apply_result, generation, kept, False, None, strip)
+        self._analysis_slot.put(CaptureFrame(
+            generation, screenshot.crop(strip), bbox, time.monotonic(), base_areas=kept, crop_origin=strip[:2],
+            strip=strip,
+        ))
+        return True
+
+    def _analysis_loop(self):
+        """Analysis stage: OCR and AI on the newest capture, dropping superseded work."""
+        while self.monitoring:
+            frame = self._analysis_slot.get(timeout=0.5)
+            if frame is None or not self.screen_generation.is_current(frame.generation):
+                continue
+            metrics.observe('analysis.queue_wait', time.monotonic() - frame.captured_at)
+
+            def combine(areas, frame=frame):
+                # the strip overlaps the kept boxes by the margin, so boxes found twice are merged
+                return self._merge(frame.base_areas + areas.translate(*frame.crop_origin))
+
+            def show_partial(areas, frame=frame):
+                self.root.after(0, self._apply_result, frame.generation, combine(areas), False, None, frame.strip)
+
+            failed = []
+
+            with span('analysis.total'):
+                distractions = self.analyzer.analyze(
+                    frame.image, self.focus_topic,
+                    is_stale=lambda: not (self.monitoring and self.screen_generation.is_current(frame.generation)),
+                    on_partial=None if frame.revalidate else show_partial,
+                    on_error=lambda: failed.append(True),
+                )
+            if distractions is None or not self.monitoring:
+                metrics.inc('analysis.superseded')
+                continue
+
+            if failed and frame.strip is not None:
+                # keep what was found, but don't chain further scrolls onto an unchecked strip
+                self.root.after(0, self._apply_result, frame.generation, combine(distractions))
+                self._strip_failed.set()
+                continue
+            self.root.after(0, self._apply_result, frame.generation, combine(distractions), True, frame.captured_at)
+
+    def _merge(self, areas: BoxSet) -> BoxSet:
+        """Collapses overlapping boxes and neighbouring boxes on the same line into one."""
+        if not self.config.get('merge_boxes', True):
+            return areas
+        return areas.merge(self.config.get('box_merge_iou', 0.3), self.config.get('box_merge_gap', 6))
+
+    def _invalidate_screen(self, bbox: tuple | None = None) -> int:
+        """Marks everything on screen as outdated and clears boxes that no longer apply."""
+        generation = self.screen_generation.advance()
+        self._window_bbox = bbox
+        self.root.after(0, self._apply_result, generation, BoxSet())
+        return generation
+
+    def _apply_result(self, generation: int, distractions: BoxSet, complete: bool = False,
+                      captured_at: float | None = None, pending: tuple | None = None):
+        # runs on the Tk thread; a newer capture may have arrived since this was queued
+        if not self.monitoring or not self.screen_generation.is_current(generation):
+            return
+        if captured_at is not None:
+            # capture to boxes on screen, including the wait for the Tk thread
+            metrics.observe('monitor.end_to_end', time.monotonic() - captured_at)
+        with self._shown_lock:
+            self._shown_areas = BoxSet.from_areas(distractions)
+            self._shown_complete = complete
+            self._shown_pending = None if complete else pending
+        self._redraw(generation)
+
+    def _redraw(self, generation: int):
+        if not self.monitoring or not self.screen_generation.is_current(generation):
+            return
+        bbox = self._window_bbox
+        with self._shown_lock:
+            areas = self._shown_areas
+        if bbox is None or not len(areas):
+            self.overlay_manager.update_or_create_overlay(BoxSet())
+            return
+        self.overlay_manager.update_or_create_overlay(areas.translate(bbox[0], bbox[1]))
@@ -1,6 +1,8 @@
 # defines the core data structures for the application
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+import numpy as np
 
 @dataclass
 class DistractionArea:
@@ -15,3 +17,219 @@ class DistractionArea:
 
     def contains_point(self, px:int, py:int) -> bool :
         return self.x <= px <= self.x + self.width and self.y <=py <= self.y + self.height
+
+
+class BoxView:
+    """Read-only DistractionArea-compatible view of one box in a BoxSet."""
+    __slots__ = ('_boxes', '_i')
+
+    def __init__(self, boxes: 'BoxSet', i: int):
+        self._boxes = boxes
+        self._i = i
+
+    x = property(lambda self: int(self._boxes.x[self._i]))
+    y = property(lambda self: int(self._boxes.y[self._i]))
+    width = property(lambda self: int(self._boxes.width[self._i]))
+    height = property(lambda self: int(self._boxes.height[self._i]))
+    confidence = property(lambda self: float(self._boxes.confidence[self._i]))
+    text = property(lambda self: self._boxes.texts[self._i])
+    timestamp = property(lambda self: float(self._boxes.timestamp[self._i]))
+
+    def contains_point(self, px: int, py: int) -> bool:
+        return self.x <= px <= self.x + self.width and self.y <= py <= self.y + self.height
+
+    def to_area(self) -> DistractionArea:
+        return DistractionArea(self.x, self.y, self.width, self.height, self.confidence, self.text, self.timestamp)
+
+    def __repr__(self):
+        return f"BoxView(x={self.x}, y={self.y}, width={self.width}, height={self.height}, text={self.text!r})"
+
+
+class BoxSet:
+    """
+    Columnar, immutable collection of distraction boxes: one NumPy array per
+    field plus a list of texts. Geometry operations work on whole columns and
+    return new sets, so a set handed to another thread or the overlay is never
+    changed under it. Iterating or indexing yields BoxView objects, which read
+    like DistractionArea.
+    """
+    __slots__ = ('x', 'y', 'width', 'height', 'confidence', 'timestamp', 'texts')
+
+    def __init__(self, x=(), y=(), width=(), height=(), confidence=None, texts=None, timestamp=None):
+        self.x = np.asarray(x, dtype=np.int32)
+        self.y = np.asarray(y, dtype=np.int32)
+        self.width = np.asarray(width, dtype=np.int32)
+        self.height = np.asarray(height, dtype=np.int32)
+        n = len(self.x)
+        self.confidence = np.ones(n, dtype=np.float32) if confidence is None else np.asarray(confidence, dtype=np.float32)
+        self.timestamp = np.zeros(n, dtype=np.float64) if timestamp is None else np.asarray(timestamp, dtype=np.float64)
+        self.texts = [""] * n if texts is None else list(texts)
+
+    @classmethod
+    def from_areas(cls, areas) -> 'BoxSet':
+        """Accepts a BoxSet (returned as is) or any iterable of DistractionArea-like objects."""
+        if isinstance(areas, BoxSet):
+            return areas
+        areas = list(areas)
+        return cls(
+            [a.x for a in areas], [a.y for a in areas], [a.width for a in areas], [a.height for a in areas],
+            [a.confidence for a in areas], [a.text for a in areas], [a.timestamp for a in areas],
+        )
+
+    @classmethod
+    def concat(cls, sets) -> 'BoxSet':
+        sets = [cls.from_areas(s) for s in sets]
+        sets = [s for s in sets if len(s)] or [cls()]
+        if len(sets) == 1:
+            return sets[0]
+        return cls(
+            np.concatenate([s.x for s in sets]), np.concatenate([s.y for s in sets]),
+            np.concatenate([s.width for s in sets]), np.concatenate([s.height for s in sets]),
+            np.concatenate([s.confidence for s in sets]), [t for s in sets for t in s.texts],
+            np.concatenate([s.timestamp for s in sets]),
+        )
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        return (BoxView(self, i) for i in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            i = int(index)
+            if not -len(self) <= i < len(self):
+                raise IndexError(f"box index {i} out of range for {len(self)} boxes")
+            return BoxView(self, i + len(self) if i < 0 else i)
+        # a slice, boolean mask or index array selects a subset
+        picked = np.arange(len(self))[index]
+        return BoxSet(self.x[picked], self.y[picked], self.width[picked], self.height[picked],
+                      self.confidence[picked], [self.texts[i] for i in picked], self.timestamp[picked])
+
+    def __add__(self, other) -> 'BoxSet':
+        return BoxSet.concat((self, other))
+
+    def __radd__(self, other) -> 'BoxSet':
+        return BoxSet.concat((other, self))
+
+    def __repr__(self):
+        return f"BoxSet({len(self)} boxes)"
+
+    def __reduce__(self):
+        # pickled as its columns, so a result crosses a process boundary in a few small arrays
+        return (BoxSet, (self.x, self.y, self.width, self.height, self.confidence, self.texts, self.timestamp))
+
+    def to_areas(self) -> list[DistractionArea]:
+        return [view.to_area() for view in self]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.x + self.width
+
+    @property
+    def bottom(self) -> np.ndarray:
+        return self.y + self.height
+
+    def centers(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.x + self.width / 2, self.y + self.height / 2
+
+    def translate(self, dx: int, dy: int) -> 'BoxSet':
+        if not dx and not dy:
+            return self
+        return BoxSet(self.x + dx, self.y + dy, self.width, self.height, self.confidence, self.texts, self.timestamp)
+
+    def clip(self, bbox: tuple) -> 'BoxSet':
+        """Intersects every box with the (x1, y1, x2, y2) bbox and drops boxes left empty."""
+        x1 = np.maximum(self.x, bbox[0])
+        y1 = np.maximum(self.y, bbox[1])
+        x2 = np.minimum(self.right, bbox[2])
+        y2 = np.minimum(self.bottom, bbox[3])
+        keep = np.flatnonzero((x2 > x1) & (y2 > y1))
+        return BoxSet(x1[keep], y1[keep], (x2 - x1)[keep], (y2 - y1)[keep], self.confidence[keep],
+                      [self.texts[i] for i in keep], self.timestamp[keep])
+
+    def centers_within(self, bbox: tuple) -> np.ndarray:
+        """Mask of boxes whose centre lies inside the (x1, y1, x2, y2) bbox."""
+        cx, cy = self.centers()
+        return (cx >= bbox[0]) & (cx < bbox[2]) & (cy >= bbox[1]) & (cy < bbox[3])
+
+    def contains_point(self, px, py) -> np.ndarray:
+        """
+        Hit test. For a single point, a mask over the boxes; for arrays of points,
+        an (n_points, n_boxes) mask.
+        """
+        px = np.asarray(px)[..., None]
+        py = np.asarray(py)[..., None]
+        return (self.x <= px) & (px <= self.right) & (self.y <= py) & (py <= self.bottom)
+
+    def merge(self, iou_threshold: float = 0.3, gap: int = 6) -> 'BoxSet':
+        """
+        Merges boxes that overlap by at least `iou_threshold` IoU, or that sit on
+        the same text line (vertical overlap of at least half the shorter box)
+        no more than `gap` pixels apart. Merged boxes cover their union, keep the
+        highest confidence and join their texts left to right.
+        """
+        n = len(self)
+        if n < 2:
+            return self
+        x1, y1, x2, y2 = self.x, self.y, self.right, self.bottom
+        overlap_w = np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1)
+        overlap_h = np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1)
+        inter = np.clip(overlap_w, 0, None).astype(np.int64) * np.clip(overlap_h, 0, None)
+        area = self.width.astype(np.int64) * self.height
+        iou = inter / np.maximum(area[:, None] + area - inter, 1)
+        same_line = overlap_h >= np.minimum(self.height[:, None], self.height) / 2
+        linked = (iou >= iou_threshold) | (same_line & (overlap_w >= -gap))
+        if np.count_nonzero(linked) == n:
+            return self
+
+        # connected components by min-label propagation over the link matrix
+        labels = np.arange(n)
+        while True:
+            spread = np.where(linked, labels, n).min(axis=1)
+            spread = np.minimum(spread, labels)
+            spread = spread[spread]
+            if np.array_equal(spread, labels):
+                break
+            labels = spread
+
+        order = np.lexsort((x1, labels))
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        left = np.minimum.reduceat(x1[order], starts)
+        top = np.minimum.reduceat(y1[order], starts)
+        right = np.maximum.reduceat(x2[order], starts)
+        bottom = np.maximum.reduceat(y2[order], starts)
+        # duplicates (a box re-found in an overlapping strip) contribute their text once
+        texts = [" ".join(dict.fromkeys(self.texts[i] for i in group if self.texts[i]))
+                 for group in np.split(order, starts[1:])]
+        return BoxSet(left, top, right - left, bottom - top, np.maximum.reduceat(self.confidence[order], starts),
+                      texts, np.maximum.reduceat(self.timestamp[order], starts))
+
+
+@dataclass
+class CaptureFrame:
+    """
+    A screenshot queued for analysis, tagged with the screen generation it belongs to.
+    After a scroll only the newly exposed strip is queued: `image` is that strip,
+    `strip` its window-relative rectangle, `crop_origin` its offset and `base_areas`
+    the shifted boxes kept.
+    A `revalidate` frame re-checks boxes already restored from the window cache,
+    so its partial results are not shown.
+    """
+    generation: int
+    image: 'Image.Image'
+    bbox: tuple
+    captured_at: float
+    base_areas: BoxSet = field(default_factory=BoxSet)
+    crop_origin: tuple = (0, 0)
+    strip: tuple | None = None
+    revalidate: bool = False
+
+
+@dataclass
+class WindowInfo:
+    """A capturable window: title, screen bbox (x1, y1, x2, y2) and a backend-specific handle."""
+    title: str
+    bbox: tuple
+    handle: int | None = None
@@ -0,0 +1,267 @@
+# watches every visible window at once and composes their boxes into one overlay
+
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from core.change_detection import ChangeDetector
+from core.models import BoxSet, CaptureFrame, WindowInfo
+from core.pipeline import GenerationCounter
+from core.window_cache import window_key
+from utils.capture_backends import matches_whitelist
+from utils.metrics import span
+
+
+@dataclass
+class TrackedWindow:
+    """Per-window monitor state. `areas` are window-relative; `gray` is the change gate's reference."""
+    key: tuple
+    info: WindowInfo
+    generation: GenerationCounter = field(default_factory=GenerationCounter)
+    gray: np.ndarray | None = None
+    areas: BoxSet = field(default_factory=BoxSet)
+    visible: float = 1.0
+    foreground: bool = False
+    last_change: float = 0.0
+    next_capture: float = 0.0
+    pending: CaptureFrame | None = None
+    busy: bool = False
+
+    def priority(self, now: float, activity_half_life: float) -> float:
+        # the foreground always wins; others rank by how much shows and how recently it changed
+        if self.foreground:
+            return math.inf
+        return self.visible * (0.5 + math.exp(-(now - self.last_change) / activity_half_life))
+
+
+def visible_regions(windows: list[WindowInfo], screen: tuple, cell: int = 16) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Paints the windows (topmost first) onto a grid of `cell`-pixel squares
+    covering `screen`, bottom window first, so each square ends up owned by the
+    window actually showing there. Returns each window's visible fraction and
+    the owner grid (window index, -1 for the desktop).
+    """
+    sx1, sy1, sx2, sy2 = screen
+    owner = np.full((-(-(sy2 - sy1) // cell), -(-(sx2 - sx1) // cell)), -1, dtype=np.int32)
+    totals = np.ones(len(windows))
+    for i in range(len(windows) - 1, -1, -1):
+        x1, y1, x2, y2 = windows[i].bbox
+        c1, r1 = max((x1 - sx1) // cell, 0), max((y1 - sy1) // cell, 0)
+        c2, r2 = max(-(-(x2 - sx1) // cell), 0), max(-(-(y2 - sy1) // cell), 0)
+        owner[r1:r2, c1:c2] = i
+        totals[i] = max((r2 - r1) * (c2 - c1), 1)
+    shown = np.bincount(owner[owner >= 0], minlength=len(windows))[:len(windows)]
+    return shown / totals, owner
+
+
+class MultiWindowMonitor:
+    """
+    Monitors every visible window across all monitors instead of only the
+    active one. One capture thread grabs the whole virtual screen per tick,
+    crops each window from it and runs a per-window change gate; changed
+    windows queue a frame of their own. A small worker pool analyzes the
+    queued windows, highest priority first, and one worker is always held
+    back for the foreground window so background windows can't starve it.
+    Each window's boxes are kept separately and composed into one overlay,
+    with boxes hidden where another window covers them.
+
+    Settings:
+        multi_window_workers        analysis workers (default 3)
+        multi_window_min_visible    smallest visible share of a window worth analyzing (default 0.2)
+        background_capture_factor   background windows are captured this many times less often (default 3)
+        window_activity_half_life   seconds a window's recent change keeps boosting it (default 60)
+    """
+    def __init__(self, config, logger, capture_backend, analyzer, governor, publish, on_tick=None):
+        self.config = config
+        self.logger = logger
+        self.capture_backend = capture_backend
+        self.analyzer = analyzer
+        self.governor = governor
+        self.publish = publish
+        self.on_tick = on_tick
+        self.change_detector = ChangeDetector(ssim_threshold=0.98)
+
+        self.running = False
+        self.focus_topic = ""
+        self.windows = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        # (screen bbox, owner grid, {window key: grid index}) from the latest capture tick
+        self._layout = None
+        self._layout_signature = None
+
+    def start(self, focus_topic: str):
+        self.focus_topic = focus_topic
+        self.windows = {}
+        self._layout = self._layout_signature = None
+        self.running = True
+        workers = max(self.config.get('multi_window_workers', 3), 1)
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._work_loop, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+        self.logger.info(f"Multi-window monitoring started with {workers} analysis workers.")
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            for tracked in self.windows.values():
+                tracked.generation.advance()
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=2)
+        self._threads = []
+
+    def _capture_loop(self):
+        while self.running:
+            time.sleep(self.governor.capture_interval(self.config.get('capture_interval', 2.0)))
+            if self.on_tick:
+                self.on_tick()
+            try:
+                with span('multi_window.capture'):
+                    self._capture_tick()
+            except Exception as e:
+                self.logger.error(f"Multi-window capture failed: {e}")
+
+    def _capture_tick(self):
+        windows = self.capture_backend.list_windows()
+        if not windows:
+            return
+        screen = self.capture_backend.screen_bbox() or (
+            min(w.bbox[0] for w in windows), min(w.bbox[1] for w in windows),
+            max(w.bbox[2] for w in windows), max(w.bbox[3] for w in windows),
+        )
+        # whitelisted windows are never analyzed but still hide what's under them
+        visible, owner = visible_regions(windows, screen, self.config.get('visibility_cell', 16))
+        screenshot = self.capture_backend.grab(screen)
+
+        now = time.monotonic()
+        interval = self.governor.capture_interval(self.config.get('capture_interval', 2.0))
+        min_visible = self.config.get('multi_window_min_visible', 0.2)
+        whitelist = self.config.get('whitelist', [])
+        index, changed = {}, False
+        for i, info in enumerate(windows):
+            if visible[i] < min_visible or matches_whitelist(info.title, whitelist):
+                continue
+            key = window_key(info)
+            index[key] = i
+            tracked = self.windows.get(key)
+            if tracked is None:
+                with self._cond:
+                    tracked = self.windows[key] = TrackedWindow(key, info, last_change=now)
+            tracked.info, tracked.visible, tracked.foreground = info, float(visible[i]), i == 0
+            if not tracked.foreground and now < tracked.next_capture:
+                continue
+            tracked.next_capture = now + interval * self.config.get('background_capture_factor', 3)
+            changed |= self._gate(tracked, screenshot, screen, now)
+
+        with self._cond:
+            for key in [key for key in self.windows if key not in index]:
+                self.windows.pop(key).generation.advance()
+                changed = True
+        self._layout = (screen, owner, index)
+
+        # a window that only moved or got covered needs its boxes recomposed
+        signature = (screen, tuple((key, self.windows[key].info.bbox, i) for key, i in index.items()))
+        if changed or signature != self._layout_signature:
+            self._layout_signature = signature
+            self._compose()
+
+    def _gate(self, tracked: TrackedWindow, screenshot, screen: tuple, now: float) -> bool:
+        """Queues the window for analysis if its content changed. Returns True if its boxes were cleared."""
+        x1, y1, x2, y2 = tracked.info.bbox
+        image = screenshot.crop((x1 - screen[0], y1 - screen[1], x2 - screen[0], y2 - screen[1]))
+        gray = np.array(image.resize((256, 144)).convert('L'))
+        if tracked.gray is not None and not self.change_detector.compare(tracked.gray, gray).changed:
+            return False
+        # the reference frame is kept, so the change is picked up again once budget frees up
+        if not self.governor.allow_analysis():
+            return False
+
+        if tracked.gray is not None:
+            self.logger.debug(f"Window '{tracked.info.title}' changed; queued for analysis.")
+        tracked.gray = gray
+        tracked.last_change = now
+        with self._cond:
+            generation = tracked.generation.advance()
+            had_areas = len(tracked.areas) > 0
+            tracked.areas = BoxSet()
+            tracked.pending = CaptureFrame(generation, image, tracked.info.bbox, now)
+            self._cond.notify()
+        return had_areas
+
+    def _next_job(self, now: float) -> TrackedWindow | None:
+        # caller holds self._cond
+        workers = len(self._threads) - 1
+        waiting = [t for t in self.windows.values() if t.pending is not None and not t.busy]
+        foreground = [t for t in waiting if t.foreground]
+        if foreground:
+            return foreground[0]
+        # with several workers one is kept free for the foreground; a lone worker serves the background
+        # only while the foreground has nothing queued
+        background_busy = sum(1 for t in self.windows.values() if t.busy and not t.foreground)
+        if not waiting or (workers > 1 and background_busy >= workers - 1):
+            return None
+        half_life = self.config.get('window_activity_half_life', 60.0)
+        return max(waiting, key=lambda t: t.priority(now, half_life))
+
+    def _work_loop(self):
+        while self.running:
+            with self._cond:
+                tracked = self._next_job(time.monotonic())
+                if tracked is None:
+                    self._cond.wait(0.5)
+                    continue
+                frame, tracked.pending, tracked.busy = tracked.pending, None, True
+            try:
+                self._analyze(tracked, frame)
+            finally:
+                with self._cond:
+                    tracked.busy = False
+                    self._cond.notify_all()
+
+    def _analyze(self, tracked: TrackedWindow, frame: CaptureFrame):
+        def current():
+            return self.running and tracked.generation.is_current(frame.generation)
+
+        def show_partial(areas):
+            if current():
+                tracked.areas = areas
+                self._compose()
+
+        with span('analysis.total'):
+            areas = self.analyzer.analyze(
+                frame.image, self.focus_topic, is_stale=lambda: not current(),
+                # only the foreground redraws per streamed phrase; background windows settle at once
+                on_partial=show_partial if tracked.foreground else None,
+            )
+        if areas is None or not current():
+            return
+        tracked.areas = areas
+        self._compose()
+
+    def _compose(self):
+        """Offsets every window's boxes to the screen and keeps those not covered by another window."""
+        layout = self._layout
+        if layout is None:
+            return
+        screen, owner, index = layout
+        cell = self.config.get('visibility_cell', 16)
+        composed = []
+        for key, i in index.items():
+            tracked = self.windows.get(key)
+            if tracked is None or not len(tracked.areas):
+                continue
+            boxes = tracked.areas.translate(*tracked.info.bbox[:2])
+            cx, cy = boxes.centers()
+            col = ((cx - screen[0]) // cell).astype(np.intp)
+            row = ((cy - screen[1]) // cell).astype(np.intp)
+            inside = (row >= 0) & (row < owner.shape[0]) & (col >= 0) & (col < owner.shape[1])
+            visible = np.zeros(len(boxes), dtype=bool)
+            visible[inside] = owner[row[inside], col[inside]] == i
+            composed.append(boxes[visible])
+        self.publish(BoxSet.concat(composed))
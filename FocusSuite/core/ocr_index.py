@@ -0,0 +1,154 @@
+# columnar index over tesseract output for mapping AI phrases back to screen boxes
+
+import string
+from collections import deque
+
+import numpy as np
+
+from core.models import BoxSet
+
+_EDGE_PUNCTUATION = string.punctuation + "“”‘’«»…•·|"
+
+
+def normalize_token(word: str) -> str:
+    return word.strip().strip(_EDGE_PUNCTUATION).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into normalized tokens, dropping punctuation-only words."""
+    return [t for t in (normalize_token(w) for w in text.split()) if t]
+
+
+class OcrIndex:
+    """
+    Holds the confident words of one tesseract `image_to_data` result as NumPy
+    columns, grouped into lines, and matches any number of phrases against them
+    in a single pass with a token-level Aho-Corasick automaton.
+    """
+    def __init__(self, ocr_data: dict, min_conf: float = 40):
+        conf = np.asarray([float(c) for c in ocr_data['conf']], dtype=np.float32)
+        keep = np.flatnonzero(
+            (conf > min_conf) & np.asarray([bool(w.strip()) for w in ocr_data['text']], dtype=bool)
+        )
+
+        self.words = [ocr_data['text'][i].strip() for i in keep]
+        self.left = np.asarray(ocr_data['left'], dtype=np.int32)[keep]
+        self.top = np.asarray(ocr_data['top'], dtype=np.int32)[keep]
+        self.width = np.asarray(ocr_data['width'], dtype=np.int32)[keep]
+        self.height = np.asarray(ocr_data['height'], dtype=np.int32)[keep]
+        self.conf = conf[keep]
+
+        # tesseract emits words in reading order, so line ids are non-decreasing
+        line_keys = {}
+        line_ids = np.empty(len(keep), dtype=np.int32)
+        for n, i in enumerate(keep):
+            key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+            line_ids[n] = line_keys.setdefault(key, len(line_keys))
+        self.line_ids = line_ids
+        self.line_keys = list(line_keys)
+
+        self.lines = [[] for _ in line_keys]
+        for word, line_id in zip(self.words, line_ids):
+            self.lines[line_id].append(word)
+        self.lines = [" ".join(words) for words in self.lines]
+
+        # token stream skips punctuation-only words; token_pos maps back to word positions
+        self.tokens = []
+        token_pos = []
+        for pos, word in enumerate(self.words):
+            token = normalize_token(word)
+            if token:
+                self.tokens.append(token)
+                token_pos.append(pos)
+        self.token_pos = np.asarray(token_pos, dtype=np.int32)
+        self._line_lookup = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def areas_for(self, phrases: list[str]) -> BoxSet:
+        """
+        Returns one merged box per line run covered by any of the phrases. A phrase
+        that is a whole OCR line takes its box straight from the line geometry
+        instead of going through the matcher.
+        """
+        if self._line_lookup is None:
+            self._line_lookup = {}
+            for line_id, line in enumerate(self.lines):
+                key = " ".join(tokenize(line))
+                if key:
+                    self._line_lookup.setdefault(key, []).append(line_id)
+
+        line_ids, patterns = [], []
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            whole = self._line_lookup.get(" ".join(tokens))
+            if whole:
+                line_ids.extend(whole)
+            else:
+                patterns.append(tokens)
+
+        covered = np.isin(self.line_ids, np.asarray(line_ids, dtype=np.int32))
+        for start, end in self._scan(patterns):
+            covered[self.token_pos[start]:self.token_pos[end] + 1] = True
+        return self._runs_to_areas(covered)
+
+    def _scan(self, patterns: list[list[str]]):
+        # builds the automaton: goto transitions, failure links and output lengths
+        goto = [{}]
+        outputs = [[]]
+        for tokens in patterns:
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                nxt = goto[state].get(token)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][token] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(len(tokens))
+        if len(goto) == 1:
+            return
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and token not in goto[f]:
+                    f = fail[f]
+                if state:
+                    fail[nxt] = goto[f].get(token, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        state = 0
+        for i, token in enumerate(self.tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length in outputs[state]:
+                yield i - length + 1, i
+
+    def _runs_to_areas(self, covered: np.ndarray) -> BoxSet:
+        positions = np.flatnonzero(covered)
+        if positions.size == 0:
+            return BoxSet()
+        # a run breaks where positions jump or the line changes
+        breaks = np.flatnonzero(
+            (np.diff(positions) != 1) | (np.diff(self.line_ids[positions]) != 0)
+        ) + 1
+        starts = np.concatenate(([0], breaks))
+
+        lefts = np.minimum.reduceat(self.left[positions], starts)
+        tops = np.minimum.reduceat(self.top[positions], starts)
+        rights = np.maximum.reduceat(self.left[positions] + self.width[positions], starts)
+        bottoms = np.maximum.reduceat(self.top[positions] + self.height[positions], starts)
+
+        ends = np.concatenate((breaks, [positions.size]))
+        texts = [" ".join(self.words[p] for p in positions[s:e]) for s, e in zip(starts, ends)]
+        return BoxSet(lefts, tops, rights - lefts, bottoms - tops, texts=texts)
@@ -0,0 +1,68 @@
+# small concurrency primitives that join the focus monitor's stages
+
+import threading
+
+
+class LatestSlot:
+    """
+    A single-slot, latest-wins queue. `put` replaces any item still waiting,
+    so a slow consumer always picks up the newest work and never a backlog.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None):
+        """Waits for an item; returns None on timeout or once the slot is closed."""
+        with self._cond:
+            if not self._has_item and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._item = None
+            self._has_item = False
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+            self._item = None
+            self._has_item = False
+
+
+class GenerationCounter:
+    """Monotonic screen generation; work tagged with an older value is stale."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def advance(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._value
@@ -0,0 +1,89 @@
+# structured progress reporting for long-running jobs, shared by the UI and headless consumers
+
+import collections
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ProgressEvent:
+    """
+    One progress report. `elapsed` is measured from the first event of the
+    same stage, so rate and ETA are per stage.
+    """
+    stage: str
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    bytes: int = 0
+    api_calls: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def fraction(self) -> float | None:
+        return min(self.done / self.total, 1.0) if self.total else None
+
+    @property
+    def rate(self) -> float | None:
+        """Items per second in this stage so far."""
+        return self.done / self.elapsed if self.done and self.elapsed > 0 else None
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds left in this stage at the current rate."""
+        rate = self.rate
+        if rate is None or not self.total:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+
+class ProgressBus:
+    """
+    Collects progress events from worker threads. Subscribers see every event
+    on the publishing thread (for logs, tests or a CLI); a UI instead calls
+    `drain` on its own schedule and gets only the newest state plus the
+    messages published since, however many events arrived in between. Only
+    the newest `max_messages` undrained messages are kept, so a bus nobody
+    drains doesn't grow for the whole job.
+    """
+    def __init__(self, max_messages: int = 500):
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._stage_started = {}
+        self._latest = None
+        self._changed = False
+        self._messages = collections.deque(maxlen=max_messages)
+        self.events_published = 0
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, stage: str, done: int = 0, total: int = 0, message: str = "",
+                bytes: int = 0, api_calls: int = 0) -> ProgressEvent:
+        now = time.monotonic()
+        with self._lock:
+            started = self._stage_started.setdefault(stage, now)
+            event = ProgressEvent(stage, done, total, message, bytes, api_calls, now - started)
+            self._latest = event
+            self._changed = True
+            if message:
+                self._messages.append(message)
+            self.events_published += 1
+        for callback in self._subscribers:
+            callback(event)
+        return event
+
+    def note(self, message: str):
+        """Adds a log message without changing the progress state."""
+        with self._lock:
+            self._messages.append(message)
+
+    def drain(self) -> tuple[ProgressEvent | None, list[str]]:
+        """The newest event if anything changed since the last drain (else None), and the new messages."""
+        with self._lock:
+            latest = self._latest if self._changed else None
+            messages = list(self._messages)
+            self._messages.clear()
+            self._changed = False
+        return latest, messages
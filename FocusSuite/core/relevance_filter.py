@@ -0,0 +1,224 @@
+# decides obvious OCR lines locally so only ambiguous ones are sent to the LLM
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from core.verdict_cache import normalize_line
+
+# rough size of an English token, used to estimate what the filter saved
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_LETTER_RE = re.compile(r"[a-z]")
+_TIMESTAMP_RE = re.compile(
+    r"^(\d{1,2}[:.]\d{2}([:.]\d{2})?\s*(am|pm)?"
+    r"|\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}"
+    r"|\d+\s*(s|m|h|d|w|min|mins|hr|hrs|hours?|days?|weeks?)(\s+ago)?)$"
+)
+
+
+def _features(text: str) -> list[str]:
+    # whole words plus character trigrams, so OCR slips and word forms still overlap
+    features = []
+    for word in _WORD_RE.findall(text.lower()):
+        features.append("w:" + word)
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def embed(texts: list[str], dim: int = 2048) -> np.ndarray:
+    """L2-normalized hashed n-gram count vectors, one row per text."""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            rows.append(row)
+            cols.append(zlib.crc32(feature.encode()) % dim)
+    flat = np.asarray(rows, dtype=np.intp) * dim + np.asarray(cols, dtype=np.intp)
+    vectors = np.bincount(flat, minlength=len(texts) * dim).astype(np.float32).reshape(len(texts), dim)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+class RelevanceFilter:
+    """
+    Local pre-classifier for OCR lines. In order, a line is decided without the
+    LLM when it is
+      * noise: timestamps, numbers, too few letters to mean anything;
+      * UI chrome: one on the configured stop-list, or a short line seen on many
+        screens that the LLM never flagged for this topic. Learned entries are
+        kept per topic, and every `chrome_sample_every`th hit on one still goes
+        to the LLM, so an entry it flags is dropped;
+      * a near-copy of a line the LLM already judged for this topic;
+      * clearly about the focus topic by n-gram cosine similarity.
+    Everything else is ambiguous and goes to the LLM. Verdicts use the verdict
+    cache's format: an empty list for fine, [line] for a distracting line.
+    """
+    def __init__(self, relevant_threshold: float = 0.45, exemplar_threshold: float = 0.9,
+                 chrome_min_screens: int = 5, chrome_max_words: int = 4, min_letters: int = 3,
+                 stoplist=(), learned=None, chrome_sample_every: int = 20, max_topics: int = 16,
+                 dim: int = 2048, max_exemplars: int = 512, max_tracked: int = 4096):
+        self.relevant_threshold = relevant_threshold
+        self.exemplar_threshold = exemplar_threshold
+        self.chrome_min_screens = chrome_min_screens
+        self.chrome_max_words = chrome_max_words
+        self.min_letters = min_letters
+        self.chrome_sample_every = max(int(chrome_sample_every), 1)
+        self.max_topics = max_topics
+        self.dim = dim
+        self.max_exemplars = max_exemplars
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+
+        self._stoplist = {normalize_line(line) for line in stoplist if line}
+        # learned chrome per topic; `chrome` is the current topic's set
+        self._learned = OrderedDict(
+            (normalize_line(topic), {normalize_line(line) for line in lines if line})
+            for topic, lines in (learned or {}).items()
+        )
+        self.chrome = set()
+        self._chrome_hits = 0
+        self._screens_seen = OrderedDict()
+        self._flagged = OrderedDict()
+
+        # judged lines for the current topic, kept as a ring of vectors
+        self._topic = None
+        self._topic_vector = None
+        self._exemplars = np.zeros((max_exemplars, dim), dtype=np.float32)
+        self._exemplar_labels = np.zeros(max_exemplars, dtype=bool)
+        self._exemplar_count = 0
+        self._exemplar_next = 0
+
+        self.counts = dict.fromkeys(('seen', 'noise', 'chrome', 'known', 'relevant', 'sent'), 0)
+        self.chars_saved = 0
+
+    def _set_topic(self, topic: str):
+        topic = normalize_line(topic)
+        if topic != self._topic:
+            self._topic = topic
+            self._topic_vector = embed([topic], self.dim)[0]
+            self._exemplar_count = 0
+            self._exemplar_next = 0
+            # a line never flagged while coding may well be a distraction for another topic
+            self.chrome = self._learned.setdefault(topic, set())
+            self._learned.move_to_end(topic)
+            if len(self._learned) > self.max_topics:
+                self._learned.popitem(last=False)
+            self._screens_seen.clear()
+            self._flagged.clear()
+
+    def is_noise(self, normalized: str) -> bool:
+        return (len(_LETTER_RE.findall(normalized)) < self.min_letters
+                or _TIMESTAMP_RE.match(normalized) is not None)
+
+    def observe(self, topic: str, lines: list[str]):
+        """Counts the distinct lines of one screen towards the topic's learned chrome stop-list."""
+        with self._lock:
+            self._set_topic(topic)
+            for normalized in {normalize_line(line) for line in lines}:
+                if normalized in self._stoplist or normalized in self.chrome or len(normalized.split()) > self.chrome_max_words:
+                    continue
+                count = self._screens_seen.pop(normalized, 0) + 1
+                if (count >= self.chrome_min_screens and normalized not in self._flagged
+                        and len(self.chrome) < self.max_tracked):
+                    self.chrome.add(normalized)
+                    continue
+                self._screens_seen[normalized] = count
+                if len(self._screens_seen) > self.max_tracked:
+                    self._screens_seen.popitem(last=False)
+
+    def classify(self, topic: str, lines: list[str]) -> tuple[dict[str, list[str]], list[str]]:
+        """Splits lines into ({line: verdict} decided locally, [ambiguous lines])."""
+        decided, pending, ambiguous = {}, [], []
+        with self._lock:
+            self._set_topic(topic)
+            for line in lines:
+                normalized = normalize_line(line)
+                if self.is_noise(normalized):
+                    decided[line] = []
+                    self.counts['noise'] += 1
+                elif normalized in self._stoplist:
+                    decided[line] = []
+                    self.counts['chrome'] += 1
+                elif normalized in self.chrome:
+                    self._chrome_hits += 1
+                    if self._chrome_hits % self.chrome_sample_every:
+                        decided[line] = []
+                        self.counts['chrome'] += 1
+                    else:
+                        # let the LLM check a learned entry now and then; `learn` drops it if flagged
+                        ambiguous.append(line)
+                else:
+                    pending.append(line)
+
+            if pending:
+                vectors = embed(pending, self.dim)
+                relevance = vectors @ self._topic_vector
+                if self._exemplar_count:
+                    similarity = vectors @ self._exemplars[:self._exemplar_count].T
+                    nearest = similarity.argmax(axis=1)
+                    nearest_score = similarity[np.arange(len(pending)), nearest]
+                else:
+                    nearest = nearest_score = None
+
+                for i, line in enumerate(pending):
+                    if nearest is not None and nearest_score[i] >= self.exemplar_threshold:
+                        decided[line] = [line] if self._exemplar_labels[nearest[i]] else []
+                        self.counts['known'] += 1
+                    elif relevance[i] >= self.relevant_threshold:
+                        decided[line] = []
+                        self.counts['relevant'] += 1
+                    else:
+                        ambiguous.append(line)
+
+            self.counts['seen'] += len(lines)
+            self.counts['sent'] += len(ambiguous)
+            self.chars_saved += sum(len(line) + 1 for line in decided)
+        return decided, ambiguous
+
+    def learn(self, topic: str, line: str, verdict: list[str]):
+        """Records an LLM verdict; only whole-line verdicts become exemplars."""
+        normalized = normalize_line(line)
+        flagged = {normalize_line(phrase) for phrase in verdict}
+        if flagged and normalized not in flagged:
+            # only part of the line was distracting; a look-alike line may differ in that part
+            with self._lock:
+                self._set_topic(topic)
+                self._remember_flagged(normalized)
+            return
+
+        vector = embed([line], self.dim)[0]
+        with self._lock:
+            self._set_topic(topic)
+            if flagged:
+                self._remember_flagged(normalized)
+            slot = self._exemplar_next
+            self._exemplars[slot] = vector
+            self._exemplar_labels[slot] = bool(flagged)
+            self._exemplar_next = (slot + 1) % self.max_exemplars
+            self._exemplar_count = min(self._exemplar_count + 1, self.max_exemplars)
+
+    def _remember_flagged(self, normalized: str):
+        self.chrome.discard(normalized)
+        self._flagged[normalized] = True
+        self._flagged.move_to_end(normalized)
+        if len(self._flagged) > self.max_tracked:
+            self._flagged.popitem(last=False)
+
+    def learned_stoplists(self) -> dict[str, list[str]]:
+        """The learned chrome lines of each recent topic, for saving in the settings."""
+        with self._lock:
+            return {topic: sorted(lines) for topic, lines in self._learned.items() if lines}
+
+    def report(self) -> dict:
+        """Counts of locally decided lines and the estimated LLM tokens that saved."""
+        with self._lock:
+            report = dict(self.counts)
+            report['decided'] = report['seen'] - report['sent']
+            report['tokens_saved'] = self.chars_saved // CHARS_PER_TOKEN
+            report['chrome_entries'] = len(self._stoplist) + len(self.chrome)
+        return report
@@ -0,0 +1,375 @@
+import json
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+
+from api.prompts import LINE_ID_SCHEMA, LINE_ID_SYSTEM_PROMPT
+from core.models import BoxSet
+from core.ocr_index import OcrIndex
+from core.relevance_filter import RelevanceFilter
+from core.stream_parser import JsonArrayStreamParser
+from core.verdict_cache import VerdictCache, normalize_line
+from utils.metrics import metrics, span
+
+DEFAULT_CHUNK_CHARS = 1500
+
+# returned internally when a newer capture made an in-flight request irrelevant
+_SUPERSEDED = object()
+
+
+def matches_schema(value, schema: dict) -> bool:
+    """Checks a parsed JSON value against the subset of JSON Schema our response schemas use."""
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            return False
+        properties = schema.get("properties", {})
+        if any(key not in value for key in schema.get("required", [])):
+            return False
+        if schema.get("additionalProperties", True) is False and any(key not in properties for key in value):
+            return False
+        return all(matches_schema(value[key], sub) for key, sub in properties.items() if key in value)
+    if kind == "array":
+        return isinstance(value, list) and all(matches_schema(item, schema.get("items", {})) for item in value)
+    if kind == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if kind == "string":
+        return isinstance(value, str)
+    return True
+
+
+def _valid_line_id(value, line_count: int) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= line_count
+
+
+def chunk_lines(entries: list[tuple[str, int]], max_chars: int) -> list[list[str]]:
+    """
+    Packs (line, block_num) entries into prompt-sized chunks. Whole OCR blocks are
+    kept together where they fit so the model sees each pane or paragraph intact;
+    a block larger than `max_chars` is split between lines.
+    """
+    blocks = {}
+    for line, block in entries:
+        blocks.setdefault(block, []).append(line)
+
+    chunks = []
+    current, current_chars = [], 0
+    for block_lines in blocks.values():
+        block_chars = sum(len(line) + 1 for line in block_lines)
+        if current and current_chars + block_chars > max_chars:
+            chunks.append(current)
+            current, current_chars = [], 0
+        for line in block_lines:
+            if current and current_chars + len(line) + 1 > max_chars:
+                chunks.append(current)
+                current, current_chars = [], 0
+            current.append(line)
+            current_chars += len(line) + 1
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ScreenAnalyzer:
+    """
+    The "muscle" of the focus monitor: runs OCR on a screenshot, asks the AI
+    about lines it hasn't judged yet and maps the verdicts back to boxes.
+    Obvious lines (noise, UI chrome, near-copies of judged lines, clearly
+    on-topic text) are decided locally by the relevance filter first.
+    Long screens are split into layout-aware chunks that are sent to the AI in
+    parallel, so latency tracks the slowest chunk rather than the text length.
+    Work can be abandoned part-way through when a newer capture supersedes it.
+    """
+    def __init__(self, config, api_manager, logger: logging.Logger):
+        self.config = config
+        self.api_manager = api_manager
+        self.logger = logger
+        self.verdict_cache = VerdictCache(
+            max_entries=self.config.get('verdict_cache_size', 2048),
+            ttl_seconds=self.config.get('verdict_cache_ttl', 600),
+        )
+        self.relevance_filter = RelevanceFilter(
+            relevant_threshold=self.config.get('relevance_threshold', 0.45),
+            exemplar_threshold=self.config.get('relevance_exemplar_threshold', 0.9),
+            chrome_min_screens=self.config.get('chrome_min_screens', 5),
+            stoplist=self.config.get('ui_chrome_stoplist', []),
+            learned=self.config.get('learned_chrome', {}),
+            chrome_sample_every=self.config.get('chrome_sample_every', 20),
+        )
+        # set by the budget governor: >1 packs more lines into each AI call
+        self.chunk_scale = 1.0
+        # a superseded screen sets its requests' cancel event: queued ones are skipped and streams stop at
+        # the next delta, neither filling the verdict cache; a non-streamed call already sent still does
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=self.config.get('llm_max_concurrency', 3), thread_name_prefix="focus-llm"
+        )
+
+    def analyze(self, screenshot: 'Image.Image', focus_topic: str, is_stale=lambda: False,
+                on_partial=None, on_error=None) -> BoxSet | None:
+        """
+        Returns the distraction boxes for the screenshot, or None if the work was
+        superseded by a newer capture before it finished. If given, `on_partial`
+        receives the boxes found so far each time a streamed phrase completes, and
+        `on_error` is called when OCR fails or no chunk got a usable AI answer.
+        """
+        try:
+            with span('analysis.ocr'):
+                ocr_data = pytesseract.image_to_data(
+                    screenshot, output_type=pytesseract.Output.DICT, config='--psm 6'
+                )
+            if is_stale():
+                return None
+
+            with span('analysis.ocr_index'):
+                ocr_index = OcrIndex(ocr_data)
+            lines = ocr_index.lines
+            if not lines:
+                return BoxSet()
+
+            distracting_phrases = []
+            unseen_lines = {}
+            for line, line_key in zip(lines, ocr_index.line_keys):
+                verdict = self.verdict_cache.get(focus_topic, line)
+                if verdict is None:
+                    unseen_lines.setdefault(line, line_key[0])
+                else:
+                    distracting_phrases.extend(verdict)
+
+            self.logger.debug(f"Verdict cache: {len(lines) - len(unseen_lines)}/{len(lines)} lines cached.")
+            metrics.inc('verdict_cache.hits', len(lines) - len(unseen_lines))
+            metrics.inc('verdict_cache.misses', len(unseen_lines))
+            if self.config.get('relevance_filter', True):
+                self.relevance_filter.observe(focus_topic, lines)
+                if unseen_lines:
+                    with span('analysis.relevance_filter'):
+                        decided, ambiguous = self.relevance_filter.classify(focus_topic, list(unseen_lines))
+                    metrics.inc('relevance_filter.decided', len(decided))
+                    for verdict in decided.values():
+                        distracting_phrases.extend(verdict)
+                    unseen_lines = {line: unseen_lines[line] for line in ambiguous}
+                    self.logger.debug(f"Relevance filter decided {len(decided)} lines locally, {len(ambiguous)} sent to the AI.")
+            if unseen_lines:
+                partial_areas = [ocr_index.areas_for(distracting_phrases)] if distracting_phrases else []
+                if on_partial and partial_areas and len(partial_areas[0]):
+                    on_partial(partial_areas[0])
+
+                def on_phrase(phrase):
+                    areas = ocr_index.areas_for([phrase])
+                    if len(areas) and on_partial:
+                        partial_areas.append(areas)
+                        on_partial(BoxSet.concat(partial_areas))
+
+                chunk_chars = int(self.config.get('llm_chunk_chars', DEFAULT_CHUNK_CHARS) * self.chunk_scale)
+                chunks = chunk_lines(list(unseen_lines.items()), chunk_chars)
+                with span('analysis.llm'):
+                    new_phrases = self._await_verdicts(chunks, focus_topic, is_stale, on_phrase)
+                if new_phrases is _SUPERSEDED:
+                    self.logger.debug("Screen changed while the AI was answering; result discarded.")
+                    return None
+                if new_phrases is None:
+                    if on_error:
+                        on_error()
+                    if not distracting_phrases:
+                        return BoxSet()
+                distracting_phrases.extend(new_phrases or [])
+
+            if not distracting_phrases:
+                return BoxSet()
+
+            self.logger.info(f"Distractions found: {distracting_phrases}")
+
+            with span('analysis.map_boxes'):
+                distraction_areas = ocr_index.areas_for(distracting_phrases)
+            self.logger.debug(f"Mapped {len(distracting_phrases)} phrases to {len(distraction_areas)} boxes.")
+            return distraction_areas
+        except Exception as e:
+            self.logger.error(f"Error processing screenshot: {e}")
+            metrics.inc('analysis.errors')
+            if on_error:
+                on_error()
+            return BoxSet()
+
+    def apply_throttle(self, chunk_scale: float, relevance_offset: float = 0.0, exemplar_offset: float = 0.0):
+        """Scales chunk size and loosens the relevance filter relative to the configured values."""
+        self.chunk_scale = chunk_scale
+        self.relevance_filter.relevant_threshold = self.config.get('relevance_threshold', 0.45) + relevance_offset
+        self.relevance_filter.exemplar_threshold = self.config.get('relevance_exemplar_threshold', 0.9) + exemplar_offset
+
+    def log_filter_report(self):
+        report = self.relevance_filter.report()
+        if report['seen']:
+            self.logger.info(
+                f"Relevance filter decided {report['decided']}/{report['seen']} lines locally "
+                f"(noise {report['noise']}, chrome {report['chrome']}, known {report['known']}, "
+                f"on-topic {report['relevant']}), saving ~{report['tokens_saved']} LLM tokens."
+            )
+
+    def shutdown(self):
+        self._llm_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _await_verdicts(self, chunks: list[list[str]], focus_topic: str, is_stale, on_phrase, poll_interval: float = 0.1):
+        """
+        Sends every chunk the AI budget still allows to the LLM pool and relays
+        streamed phrases to `on_phrase` on this thread until all are answered. A
+        stale screen cancels them. Returns the merged phrases, or None if no chunk
+        got a usable answer.
+        """
+        sent = []
+        for chunk in chunks:
+            if not self.api_manager.reserve_call():
+                break
+            sent.append(chunk)
+        if len(sent) < len(chunks):
+            # the skipped lines get no verdict, so they are asked about again on a later screen
+            self.logger.warning(f"AI budget spent; {len(chunks) - len(sent)} of {len(chunks)} chunks not sent.")
+            metrics.inc('analysis.chunks_over_budget', len(chunks) - len(sent))
+        if not sent:
+            return None
+
+        phrase_queue = queue.Queue()
+        cancel = threading.Event()
+        futures = [
+            self._llm_executor.submit(self._request_reserved, chunk, focus_topic, phrase_queue.put, cancel)
+            for chunk in sent
+        ]
+        if len(sent) > 1:
+            self.logger.debug(f"Analyzing {sum(map(len, sent))} lines in {len(sent)} parallel chunks.")
+        while True:
+            try:
+                on_phrase(phrase_queue.get(timeout=poll_interval))
+                continue
+            except queue.Empty:
+                pass
+            if all(f.done() for f in futures) and phrase_queue.empty():
+                results = [f.result() for f in futures]
+                if all(r is None for r in results):
+                    return None
+                return [phrase for r in results if r for phrase in r]
+            if is_stale():
+                cancel.set()
+                return _SUPERSEDED
+
+    def _request_reserved(self, *args) -> list[str] | None:
+        # the chunk's call slot is held until its request has been recorded
+        try:
+            return self._request_verdicts(*args)
+        finally:
+            self.api_manager.release_call()
+
+    def _request_verdicts(self, lines: list[str], focus_topic: str, on_phrase=None, cancel=None) -> list[str] | None:
+        """
+        Asks the AI about lines missing from the verdict cache and caches a verdict
+        for each of them. Returns the distracting phrases (whole lines under the
+        line-ID protocol), or None if the API gave no usable answer.
+        """
+        if cancel is not None and cancel.is_set():
+            return None
+        if self.config.get('response_protocol', 'phrases') == 'line_ids':
+            answer = self._ask_line_ids(lines, focus_topic, on_phrase, cancel)
+        else:
+            answer = self._ask_phrases(lines, focus_topic, on_phrase, cancel)
+        if answer is None:
+            return None
+
+        phrases, complete = answer
+        if not complete:
+            self.logger.warning("AI answer was cut off or had invalid items; not caching.")
+            return phrases
+        self._cache_verdicts(lines, phrases, focus_topic)
+        return phrases
+
+    def _ask_phrases(self, lines: list[str], focus_topic: str, on_phrase, cancel) -> tuple[list[str], bool] | None:
+        # the model echoes the distracting text back
+        text = "\n".join(lines)
+        prompt = f"Review the text from a screen. The user's goal is '{focus_topic}'. Identify unrelated text. Text: \"{text}\""
+
+        def to_phrase(item):
+            return item if isinstance(item, str) and item.strip() else None
+
+        if self._streaming():
+            return self._stream_items(prompt, "distractions", to_phrase, on_phrase, cancel)
+        data = self._generate_json(prompt)
+        phrases = data.get("distractions", []) if isinstance(data, dict) else None
+        if not isinstance(phrases, list):
+            return None
+        return [p for p in phrases if to_phrase(p)], True
+
+    def _ask_line_ids(self, lines: list[str], focus_topic: str, on_phrase, cancel) -> tuple[list[str], bool] | None:
+        # the model only names line IDs, so the answer is a few tokens and maps to boxes without matching
+        numbered = "\n".join(f"[{i}] {line}" for i, line in enumerate(lines, 1))
+        prompt = f"The user's goal is '{focus_topic}'. Which of these lines are unrelated to it?\n{numbered}"
+        options = {'system_prompt': LINE_ID_SYSTEM_PROMPT, 'schema': LINE_ID_SCHEMA}
+
+        def to_line(item):
+            return lines[item - 1] if _valid_line_id(item, len(lines)) else None
+
+        if self._streaming():
+            return self._stream_items(prompt, "ids", to_line, on_phrase, cancel, options)
+        data = self._generate_json(prompt, options)
+        if data is None:
+            return None
+        if not matches_schema(data, LINE_ID_SCHEMA) or not all(_valid_line_id(i, len(lines)) for i in data["ids"]):
+            self.logger.warning(f"AI answer does not match the line-ID schema: {data}")
+            return None
+        return [lines[i - 1] for i in dict.fromkeys(data["ids"])], True
+
+    def _streaming(self) -> bool:
+        return self.config.get('stream_responses', True) and hasattr(self.api_manager, 'stream_with_retry')
+
+    def _generate_json(self, prompt: str, options: dict | None = None):
+        response_text = self.api_manager.generate_with_retry(prompt, **(options or {}))
+        if not response_text:
+            return None
+        try:
+            return json.loads(response_text)
+        except json.JSONDecodeError as e:
+            self.logger.warning(f"Could not parse JSON from API response: {response_text}. Error: {e}")
+            return None
+
+    def _stream_items(self, prompt: str, key: str, convert, on_phrase=None, cancel=None,
+                      options: dict | None = None) -> tuple[list[str], bool] | None:
+        """
+        Streams the completion and turns each item of the `key` array into a phrase
+        with `convert` as soon as it closes. Returns (phrases, complete); the answer
+        isn't complete if it was cut off or `convert` rejected an item.
+        """
+        parser = JsonArrayStreamParser(key)
+        phrases = []
+        rejected = 0
+        received_any = False
+        stream = self.api_manager.stream_with_retry(prompt, **(options or {}))
+        try:
+            for delta in stream:
+                received_any = True
+                if cancel is not None and cancel.is_set():
+                    self.logger.debug("Cancelled AI stream for a superseded screen.")
+                    return None
+                for item in parser.feed(delta):
+                    phrase = convert(item)
+                    if phrase is None:
+                        rejected += 1
+                    elif phrase not in phrases:
+                        phrases.append(phrase)
+                        if on_phrase:
+                            on_phrase(phrase)
+        finally:
+            stream.close()
+        if not received_any:
+            return None
+        return phrases, parser.done and not rejected
+
+    def _cache_verdicts(self, lines: list[str], phrases: list[str], focus_topic: str):
+        for line in lines:
+            normalized = normalize_line(line)
+            verdict = []
+            for phrase in phrases:
+                normalized_phrase = normalize_line(phrase)
+                if normalized_phrase in normalized:
+                    verdict.append(phrase)
+                elif normalized in normalized_phrase:
+                    verdict.append(line)
+            self.verdict_cache.put(focus_topic, line, verdict)
+            self.relevance_filter.learn(focus_topic, line, verdict)
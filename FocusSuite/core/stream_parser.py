@@ -0,0 +1,77 @@
+# incremental parser for the JSON array the model streams back
+
+import json
+
+
+class JsonArrayStreamParser:
+    """
+    Pulls the items of one top-level array (e.g. {"distractions": [...]}) out of
+    a JSON document that arrives in arbitrary chunks. Each string or number is
+    returned from `feed` as soon as it is complete, long before the document ends.
+    """
+    def __init__(self, key: str = "distractions"):
+        self._key_literal = json.dumps(key)
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: str) -> list:
+        if self.done or not chunk:
+            return []
+        self._buffer += chunk
+        items = []
+
+        if not self._in_array:
+            key_at = self._buffer.find(self._key_literal)
+            if key_at < 0:
+                return items
+            bracket_at = self._buffer.find("[", key_at + len(self._key_literal))
+            if bracket_at < 0:
+                return items
+            self._in_array = True
+            self._pos = bracket_at + 1
+
+        buf = self._buffer
+        while self._pos < len(buf):
+            ch = buf[self._pos]
+            if ch in " \t\r\n,":
+                self._pos += 1
+            elif ch == "]":
+                self.done = True
+                break
+            elif ch == '"':
+                end = self._string_end(buf, self._pos)
+                if end < 0:
+                    break
+                items.append(json.loads(buf[self._pos:end + 1]))
+                self._pos = end + 1
+            else:
+                # a bare scalar is only complete once its delimiter has arrived
+                end = self._pos
+                while end < len(buf) and buf[end] not in " \t\r\n,]":
+                    end += 1
+                if end == len(buf):
+                    break
+                try:
+                    items.append(json.loads(buf[self._pos:end]))
+                except json.JSONDecodeError:
+                    pass
+                self._pos = end
+
+        # drop consumed text so long streams don't rescan the whole buffer
+        self._buffer = buf[self._pos:]
+        self._pos = 0
+        return items
+
+    @staticmethod
+    def _string_end(buf: str, start: int) -> int:
+        i = start + 1
+        while i < len(buf):
+            if buf[i] == "\\":
+                i += 2
+                continue
+            if buf[i] == '"':
+                return i
+            i += 1
+        return -1
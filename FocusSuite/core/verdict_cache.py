@@ -0,0 +1,63 @@
+# caches the LLM's distraction verdict for individual OCR lines
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_line(text: str) -> str:
+    """Lowercases and collapses whitespace so OCR jitter maps to one cache key."""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class VerdictCache:
+    """
+    LRU + TTL cache of per-line verdicts keyed by (focus topic, normalized line).
+    A verdict is the tuple of distracting phrases found on that line; an empty
+    tuple means the line was reviewed and judged on-topic.
+    """
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, topic: str, line: str) -> tuple:
+        return normalize_line(topic), normalize_line(line)
+
+    def get(self, topic: str, line: str):
+        """Returns the cached verdict for a line, or None if unknown or expired."""
+        key = self._key(topic, line)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            verdict, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def put(self, topic: str, line: str, verdict: tuple):
+        key = self._key(topic, line)
+        with self._lock:
+            self._entries[key] = (tuple(verdict), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
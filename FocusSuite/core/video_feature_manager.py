@@ -1,28 +1,44 @@
 import os
 import threading
 from tkinter import filedialog, messagebox
-from .video_processor import VideoProcessor
+from .progress import ProgressBus
+
+# how often the UI picks up progress; events in between are coalesced
+PROGRESS_INTERVAL_MS = 250
 
 class VideoFeatureManager:
     """
     Orchestrate the video processing feature, acting as a bridge
     between the UI tab and the video processing core logic.
     """
-    def __init__(self, logger, root, vision_api_manager):
+    def __init__(self, logger, root, vision_api_manager, config=None):
         self.logger = logger
         self.root = root
         self.vision_api_manager = vision_api_manager
+        self.config = config
 
         self.video_path = None
         self.processing_thread = None
         self.ui_tab = None
+        self.progress = ProgressBus()
 
     def register_ui_tabs(self, ui_tab):
         self.ui_tab = ui_tab
 
     def _update_log(self, message:str):
+        self.progress.note(message)
+
+    def _poll_progress(self):
+        # runs on the Tk thread; checking the worker first means its last events are never missed
+        running = self.processing_thread is not None and self.processing_thread.is_alive()
+        event, messages = self.progress.drain()
         if self.ui_tab:
-            self.root.after(0,self.ui_tab.append_video_log, message)
+            if messages:
+                self.ui_tab.append_video_log_lines(messages)
+            if event is not None:
+                self.ui_tab.update_progress(event)
+        if running:
+            self.root.after(PROGRESS_INTERVAL_MS, self._poll_progress)
 
     def select_video(self):
         file_path = filedialog.askopenfilename(
@@ -55,6 +71,7 @@ class VideoFeatureManager:
             return
 
 
+        self.progress = ProgressBus()
         path_without_ext, extension = os.path.splitext(self.video_path)
         output_path = f"{path_without_ext}_edited{extension}"
         
@@ -63,6 +80,7 @@ class VideoFeatureManager:
 
 
         self.ui_tab.start_video_button.config(state='disabled')
+        self.ui_tab.reset_progress()
         self._update_log("Preparing to process video...")
         self.logger.info(f"Starting video processing for '{self.video_path}' with prompt '{prompt}'")
 
@@ -72,11 +90,20 @@ class VideoFeatureManager:
             daemon=True
         )
         self.processing_thread.start()
+        self.root.after(PROGRESS_INTERVAL_MS, self._poll_progress)
 
     def _processing_worker(self,video_path,prompt, output_path):
         try:
-            processor = VideoProcessor(self.logger, self._update_log)
-            processor.process_video(video_path, prompt, self.vision_api_manager,output_path)
+            # the video stack (OpenCV, moviepy) is only loaded once a video is actually processed
+            from .video_processor import VideoProcessor
+            from .vision_backends import create_vision_backend
+            backend = create_vision_backend(self.config, self.vision_api_manager, prompt, self.logger)
+            self._update_log(f"Frame analysis: {backend.name}")
+            processor = VideoProcessor(self.logger, self.progress, self.config)
+            try:
+                processor.process_video(video_path, prompt, backend, output_path)
+            finally:
+                backend.close()
             self.logger.info("Video processing finished successfully.")
             messagebox.showinfo('Sucess', f'Video processing complete!\n Saved to : {output_path}')
         except Exception as e:
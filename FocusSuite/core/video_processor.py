@@ -3,103 +3,153 @@ import os
 import tempfile
 import numpy as np
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from skimage.metrics import structural_similarity as ssim
 from moviepy.editor import VideoFileClip
 import shutil
 
+from core.blur_timeline import BlurTimeline, FrameTable
+from core.change_detection import ChangeDetector
+from core.progress import ProgressBus
+from utils.metrics import metrics, span
+
 SSIM_THRESHOLD = 0.95
+# frames decoded per change-detection batch; bounds memory for full-resolution frames
+FRAME_BATCH_SIZE = 16
+# pipeline stages in order, as reported on the progress bus
+STAGES = ('extract', 'analyze', 'rebuild', 'finalize')
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
 
 class VideoProcessor:
-    def __init__(self, logger, progress_callback):
+    def __init__(self, logger, progress: ProgressBus, config=None):
         self.logger = logger
-        self.progress_callback = progress_callback
+        self.progress = progress
+        self.config = config
 
     def _extract_unique_frames (self, video_path):
         self.logger.info(f"Starting frame extraction for {video_path}")
-        self.progress_callback("Step 1/4: Extracting unique frames...")
+        self.progress.publish('extract', message="Step 1/4: Extracting unique frames...")
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             self.logger.error("Could not open video file.")
-            self.progress_callback("Error: Could not open video file.")
+            self.progress.publish('error', message="Error: Could not open video file.")
             return None, 0, 0
 
-        unique_frames_data = []
         last_frame_gray = None
         frame_count =0
-        saved_count =0
+        bytes_written = 0
 
         temp_dir = tempfile.mkdtemp(prefix="focusvideo_")
         self.logger.info(f"Created temporary directory for frames: {temp_dir}")
+        unique_frames = FrameTable(temp_dir)
 
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = cap.get(cv2.CAP_PROP_FPS)
 
+        detector = ChangeDetector(ssim_threshold=SSIM_THRESHOLD)
+        batch_frames = []
+        batch_grays = []
+
         while True:
             ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count +=1
-            current_frame_small = cv2.resize(frame, (256, 144))
-            current_frame_gray = cv2.cvtColor(current_frame_small, cv2.COLOR_BGR2GRAY)
-
-            if last_frame_gray is not None:
-                score, _ = ssim(last_frame_gray, current_frame_gray, full=True)
-                if score > SSIM_THRESHOLD:
+            if ret:
+                frame_count +=1
+                current_frame_small = cv2.resize(frame, (256, 144))
+                batch_frames.append(frame)
+                batch_grays.append(cv2.cvtColor(current_frame_small, cv2.COLOR_BGR2GRAY))
+                if len(batch_frames) < FRAME_BATCH_SIZE:
                     continue
 
-            last_frame_gray = current_frame_gray
-            frame_filename = os.path.join(temp_dir, f"frame_{saved_count:06d}.jpg")
-            cv2.imwrite(frame_filename, frame)
-            unique_frames_data.append({'original_index':frame_count - 1, 'path': frame_filename, 'blur': False})
-            saved_count +=1
+            if batch_frames:
+                batch_start = frame_count - len(batch_frames)
+                metrics.inc('video.frames_decoded', len(batch_frames))
+                with span('video.change_detection'):
+                    offsets = self._unique_offsets(detector, last_frame_gray, np.stack(batch_grays))
+                metrics.inc('video.frames_unique', len(offsets))
+                for offset in offsets:
+                    last_frame_gray = batch_grays[offset]
+                    frame_filename = unique_frames.append(batch_start + offset)
+                    cv2.imwrite(frame_filename, batch_frames[offset])
+                    bytes_written += os.path.getsize(frame_filename)
+                self.progress.publish('extract', frame_count, total_frames, bytes=bytes_written)
+                batch_frames.clear()
+                batch_grays.clear()
 
-            if saved_count %10 == 0:
-                self.progress_callback(f"Setup 1/4: Extracted {saved_count} unique frames from ~{frame_count}/{total_frames}...")
+            if not ret:
+                break
 
         cap.release()
-        self.logger.info(f"Found {len(unique_frames_data)} unique frames out of {frame_count}.")
-        self.progress_callback(f"Step 1/4: Found {len(unique_frames_data)} unique frames to analyze.")
-        return unique_frames_data, fps, temp_dir
-
-    def _process_frames_api(self, frames_to_process, prompt, api_manager):
-        self.logger.info(f"Starting parallael API processing for {len(frames_to_process)} frames.")
-        self.progress_callback("Step 2/4: Analyzing frames with AI (this may take a while)...")
+        self.logger.info(f"Found {len(unique_frames)} unique frames out of {frame_count}.")
+        self.progress.publish('extract', frame_count, frame_count, bytes=bytes_written,
+                              message=f"Step 1/4: Found {len(unique_frames)} unique frames to analyze.")
+        return unique_frames, fps, temp_dir
+
+    @staticmethod
+    def _unique_offsets(detector, reference, stack):
+        """Indices of frames in the batch that differ from the last kept frame, chaining as they are kept."""
+        offsets = []
+        start = 0
+        if reference is None:
+            offsets.append(0)
+            reference = stack[0]
+            start = 1
+        while start < len(stack):
+            i = detector.first_change(reference, stack[start:])
+            if i < 0:
+                break
+            start += i
+            offsets.append(start)
+            reference = stack[start]
+            start += 1
+        return offsets
+
+    def _analyze_frames(self, frames: FrameTable, prompt, backend):
+        self.logger.info(f"Starting parallel analysis of {len(frames)} frames ({backend.name} backend).")
+        total_to_process = len(frames)
+        self.progress.publish('analyze', 0, total_to_process,
+                              message="Step 2/4: Analyzing frames with AI (this may take a while)...")
 
         processed_count=0
-        total_to_process = len(frames_to_process)
         lock = threading.Lock()
 
-        def process_single_frame(frame_data):
+        def process_batch(rows):
             nonlocal processed_count
-            full_prompt = f"""You are an automated image analysis system. Your sole function is to identify a specific object in an image and respond with a single word. 
-**Task:** Determine if the image contains the following object: '{prompt}'
-**Instructions:**
-1. If the object is present, even partially, your entier response must be the exact word: yes
-2. If the obejct is NOT present, or if you are uncertain, your entire response must be the exact word: no
-3. Do NOT provide any explanation, punctuation, or any other text. 
-"""
-            response = api_manager.get_image_description(frame_data['path'], full_prompt)
-            if response and 'yes' in response.lower():
-                frame_data['blur'] = True
+            verdicts = backend.analyze_batch([frames.path(row) for row in rows], prompt)
+            frames.blur[rows.start:rows.stop] = verdicts
 
             with lock:
-                processed_count+=1
-                if processed_count % 5 ==0 or  processed_count == total_to_process:
-                    self.progress_callback(f"Step 2/4: Analyzed {processed_count}/{total_to_process} frames...")
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            executor.map(process_single_frame, frames_to_process)
-
-        self.logger.info("Finished API processing.")
-        self.progress_callback("Step 2/4: Frame analysis complete.")
-        return frames_to_process
-
-    def _reconstruct_video(self, original_video_path, processed_frames, fps, output_path, temp_dir):
+                processed_count += len(rows)
+                self.progress.publish('analyze', processed_count, total_to_process, api_calls=backend.api_calls)
+
+        batches = [range(i, min(i + backend.batch_size, total_to_process))
+                   for i in range(0, total_to_process, backend.batch_size)]
+        with ThreadPoolExecutor(max_workers=backend.concurrency) as executor:
+            list(executor.map(process_batch, batches))
+
+        self.logger.info("Finished frame analysis.")
+        self.progress.publish('analyze', processed_count, total_to_process, api_calls=backend.api_calls,
+                              message="Step 2/4: Frame analysis complete.")
+        return frames
+
+    def _build_timeline(self, frames: FrameTable, total_frames: int, fps: float) -> BlurTimeline:
+        """
+        Each analyzed frame's verdict holds until the next one. Optionally,
+        unblurred gaps up to 'video_blur_merge_gap' seconds are closed and
+        blurred runs shorter than 'video_min_blur' seconds are dropped.
+        """
+        timeline = BlurTimeline.from_keyframes(frames.index, frames.blur, total_frames)
+        if self.config is not None:
+            fps = fps or 30.0
+            timeline = timeline.close_gaps(round(self.config.get('video_blur_merge_gap', 0.0) * fps))
+            timeline = timeline.drop_shorter(round(self.config.get('video_min_blur', 0.0) * fps))
+        return timeline
+
+    def _reconstruct_video(self, original_video_path, frames: FrameTable, fps, output_path, temp_dir):
         self.logger.info("Starting robus video reconstruction.")
-        self.progress_callback("Step 3/4: Building blur timeiline...")
+        self.progress.publish('rebuild', message="Step 3/4: Building blur timeiline...")
 
         cap = cv2.VideoCapture(original_video_path)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -107,55 +157,52 @@ class VideoProcessor:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         cap.release()
 
-        blur_timeline = np.zeros(total_frames, dtype = bool)
-        if processed_frames:
-            sorted_frames = sorted(processed_frames, key=lambda x: x['original_index'])
-
-            for i in range(len(sorted_frames)-1):
-                start_info = sorted_frames[i]
-                end_info = sorted_frames[i+1]
-                start_index = start_info['original_index']
-                end_index = end_info['original_index']
-                blur_status = start_info['blur']
-                blur_timeline[start_index: end_index] = blur_status
+        blur_timeline = self._build_timeline(frames, total_frames, fps)
+        self.logger.info(f"Blur timeline: {blur_timeline.frame_count} of {total_frames} frames in {len(blur_timeline)} runs.")
 
-            last_frame_info = sorted_frames[-1]
-            last_index = last_frame_info['original_index']
-            last_blur_status = last_frame_info['blur']
-            blur_timeline[last_index:] = last_blur_status
-
-
-        self.progress_callback("Step 3/4: Rebuilding video from timeline...")
+        self.progress.publish('rebuild', 0, total_frames, message="Step 3/4: Rebuilding video from timeline...")
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         temp_video_path = os.path.join(temp_dir, "temp_video_no_audio.mp4")
         out= cv2.VideoWriter(temp_video_path, fourcc, fps, (width, height))
 
-        frame_map = {frame['original_index']: frame for frame in processed_frames}
+        # both walk forward with the output, so each frame costs O(1)
+        keyframes = frames.index.tolist()
+        next_row = 0
         last_unique_frame_image = None
-
-        for i in range(total_frames):
-            if i in frame_map:
-                last_unique_frame_image = cv2.imread(frame_map[i]['path'])
-
-            if last_unique_frame_image is not None:
-                if blur_timeline[i]:
-                    output_image = cv2.GaussianBlur(last_unique_frame_image, (251,251), 0)
-                else:
-                    output_image = last_unique_frame_image
-                out.write(output_image)
-
-            if i > 0 and i %100 == 0:
-                self.progress_callback(f"Step 3/4: rebuild {i}/{total_frames} frames..")
+        blurred_image = None
+
+        for start, end, blurred in blur_timeline.segments(total_frames):
+            for i in range(start, end):
+                while next_row < len(keyframes) and keyframes[next_row] <= i:
+                    last_unique_frame_image = cv2.imread(frames.path(next_row))
+                    blurred_image = None
+                    next_row += 1
+
+                if last_unique_frame_image is not None:
+                    if blurred:
+                        # a repeated frame in a blurred run reuses its blurred image
+                        if blurred_image is None:
+                            with span('video.blur'):
+                                blurred_image = cv2.GaussianBlur(last_unique_frame_image, (251,251), 0)
+                        output_image = blurred_image
+                    else:
+                        output_image = last_unique_frame_image
+                    out.write(output_image)
+
+                if i % 25 == 0:
+                    self.progress.publish('rebuild', i, total_frames)
 
 
         out.release()
+        self.progress.publish('rebuild', total_frames, total_frames, bytes=_file_size(temp_video_path))
 
         self.logger.info("Video frames rebuilt. Adding original audio...")
-        self.progress_callback("Step 4/4: Finalizing video with audio...")
+        self.progress.publish('finalize', 0, 1, message="Step 4/4: Finalizing video with audio...")
 
         original_clip = None
         video_clip = None
         final_clip = None
+        finalize_start = time.perf_counter()
 
         try:
             original_clip = VideoFileClip(original_video_path)
@@ -176,24 +223,32 @@ class VideoProcessor:
                 video_clip.close()
             if final_clip:
                 final_clip.close()
+            metrics.observe('video.finalize', time.perf_counter() - finalize_start)
 
 
-        self.progress_callback(f"Done! Video saved to {os.path.basename(output_path)}")
+        self.progress.publish('finalize', 1, 1, bytes=_file_size(output_path))
+        self.progress.publish('done', message=f"Done! Video saved to {os.path.basename(output_path)}")
 
-    def process_video(self, video_path, prompt, api_manager, output_path):
-        unique_frames, fps, temp_dir = self._extract_unique_frames(video_path)
-        if unique_frames is None or not unique_frames:
+    def process_video(self, video_path, prompt, backend, output_path):
+        """`backend` is a VisionBackend (core/vision_backends.py) that decides which frames to blur."""
+        with span('video.extract'):
+            unique_frames, fps, temp_dir = self._extract_unique_frames(video_path)
+        if unique_frames is None or not len(unique_frames):
             self.logger.error("No unique frames were extracted. Aborting Process.")
-            self.progress_callback("Error: No frames found in video.")
+            self.progress.publish('error', message="Error: No frames found in video.")
             if temp_dir and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
             return
 
-        processed_frames_info = self._process_frames_api(unique_frames, prompt, api_manager)
-        self._reconstruct_video(video_path, processed_frames_info, fps, output_path, temp_dir)
-
         try:
-            shutil.rmtree(temp_dir)
-            self.logger.info(f"Successfully cleaned up temporary directory: {temp_dir}")
-        except Exception as e:
-            self.logger.warning(f"Could not clean up temp directory {temp_dir}: {e}")
+            with span('video.analyze'):
+                self._analyze_frames(unique_frames, prompt, backend)
+            with span('video.rebuild'):
+                self._reconstruct_video(video_path, unique_frames, fps, output_path, temp_dir)
+        finally:
+            # the extracted frames are removed even when analysis or the rebuild fails
+            try:
+                shutil.rmtree(temp_dir)
+                self.logger.info(f"Successfully cleaned up temporary directory: {temp_dir}")
+            except Exception as e:
+                self.logger.warning(f"Could not clean up temp directory {temp_dir}: {e}")
@@ -0,0 +1,266 @@
+# answers "does this frame show <prompt>?" for the video feature, over HTTP or with a local ONNX model
+
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.metrics import metrics, span
+
+
+def yes_no_prompt(prompt: str) -> str:
+    return f"""You are an automated image analysis system. Your sole function is to identify a specific object in an image and respond with a single word.
+**Task:** Determine if the image contains the following object: '{prompt}'
+**Instructions:**
+1. If the object is present, even partially, your entier response must be the exact word: yes
+2. If the obejct is NOT present, or if you are uncertain, your entire response must be the exact word: no
+3. Do NOT provide any explanation, punctuation, or any other text.
+"""
+
+
+class VisionBackend(ABC):
+    """
+    Decides for a batch of frame images whether each shows what the prompt
+    describes. The video processor sends `batch_size` frames per call and
+    runs up to `concurrency` calls at once.
+    """
+    name = "base"
+    batch_size = 1
+    concurrency = 1
+
+    def __init__(self):
+        # requests sent to a paid remote API, for the progress display
+        self.api_calls = 0
+
+    def supports(self, prompt: str) -> bool:
+        return True
+
+    @abstractmethod
+    def analyze_batch(self, paths: list[str], prompt: str) -> list[bool]:
+        ...
+
+    def close(self):
+        pass
+
+
+class HttpVisionBackend(VisionBackend):
+    """The hosted vision endpoint of VisionAPIManager: one request per frame, a few in flight."""
+    name = "http"
+    concurrency = 5
+
+    def __init__(self, vision_api_manager):
+        super().__init__()
+        self.api = vision_api_manager
+        self._lock = threading.Lock()
+
+    def analyze_batch(self, paths: list[str], prompt: str) -> list[bool]:
+        full_prompt = yes_no_prompt(prompt)
+        verdicts = []
+        for path in paths:
+            with span('video.frame_api'):
+                response = self.api.get_image_description(path, full_prompt)
+            metrics.inc('video.api_calls')
+            metrics.inc('video.bytes_uploaded', os.path.getsize(path) if os.path.exists(path) else 0)
+            with self._lock:
+                self.api_calls += 1
+            verdicts.append(bool(response) and 'yes' in response.lower())
+        return verdicts
+
+
+def load_labels(path: str) -> list[str]:
+    """One class per line, in output order; a line may list synonyms separated by commas."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class OnnxVisionBackend(VisionBackend):
+    """
+    Runs a user-supplied ONNX classifier or detector in-process with OpenCV DNN.
+
+    The prompt is matched against the model's class labels: a frame is
+    blurred when any matching class scores at least `threshold`. Prompts that
+    name no class can't be answered, so `supports` is False for them.
+
+    Frames are decoded and resized on a thread pool and sent through the
+    network `batch_size` at a time; OpenCV spreads each forward pass over
+    `threads` cores (0 leaves its default). Two batches are in flight, so
+    the next one is decoded while the current one runs.
+
+    Accepted outputs: class scores (N, C), as logits or probabilities, and
+    YOLO-style detections (N, 4+C, A), (N, A, 4+C) or (N, A, 5+C) with
+    objectness. A detector's frame score is its best box for the class.
+    Class scores are taken as probabilities (softmax or independent sigmoids)
+    unless `output` is 'logits' or, with 'auto', they fall outside [0, 1];
+    logits get a softmax.
+    """
+    name = "onnx"
+    concurrency = 2
+
+    def __init__(self, model_path: str, labels: list[str], input_size: int = 224, threshold: float = 0.5,
+                 batch_size: int = 32, threads: int = 0, mean=None, std=None, swap_rb: bool = True,
+                 output: str = 'auto'):
+        super().__init__()
+        self.model_path = model_path
+        self.labels = labels
+        self.input_size = (input_size, input_size) if isinstance(input_size, int) else tuple(input_size)
+        self.threshold = threshold
+        self.batch_size = max(int(batch_size), 1)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32).reshape(1, -1, 1, 1)
+        self.std = None if std is None else np.asarray(std, dtype=np.float32).reshape(1, -1, 1, 1)
+        self.swap_rb = swap_rb
+        if output not in ('auto', 'logits', 'softmax', 'sigmoid'):
+            raise ValueError(f"Unknown vision_output '{output}'; use auto, logits, softmax or sigmoid.")
+        self.output = output
+        if threads:
+            cv2.setNumThreads(threads)
+
+        # OpenCV's own backend on the CPU, the default
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        # a Net is not safe to run from two threads
+        self._net_lock = threading.Lock()
+        self._decoder = ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 4,
+                                           thread_name_prefix="vision-decode")
+        self._patterns = [
+            re.compile(r'\b(?:' + '|'.join(re.escape(name.strip().lower()) + r'(?:e?s)?'
+                                           for name in label.split(',') if name.strip()) + r')\b')
+            for label in labels
+        ]
+
+    @classmethod
+    def from_config(cls, config) -> 'OnnxVisionBackend':
+        labels = config.get('vision_model_labels')
+        if isinstance(labels, str):
+            labels = load_labels(labels)
+        if not labels:
+            raise ValueError("'vision_model_labels' must name a labels file or list the model's classes.")
+        return cls(
+            config.get('vision_model_path', ''),
+            labels,
+            input_size=config.get('vision_input_size', 224),
+            threshold=config.get('vision_threshold', 0.5),
+            batch_size=config.get('vision_batch_size', 32),
+            threads=config.get('vision_threads', 0),
+            mean=config.get('vision_mean'),
+            std=config.get('vision_std'),
+            swap_rb=config.get('vision_swap_rb', True),
+            output=config.get('vision_output', 'auto'),
+        )
+
+    def classes_for(self, prompt: str) -> list[int]:
+        """Indices of the classes the prompt names, e.g. 'a person walking' -> [person]."""
+        prompt = prompt.lower()
+        return [i for i, pattern in enumerate(self._patterns) if pattern.search(prompt)]
+
+    def supports(self, prompt: str) -> bool:
+        return bool(self.classes_for(prompt))
+
+    def _load(self, path: str):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return cv2.resize(image, self.input_size, interpolation=cv2.INTER_AREA)
+
+    def class_scores(self, output: np.ndarray) -> np.ndarray:
+        """Reduces a network output to one score per frame and class, shape (N, C)."""
+        n_classes = len(self.labels)
+        if output.ndim == 2:
+            if output.shape[1] != n_classes:
+                raise ValueError(f"Model outputs {output.shape[1]} classes but {n_classes} labels were given.")
+            # probabilities need not sum to 1: a multi-label model scores each class on its own
+            if self.output == 'logits' or (self.output == 'auto' and (output.min() < 0 or output.max() > 1)):
+                exp = np.exp(output - output.max(axis=1, keepdims=True))
+                output = exp / exp.sum(axis=1, keepdims=True)
+            return output
+        if output.ndim == 3:
+            if output.shape[1] == 4 + n_classes and output.shape[2] != 4 + n_classes:
+                output = output.transpose(0, 2, 1)
+            if output.shape[2] == 4 + n_classes:
+                scores = output[:, :, 4:]
+            elif output.shape[2] == 5 + n_classes:
+                scores = output[:, :, 5:] * output[:, :, 4:5]
+            else:
+                raise ValueError(f"Can't read detections of shape {output.shape} for {n_classes} labels.")
+            return scores.max(axis=1)
+        raise ValueError(f"Unsupported model output shape {output.shape}.")
+
+    def _forward(self, images: list[np.ndarray]) -> np.ndarray:
+        blob = cv2.dnn.blobFromImages(images, 1 / 255.0, self.input_size, swapRB=self.swap_rb, crop=False)
+        if self.mean is not None:
+            blob -= self.mean
+        if self.std is not None:
+            blob /= self.std
+        with self._net_lock, span('vision.forward'):
+            self.net.setInput(blob)
+            return self.net.forward()
+
+    def probe(self):
+        """
+        Runs blank frames through the network, so a model that can't take
+        `batch_size` frames at once or whose output doesn't fit the labels fails
+        here rather than mid-job. A model exported with a fixed batch of one
+        falls back to one frame per pass.
+        """
+        blank = np.zeros((self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
+        for size in dict.fromkeys((self.batch_size, 1)):
+            try:
+                scores = self.class_scores(self._forward([blank] * size))
+            except cv2.error:
+                if size == 1:
+                    raise
+                continue
+            if len(scores) == size:
+                self.batch_size = size
+                return
+        raise ValueError("The model doesn't return one result per input frame.")
+
+    def analyze_batch(self, paths: list[str], prompt: str) -> list[bool]:
+        classes = self.classes_for(prompt)
+        with span('vision.decode'):
+            images = list(self._decoder.map(self._load, paths))
+        loaded = [i for i, image in enumerate(images) if image is not None]
+        verdicts = [False] * len(paths)
+        if not loaded or not classes:
+            return verdicts
+
+        output = self._forward([images[i] for i in loaded])
+        metrics.inc('vision.frames', len(loaded))
+        scores = self.class_scores(output)[:, classes].max(axis=1)
+        for i, score in zip(loaded, scores):
+            verdicts[i] = bool(score >= self.threshold)
+        return verdicts
+
+    def close(self):
+        self._decoder.shutdown(wait=False)
+
+
+def create_vision_backend(config, vision_api_manager, prompt: str, logger) -> VisionBackend:
+    """
+    Builds the backend named by the 'vision_backend' setting ('http' or
+    'onnx'). The ONNX model is used only for prompts that name one of its
+    classes; anything else, or a model that fails to load or to run a test
+    batch, goes to the HTTP API.
+    """
+    if config is not None and config.get('vision_backend', 'http') == 'onnx':
+        backend = None
+        try:
+            backend = OnnxVisionBackend.from_config(config)
+            batch_size = backend.batch_size
+            backend.probe()
+        except (cv2.error, OSError, ValueError) as e:
+            logger.warning(f"Local vision model unavailable, using the vision API instead: {e}")
+            if backend is not None:
+                backend.close()
+        else:
+            if backend.batch_size != batch_size:
+                logger.info(f"The local vision model takes one frame per pass, not {batch_size}.")
+            if backend.supports(prompt):
+                matched = ", ".join(backend.labels[i] for i in backend.classes_for(prompt))
+                logger.info(f"Analyzing frames locally with {os.path.basename(backend.model_path)} ({matched}).")
+                return backend
+            backend.close()
+            logger.info(f"The local vision model has no class for '{prompt}'; using the vision API instead.")
+    return HttpVisionBackend(vision_api_manager)
@@ -0,0 +1,57 @@
+# remembers the last analyzed state of recently used windows for instant restore on refocus
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.models import BoxSet, WindowInfo
+
+
+def window_key(window: WindowInfo) -> tuple:
+    """Identity of a window: backend handle (if any), title and size. Moving a window keeps its key."""
+    x1, y1, x2, y2 = window.bbox
+    return window.handle, window.title, x2 - x1, y2 - y1
+
+
+@dataclass
+class CachedWindow:
+    """The thumbnail a window's boxes were computed for, and the window-relative boxes."""
+    fingerprint: np.ndarray
+    areas: BoxSet
+    stored_at: float
+
+
+class WindowCache:
+    """Bounded LRU of per-window results, keyed by `window_key`."""
+    def __init__(self, max_windows: int = 16):
+        self.max_windows = max_windows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> CachedWindow | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, fingerprint: np.ndarray, areas: BoxSet):
+        with self._lock:
+            self._entries[key] = CachedWindow(fingerprint, areas, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_windows:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: tuple):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,10 +1,11 @@
 
 import ctypes
+import multiprocessing
 import tkinter as tk
 from dotenv import load_dotenv
 
 from app import OptimizedProductivitySuite
-from utils.logger import setup_logging
+from utils.logger import setup_logging, shutdown_logging
 
 def main():
     load_dotenv()
@@ -19,9 +20,16 @@ def main():
 
     app =  OptimizedProductivitySuite(root)
 
-    setup_logging(console_widget=app.ui.distraction_tab.console_text)
+    setup_logging(
+        console_widget=app.ui.distraction_tab.console_text,
+        max_lines=app.config.get('console_max_lines', 2000),
+        flush_ms=app.config.get('console_flush_ms', 100),
+    )
 
     root.mainloop()
+    shutdown_logging()
 
 if __name__ == "__main__":
+    # a frozen build re-runs this script in the spawned engine process; this hands control to the engine there
+    multiprocessing.freeze_support()
     main()
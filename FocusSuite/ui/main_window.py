@@ -6,6 +6,7 @@ from ui.themed_style import ThemedStyle
 from ui.tabs.video_tab import VideoTab
 from ui.tabs.distraction_tab import DistractionBlockerTab
 from ui.tabs.settings_tab import SettingsTab
+from ui.tabs.diagnostics_tab import DiagnosticsTab
 
 class MainWindow:
     def __init__(self, root, app_callbacks):
@@ -20,12 +21,15 @@ class MainWindow:
         self.notebook = ttk.Notebook(self.root)
         self.status_label = None
         self.connection_label = None
+        self.ocr_label = None
+        self.budget_label = None
         self.theme_var = tk.StringVar(value=self.theme_name)
 
 
         self.distraction_tab = None
         self.video_tab = None
         self.settings_tab = None
+        self.diagnostics_tab = None
 
         self._setup_ui()
         self._apply_theme(self.theme_name)
@@ -42,6 +46,9 @@ class MainWindow:
         self.settings_tab = SettingsTab(self.notebook, self.callbacks, self.theme_var, self._apply_theme)
         self.notebook.add(self.settings_tab, text='Settings')
 
+        self.diagnostics_tab = DiagnosticsTab(self.notebook, self.callbacks)
+        self.notebook.add(self.diagnostics_tab, text='Diagnostics')
+
 
         self._create_status_bar()
 
@@ -62,8 +69,13 @@ class MainWindow:
         status_bar.pack(side='bottom', fill='x', padx=5, pady=2)
         self.connection_label = ttk.Label(status_bar, text="API: OFFLINE", style='Error.TLabel')
         self.connection_label.pack(side='left')
+        self.ocr_label = ttk.Label(status_bar, text="OCR: checking...")
+        self.ocr_label.pack(side='left', padx=10)
         self.status_label = ttk.Label(status_bar, text="Status: Idle")
         self.status_label.pack(side='right')
+        # live AI/CPU budget usage while monitoring
+        self.budget_label = ttk.Label(status_bar, text="")
+        self.budget_label.pack(side='right', padx=10)
 
     def load_settings(self):
         self.distraction_tab.provider_var.set(self.callbacks['get_setting']('provider', 'OpenAI'))
@@ -1,62 +1,159 @@
 # manages the transparent, click through overlay window that displays distraction boxes.
 
+import time
 import tkinter as tk
-from typing import List
-from core.models import DistractionArea
+from core.models import BoxSet
+from utils.constants import OVERLAY_TITLE
+from utils.metrics import metrics
 
 class SmartOverlayManager:
-    #Manages a single, dynamically updatable overlay window.
+    """
+    Manages a single, dynamically updatable overlay window.
+
+    Updates are coalesced: everything queued before Tk goes idle collapses into
+    one draw of the newest boxes. Each draw reconciles the canvas against what
+    is already on it, so unchanged boxes are left alone, moved boxes are
+    repositioned and only real additions and removals create or delete items.
+    """
     def __init__(self, root: tk.Tk):
         self.root = root
         self.overlay_window = None
         self.canvas = None
-        self.drawn_rects = []
+        # canvas item id -> (canvas rect, text) currently drawn
+        self.drawn_rects = {}
+        self._pending = None
+        self._flush_id = None
+        # Tk main-thread cost of drawing, and how many updates were superseded before being drawn
+        self.updates_drawn = 0
+        self.updates_coalesced = 0
+        self.draw_seconds = 0.0
+        self.last_draw_seconds = 0.0
+        self.last_changes = (0, 0, 0)
+        # screen area the overlay spans; None means the primary screen
+        self.screen_bbox = None
+
+    def set_screen_bbox(self, bbox: tuple | None):
+        # spans the overlay over every monitor when the capture backend knows their extent
+        if bbox == self.screen_bbox:
+            return
+        self.screen_bbox = bbox
+        if self.overlay_window and self.overlay_window.winfo_exists():
+            self.overlay_window.geometry(self._geometry())
+
+    def _geometry(self) -> str:
+        if self.screen_bbox is None:
+            return f"{self.root.winfo_screenwidth()}x{self.root.winfo_screenheight()}+0+0"
+        x1, y1, x2, y2 = self.screen_bbox
+        return f"{x2 - x1}x{y2 - y1}+{x1}+{y1}"
 
     def _create_window(self):
         #Creates the full-screen, transparent toplevel window.
         self.overlay_window = tk.Toplevel(self.root)
+        self.overlay_window.title(OVERLAY_TITLE)
         self.overlay_window.overrideredirect(True)
         self.overlay_window.attributes("-topmost", True)
         self.overlay_window.attributes("-alpha",0.7)
         self.overlay_window.attributes("-transparentcolor","white")
 
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        self.overlay_window.geometry(f"{screen_width}x{screen_height}+0+0")
+        self.overlay_window.geometry(self._geometry())
 
         self.canvas = tk.Canvas(self.overlay_window, bg="white", highlightthickness=0)
-        self.canvas.pack(fill='both', expan=True)
+        self.canvas.pack(fill='both', expand=True)
+        self.drawn_rects = {}
+
+    def update_or_create_overlay(self, areas: BoxSet):
+        # schedules a draw of these boxes; a newer update before it runs replaces them
+        if self._pending is not None:
+            self.updates_coalesced += 1
+            metrics.inc('overlay.coalesced')
+        self._pending = BoxSet.from_areas(areas)
+        if self._flush_id is None:
+            self._flush_id = self.root.after_idle(self._flush)
 
-    def update_or_create_overlay(self, areas: List[DistractionArea]):
-        # clears old distraction boxes and draws new ones.
+    def _flush(self):
+        self._flush_id = None
+        areas, self._pending = self._pending, None
+        if areas is None:
+            return
+        start = time.perf_counter()
         if not self.overlay_window or not self.overlay_window.winfo_exists():
             self._create_window()
+        self.last_changes = self._reconcile(areas)
+        if len(areas):
+            self.show()
+        else:
+            self._withdraw()
+        self.last_draw_seconds = time.perf_counter() - start
+        self.draw_seconds += self.last_draw_seconds
+        self.updates_drawn += 1
+        metrics.observe('overlay.draw', self.last_draw_seconds)
 
-        for rect in self.drawn_rects:
-            self.canvas.delete(rect)
-        self.drawn_rects.clear()
+    def _reconcile(self, areas: BoxSet) -> tuple[int, int, int]:
+        """Brings the canvas in line with `areas`. Returns how many items were (created, moved, deleted)."""
+        ox, oy = self.screen_bbox[:2] if self.screen_bbox else (0, 0)
+        boxes = areas.translate(-ox, -oy)
+        rects = zip(boxes.x.tolist(), boxes.y.tolist(), boxes.right.tolist(), boxes.bottom.tolist())
+        wanted = list(zip(rects, boxes.texts))
 
-        for area in areas:
-            rect_id = self.canvas.create_rectangle(
-                area.x, area.y, area.x + area.width, area.y + area.height,
-                fill='black', outline='red', width=1
-            )
-            self.drawn_rects.append(rect_id)
+        # boxes drawn at exactly the same place stay untouched
+        by_rect = {}
+        for item, (rect, _) in self.drawn_rects.items():
+            by_rect.setdefault(rect, []).append(item)
+        kept, unmatched = set(), []
+        for rect, text in wanted:
+            items = by_rect.get(rect)
+            if items:
+                kept.add(items.pop())
+            else:
+                unmatched.append((rect, text))
 
-        if areas:
-            self.show()
-        else:
-            self.hide()
+        # a leftover box with the same text has moved (scroll, window drag)
+        by_text = {}
+        for item, (_, text) in self.drawn_rects.items():
+            if item not in kept:
+                by_text.setdefault(text, []).append(item)
+        created = moved = 0
+        for rect, text in unmatched:
+            items = by_text.get(text)
+            if items:
+                item = items.pop()
+                self.canvas.coords(item, *rect)
+                moved += 1
+            else:
+                item = self.canvas.create_rectangle(*rect, fill='black', outline='red', width=1)
+                created += 1
+            self.drawn_rects[item] = (rect, text)
+
+        deleted = 0
+        for items in by_text.values():
+            for item in items:
+                self.canvas.delete(item)
+                del self.drawn_rects[item]
+                deleted += 1
+        return created, moved, deleted
+
+    @property
+    def mean_draw_ms(self) -> float:
+        return self.draw_seconds / self.updates_drawn * 1000 if self.updates_drawn else 0.0
 
     def show(self):
         if self.overlay_window and self.overlay_window.winfo_exists():
             self.overlay_window.deiconify()
 
     def hide(self):
+        # drops any update still waiting, so a stopped monitor can't bring the boxes back
+        if self._flush_id is not None:
+            self.root.after_cancel(self._flush_id)
+            self._flush_id = None
+        self._pending = None
+        self._withdraw()
+
+    def _withdraw(self):
         if self.overlay_window and self.overlay_window.winfo_exists():
             self.overlay_window.withdraw()
 
     def destroy(self):
+        self.hide()
         if self.overlay_window and self.overlay_window.winfo_exists():
             self.overlay_window.destroy()
         self.overlay_window = None
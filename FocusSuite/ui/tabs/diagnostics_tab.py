@@ -0,0 +1,91 @@
+# diagnostics_tab.py
+
+import tkinter as tk
+from tkinter import ttk
+
+REFRESH_MS = 1000
+
+class DiagnosticsTab(ttk.Frame):
+    """Live stage timings and counters, metric export and the opt-in profiling tools."""
+    def __init__(self, parent, callbacks):
+        super().__init__(parent, padding=10)
+        self.callbacks = callbacks
+        self.profiler_var = tk.BooleanVar(value=False)
+        self.memory_var = tk.BooleanVar(value=False)
+
+        self.timings_tree = None
+        self.counters_tree = None
+        self.status_label = None
+
+        self._setup_widgets()
+        self.after(REFRESH_MS, self._refresh)
+
+    def _setup_widgets(self):
+        timings_frame = ttk.LabelFrame(self, text="Stage timings (ms, quantiles over recent samples)", padding=10)
+        timings_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        columns = ('count', 'mean', 'p50', 'p90', 'p99', 'max')
+        self.timings_tree = ttk.Treeview(timings_frame, columns=columns, height=12)
+        self.timings_tree.heading('#0', text="Stage")
+        self.timings_tree.column('#0', width=200)
+        for column in columns:
+            self.timings_tree.heading(column, text=column)
+            self.timings_tree.column(column, width=70, anchor='e')
+        self.timings_tree.pack(fill='both', expand=True)
+
+        counters_frame = ttk.LabelFrame(self, text="Counters", padding=10)
+        counters_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        self.counters_tree = ttk.Treeview(counters_frame, columns=('value',), height=8)
+        self.counters_tree.heading('#0', text="Counter")
+        self.counters_tree.column('#0', width=200)
+        self.counters_tree.heading('value', text="value")
+        self.counters_tree.column('value', width=100, anchor='e')
+        self.counters_tree.pack(fill='both', expand=True)
+
+        controls = ttk.Frame(self)
+        controls.pack(fill='x', padx=5, pady=5)
+        ttk.Button(controls, text="Export JSON + Prometheus", command=self._export).pack(side='left')
+        ttk.Button(controls, text="Reset", command=self.callbacks['reset_metrics']).pack(side='left', padx=5)
+        ttk.Checkbutton(controls, text="Sampling profiler", variable=self.profiler_var,
+                        command=lambda: self._show_status(self.callbacks['toggle_profiler'](self.profiler_var.get()))
+                        ).pack(side='left', padx=10)
+        ttk.Checkbutton(controls, text="Trace allocations", variable=self.memory_var,
+                        command=lambda: self._show_status(self.callbacks['toggle_memory_trace'](self.memory_var.get()))
+                        ).pack(side='left')
+        ttk.Button(controls, text="Memory snapshot",
+                   command=lambda: self._show_status(self.callbacks['memory_snapshot']())).pack(side='left', padx=5)
+
+        self.status_label = ttk.Label(self, text="", wraplength=600)
+        self.status_label.pack(fill='x', padx=5)
+
+    def _export(self):
+        self._show_status(self.callbacks['export_metrics']())
+
+    def _show_status(self, text):
+        if text:
+            self.status_label.config(text=text)
+
+    def _refresh(self):
+        # only redrawn while the tab is on screen
+        if self.winfo_ismapped():
+            snapshot = self.callbacks['get_metrics']()
+            for name, stats in snapshot['histograms'].items():
+                values = [stats['count']] + [f"{stats[key] * 1000:.1f}" for key in ('mean', 'p50', 'p90', 'p99', 'max')]
+                self._set_row(self.timings_tree, name, values)
+            for name, value in snapshot['counters'].items():
+                self._set_row(self.counters_tree, name, [f"{value:,}"])
+            self._drop_missing(self.timings_tree, snapshot['histograms'])
+            self._drop_missing(self.counters_tree, snapshot['counters'])
+        self.after(REFRESH_MS, self._refresh)
+
+    @staticmethod
+    def _set_row(tree, name, values):
+        if tree.exists(name):
+            tree.item(name, values=values)
+        else:
+            tree.insert('', 'end', iid=name, text=name, values=values)
+
+    @staticmethod
+    def _drop_missing(tree, names):
+        stale = [iid for iid in tree.get_children() if iid not in names]
+        if stale:
+            tree.delete(*stale)
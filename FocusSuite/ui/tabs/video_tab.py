@@ -1,6 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 
+STAGE_TITLES = {
+    'extract': "Step 1/4: Extracting frames",
+    'analyze': "Step 2/4: Analyzing frames",
+    'rebuild': "Step 3/4: Rebuilding video",
+    'finalize': "Step 4/4: Adding audio",
+    'done': "Done",
+    'error': "Failed",
+}
+
 class VideoTab(ttk.Frame):
     def __init__(self,parent,callbacks):
         super().__init__(parent,padding=10)
@@ -42,15 +51,45 @@ class VideoTab(ttk.Frame):
         progress_frame.grid(row=3, column=0,padx=(0,10), pady=10, sticky="nsew")
         self.rowconfigure(3,weight=1)
         progress_frame.columnconfigure(0,weight = 1)
-        progress_frame.rowconfigure(0,weight=1)
+        progress_frame.rowconfigure(2,weight=1)
+
+        self.video_progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
+        self.video_progress_bar.grid(row=0, column=0, sticky="ew")
+        self.video_progress_label = ttk.Label(progress_frame, text="Idle.")
+        self.video_progress_label.grid(row=1, column=0, pady=(5,5), sticky="w")
 
         self.video_log_text = scrolledtext.ScrolledText(progress_frame, height=8, state='disabled', wrap=tk.WORD)
 
-        self.video_log_text.grid(row=0, column=0, sticky="nsew")
+        self.video_log_text.grid(row=2, column=0, sticky="nsew")
+
+    def reset_progress(self):
+        self.video_progress_bar['value'] = 0
+        self.video_progress_label.config(text="Starting...")
+
+    def update_progress(self, event):
+        """Shows a ProgressEvent: the bar tracks the current stage, the label its counts, rate and ETA."""
+        parts = [STAGE_TITLES.get(event.stage, event.stage)]
+        if event.fraction is not None:
+            self.video_progress_bar['value'] = event.fraction * 100
+            parts.append(f"{event.done}/{event.total}")
+        elif event.stage == 'done':
+            self.video_progress_bar['value'] = 100
+        if event.rate is not None:
+            parts.append(f"{event.rate:.1f}/s")
+        if event.eta is not None:
+            minutes, seconds = divmod(int(event.eta), 60)
+            parts.append(f"ETA {minutes}:{seconds:02d}")
+        if event.api_calls:
+            parts.append(f"{event.api_calls} API calls")
+        if event.bytes:
+            parts.append(f"{event.bytes / 1e6:.1f} MB")
+        self.video_progress_label.config(text="  |  ".join(parts))
 
     def append_video_log(self,message: str):
+        self.append_video_log_lines([message])
+
+    def append_video_log_lines(self, messages):
         self.video_log_text.config(state='normal')
-        self.video_log_text.insert(tk.END,message + '\n')
+        self.video_log_text.insert(tk.END, "".join(message + '\n' for message in messages))
         self.video_log_text.see(tk.END)
         self.video_log_text.config(state='disabled')
-        self.master.update_idletasks()
@@ -3,11 +3,12 @@ import tkinter as tk
 class Console(tk.Text):
     """
     A Custom Text Widget for logging, with support for color-coded 
-    log levels.
+    log levels. Keeps at most `max_lines` lines, dropping the oldest.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_lines=2000, **kwargs):
         super().__init__(*args, **kwargs)
+        self.max_lines = max_lines
         self.tag_configure("info",foreground="#00BFFF")
         self.tag_configure("debug", foreground="#A9A9A9")
         self.tag_configure("warning", foreground="#FFA500")
@@ -19,6 +20,16 @@ class Console(tk.Text):
         Inserts a new message into the console with the 
         appropriate tag.
         """
-        self.insert('end',f"{message}\n", level)
-        self.see('end')
+        self.log_batch([(message, level)])
 
+    def log_batch(self, entries):
+        """Inserts several (message, level) entries with one trim and one scroll."""
+        entries = entries[-self.max_lines:]
+        args = []
+        for message, level in entries:
+            args.extend((f"{message}\n", level))
+        self.insert('end', *args)
+        lines = int(self.index('end-1c').split('.')[0]) - 1
+        if lines > self.max_lines:
+            self.delete('1.0', f"{lines - self.max_lines + 1}.0")
+        self.see('end')
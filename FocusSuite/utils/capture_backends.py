@@ -0,0 +1,368 @@
+"""
+Screen-capture backends for the focus monitor. Each backend reports the active
+window and grabs a region of the screen; the monitor doesn't care whether the
+pixels come from GDI, X11 or a recording on disk.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from PIL import Image, ImageGrab
+
+from core.models import WindowInfo
+from utils import windows_utils
+from utils.constants import OVERLAY_TITLE
+
+logger = logging.getLogger(__name__)
+
+try:
+    import mss
+    HAS_MSS = True
+except ImportError:
+    HAS_MSS = False
+
+try:
+    from Xlib import X, display as xdisplay
+    HAS_XLIB = True
+except ImportError:
+    HAS_XLIB = False
+
+REPLAY_MANIFEST = "manifest.jsonl"
+REPLAY_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def matches_whitelist(title: str, whitelist: list) -> bool:
+    #Checks if a window title matches any item in the whitelist
+    if not title or not whitelist:
+        return False
+    title = title.lower()
+    return any(item and item.lower() in title for item in whitelist)
+
+
+class CaptureBackend(ABC):
+    """Base class; subclasses implement `get_active_window` and `_grab`."""
+    name = "base"
+
+    def __init__(self):
+        self.frames_grabbed = 0
+        self.grab_seconds = 0.0
+        self.last_grab_seconds = 0.0
+
+    @abstractmethod
+    def get_active_window(self) -> WindowInfo | None:
+        ...
+
+    def list_windows(self) -> list[WindowInfo]:
+        """
+        Visible windows across all monitors, topmost first, with the foreground
+        window leading. Backends that can't enumerate report the active window only.
+        """
+        window = self.get_active_window()
+        return [window] if window is not None else []
+
+    def screen_bbox(self) -> tuple | None:
+        """The (x1, y1, x2, y2) bbox spanning every monitor, or None if unknown."""
+        return None
+
+    def grab(self, bbox: tuple) -> Image.Image:
+        """Grabs the (x1, y1, x2, y2) region and records how long it took."""
+        start = time.perf_counter()
+        image = self._grab(bbox)
+        self.last_grab_seconds = time.perf_counter() - start
+        self.grab_seconds += self.last_grab_seconds
+        self.frames_grabbed += 1
+        return image
+
+    @abstractmethod
+    def _grab(self, bbox: tuple) -> Image.Image:
+        ...
+
+    @property
+    def mean_grab_ms(self) -> float:
+        return self.grab_seconds / self.frames_grabbed * 1000 if self.frames_grabbed else 0.0
+
+    def close(self):
+        pass
+
+
+class PILCaptureBackend(CaptureBackend):
+    """The original path: pywin32 for the window, PIL.ImageGrab for the pixels."""
+    name = "pil"
+
+    def get_active_window(self) -> WindowInfo | None:
+        return windows_utils.get_active_window()
+
+    def list_windows(self) -> list[WindowInfo]:
+        if not windows_utils.IS_WINDOWS:
+            return super().list_windows()
+        return [w for w in windows_utils.list_visible_windows() if w.title != OVERLAY_TITLE]
+
+    def screen_bbox(self) -> tuple | None:
+        return windows_utils.get_virtual_screen_bbox()
+
+    def _grab(self, bbox: tuple) -> Image.Image:
+        # all_screens lets bboxes on secondary monitors (even at negative coordinates) be grabbed
+        return ImageGrab.grab(bbox=bbox, all_screens=True)
+
+
+class X11CaptureBackend(CaptureBackend):
+    """
+    Linux/X11 capture through mss (XGetImage/XShm, no PNG round trip) with the
+    active window geometry read from the EWMH `_NET_ACTIVE_WINDOW` property.
+    Without python-xlib the whole virtual screen is treated as the active window.
+    """
+    name = "x11"
+
+    def __init__(self):
+        super().__init__()
+        if not HAS_MSS:
+            raise RuntimeError("'mss' is not installed.")
+        # mss handles are bound to the thread that created them
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._display = None
+        if HAS_XLIB:
+            try:
+                self._display = xdisplay.Display()
+                self._root = self._display.screen().root
+                self._atoms = {
+                    name: self._display.intern_atom(name)
+                    for name in ('_NET_ACTIVE_WINDOW', '_NET_CLIENT_LIST_STACKING', '_NET_WM_NAME', '_NET_WM_STATE',
+                             '_NET_WM_STATE_HIDDEN', 'UTF8_STRING')
+                }
+            except Exception as e:
+                logger.warning(f"Could not open X display for window detection: {e}")
+                self._display = None
+        else:
+            logger.warning("'python-xlib' not found. The whole screen will be treated as the active window.")
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    def _screen_bbox(self) -> tuple:
+        mon = self._sct().monitors[0]
+        return mon['left'], mon['top'], mon['left'] + mon['width'], mon['top'] + mon['height']
+
+    def screen_bbox(self) -> tuple | None:
+        return self._screen_bbox()
+
+    def _active_handle(self) -> int | None:
+        prop = self._root.get_full_property(self._atoms['_NET_ACTIVE_WINDOW'], X.AnyPropertyType)
+        if not prop or not prop.value or not prop.value[0]:
+            return None
+        return prop.value[0]
+
+    def _window_info(self, handle: int) -> WindowInfo | None:
+        # caller holds self._lock
+        window = self._display.create_resource_object('window', handle)
+        geometry = window.get_geometry()
+        origin = self._root.translate_coords(window, 0, 0)
+        name = window.get_full_property(self._atoms['_NET_WM_NAME'], self._atoms['UTF8_STRING'])
+        if name and name.value:
+            title = name.value.decode('utf-8', 'replace') if isinstance(name.value, bytes) else str(name.value)
+        else:
+            title = window.get_wm_name() or ""
+        bbox = self._clip((origin.x, origin.y, origin.x + geometry.width, origin.y + geometry.height))
+        if bbox is None:
+            return None
+        return WindowInfo(title, bbox, handle)
+
+    def get_active_window(self) -> WindowInfo | None:
+        if self._display is None:
+            return WindowInfo("", self._screen_bbox())
+        try:
+            with self._lock:
+                handle = self._active_handle()
+                return self._window_info(handle) if handle else None
+        except Exception as e:
+            logger.warning(f"Could not get active X11 window: {e}")
+            return None
+
+    def list_windows(self) -> list[WindowInfo]:
+        if self._display is None:
+            return super().list_windows()
+        windows = []
+        try:
+            with self._lock:
+                active = self._active_handle()
+                stacking = self._root.get_full_property(self._atoms['_NET_CLIENT_LIST_STACKING'], X.AnyPropertyType)
+                # the stacking list runs bottom to top
+                for handle in reversed(stacking.value if stacking else []):
+                    window = self._display.create_resource_object('window', handle)
+                    state = window.get_full_property(self._atoms['_NET_WM_STATE'], X.AnyPropertyType)
+                    if state and self._atoms['_NET_WM_STATE_HIDDEN'] in state.value:
+                        continue
+                    info = self._window_info(handle)
+                    if info is not None and info.title and info.title != OVERLAY_TITLE:
+                        windows.append(info)
+        except Exception as e:
+            logger.warning(f"Could not list X11 windows: {e}")
+            return super().list_windows()
+        windows.sort(key=lambda w: w.handle != active)
+        return windows
+
+    def _clip(self, bbox: tuple) -> tuple | None:
+        sx1, sy1, sx2, sy2 = self._screen_bbox()
+        x1, y1, x2, y2 = max(bbox[0], sx1), max(bbox[1], sy1), min(bbox[2], sx2), min(bbox[3], sy2)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def _grab(self, bbox: tuple) -> Image.Image:
+        region = {'left': bbox[0], 'top': bbox[1], 'width': bbox[2] - bbox[0], 'height': bbox[3] - bbox[1]}
+        shot = self._sct().grab(region)
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def close(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+        if self._display is not None:
+            self._display.close()
+            self._display = None
+
+
+class ReplayCaptureBackend(CaptureBackend):
+    """
+    Plays back a recorded frame sequence from a directory. With a
+    `manifest.jsonl` (one {"t", "file", "bbox", "title"} object per line) the
+    recorded window geometry and titles are replayed; otherwise every image in
+    the directory is one full-window frame in name order.
+
+    By default every `get_active_window` call (one capture tick) advances one
+    frame, which keeps benchmark runs deterministic. With `realtime=True` the
+    frame shown is chosen by the recorded timestamps instead.
+
+    For multi-window replays an entry's image is the whole screen, `screen` its
+    bbox and `windows` the visible windows ({"title", "bbox", "handle"}), topmost first.
+    """
+    name = "replay"
+
+    def __init__(self, path: str, realtime: bool = False, loop: bool = False):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.entries = self._load_entries(path)
+        if not self.entries:
+            raise RuntimeError(f"No replay frames found in {path}")
+        self._cursor = 0
+        self._current = None
+        self._started_at = None
+        self._cache = {}
+
+    @staticmethod
+    def _load_entries(path: str) -> list[dict]:
+        manifest = os.path.join(path, REPLAY_MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, 'r') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        files = sorted(f for f in os.listdir(path) if f.lower().endswith(REPLAY_IMAGE_EXTENSIONS))
+        return [{'t': float(i), 'file': f} for i, f in enumerate(files)]
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.loop and self._cursor >= len(self.entries)
+
+    def _advance(self) -> dict | None:
+        # picks the frame for this capture tick
+        if self.realtime:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            elapsed = time.monotonic() - self._started_at + self.entries[0]['t']
+            index = self._cursor
+            while index < len(self.entries) and self.entries[index]['t'] <= elapsed:
+                index += 1
+            self._cursor = index
+            index -= 1
+            if index == len(self.entries) - 1 and elapsed > self.entries[-1]['t'] + 1:
+                index = len(self.entries)
+        else:
+            index = self._cursor
+            self._cursor += 1
+
+        if index >= len(self.entries):
+            if not self.loop:
+                self._current = None
+                return None
+            self._cursor = 0
+            self._started_at = None
+            return self._advance()
+        self._current = self.entries[max(index, 0)]
+        return self._current
+
+    def _image(self, entry: dict) -> Image.Image:
+        image = self._cache.get(entry['file'])
+        if image is None:
+            with Image.open(os.path.join(self.path, entry['file'])) as f:
+                image = f.convert('RGB')
+            # consecutive duplicate frames are common in recordings; keep only the latest decode
+            self._cache = {entry['file']: image}
+        return image
+
+    def _entry_window(self, entry: dict) -> WindowInfo:
+        bbox = entry.get('bbox')
+        if bbox is None:
+            width, height = self._image(entry).size
+            bbox = (0, 0, width, height)
+        return WindowInfo(entry.get('title', ""), tuple(bbox), entry.get('handle'))
+
+    def get_active_window(self) -> WindowInfo | None:
+        entry = self._advance()
+        if entry is None:
+            return None
+        if entry.get('windows'):
+            first = entry['windows'][0]
+            return WindowInfo(first.get('title', ""), tuple(first['bbox']), first.get('handle'))
+        return self._entry_window(entry)
+
+    def list_windows(self) -> list[WindowInfo]:
+        entry = self._advance()
+        if entry is None:
+            return []
+        if 'windows' not in entry:
+            return [self._entry_window(entry)]
+        return [WindowInfo(w.get('title', ""), tuple(w['bbox']), w.get('handle')) for w in entry['windows']]
+
+    def screen_bbox(self) -> tuple | None:
+        if self._current is not None and self._current.get('screen'):
+            return tuple(self._current['screen'])
+        return None
+
+    def _grab(self, bbox: tuple) -> Image.Image:
+        if self._current is None:
+            raise RuntimeError("Replay finished.")
+        image = self._image(self._current)
+        screen = self._current.get('screen')
+        if screen and tuple(bbox) != tuple(screen):
+            return image.crop((bbox[0] - screen[0], bbox[1] - screen[1], bbox[2] - screen[0], bbox[3] - screen[1]))
+        return image
+
+
+def create_capture_backend(config, log: logging.Logger = logger) -> CaptureBackend:
+    """
+    Builds the backend named by the 'capture_backend' setting ('auto', 'pil',
+    'x11' or 'replay'). 'auto' prefers mss on Linux and PIL elsewhere.
+    """
+    choice = config.get('capture_backend', 'auto')
+    if choice == 'replay':
+        return ReplayCaptureBackend(
+            config.get('replay_path', ''),
+            realtime=config.get('replay_realtime', False),
+            loop=config.get('replay_loop', False),
+        )
+    if choice == 'x11' or (choice == 'auto' and sys.platform.startswith('linux') and HAS_MSS):
+        try:
+            return X11CaptureBackend()
+        except Exception as e:
+            log.warning(f"X11 capture backend unavailable, falling back to PIL: {e}")
+    return PILCaptureBackend()
@@ -2,6 +2,10 @@ APP_VERSION = "2.0.0"
 UPDATE_CHECK_URL = "githubrepo"
 SETTINGS_FILE = 'settings.json'
 LOG_FILE = 'app.log'
+# metric exports, profiles and memory snapshots
+DIAGNOSTICS_DIR = 'diagnostics'
+# title of the overlay window, so window enumeration can skip it
+OVERLAY_TITLE = 'FocusSuite Overlay'
 
 # Adjust this path if Tesseract is installed elsewhere
 TESSERACT_CMD_PATH = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -1,19 +1,104 @@
+import collections
 import logging
 import logging.handlers
-from tkinter import Text
+import queue
+import threading
+import time
+from tkinter import TclError, Text
 from utils.constants import LOG_FILE
 
+# the QueueListener that runs the real handlers off the logging threads, and the root handler feeding it
+_listener = None
+_queue_handler = None
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits noisy call sites: at each limited level, one source line may log at
+    most `burst` records per `interval` seconds. The first record let through
+    after a quiet spell says how many were dropped. Levels without a limit
+    (by default INFO and above) always pass.
+    """
+    def __init__(self, limits: dict | None = None, interval: float = 10.0):
+        super().__init__()
+        self.limits = {logging.DEBUG: 5} if limits is None else limits
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def filter(self, record):
+        burst = self.limits.get(record.levelno)
+        if burst is None:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, count, dropped = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+            if count >= burst:
+                self._windows[key] = (started, count, dropped + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+        if dropped:
+            record.msg = f"{record.getMessage()} [{dropped} similar messages suppressed]"
+            record.args = ()
+        return True
+
+
 class TkinterTextHandler(logging.Handler):
-    # a logging handler that directs records to a tkinter text widget.
-    def __init__(self, text_widget: Text):
+    """
+    A logging handler that directs records to a Console widget. Records are
+    only buffered here; the Tk thread drains the buffer in one batch every
+    `flush_ms`, so a burst of records costs one widget update.
+    """
+    def __init__(self, text_widget: Text, flush_ms: int = 100, max_pending: int = 2000):
         super().__init__()
         self.text_widget = text_widget
+        self.flush_ms = flush_ms
+        # deque appends are thread-safe; when the UI falls behind the oldest lines go first
+        self.pending = collections.deque(maxlen=max_pending)
+        self.dropped = 0
 
     def emit(self, record):
-        msg = self.format(record)
-        self.text_widget.after(0, self.text_widget.log, msg, record.levelname.lower())
+        try:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((self.format(record), record.levelname.lower()))
+        except Exception:
+            self.handleError(record)
+
+    def start(self):
+        # must be called on the Tk thread
+        self.text_widget.after(self.flush_ms, self._flush)
+
+    def _flush(self):
+        dropped, self.dropped = self.dropped, 0
+        entries = []
+        while self.pending:
+            entries.append(self.pending.popleft())
+        if dropped:
+            # the notice takes the place of the oldest line when the buffer is full
+            if len(entries) == self.pending.maxlen:
+                entries.pop(0)
+                dropped += 1
+            entries.insert(0, (f"[{dropped} lines dropped]", 'warning'))
+        try:
+            if entries:
+                self.text_widget.log_batch(entries)
+            self.text_widget.after(self.flush_ms, self._flush)
+        except TclError:
+            pass  # the widget is gone; stop polling
+
+def setup_logging(console_widget=None, max_lines: int = 2000, flush_ms: int = 100,
+                  rate_limits: dict | None = None, rate_interval: float = 10.0):
+    """
+    Configures the root logger. Logging calls only put records on a queue;
+    a listener thread does the formatting and writes the log file and the
+    console buffer. Noisy call sites are rate limited by `RateLimitFilter`.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
 
-def setup_logging(console_widget=None):
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
 
@@ -25,12 +110,34 @@ def setup_logging(console_widget=None):
     )
     file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
 
     if console_widget:
-        console_handler = TkinterTextHandler(console_widget)
+        console_widget.max_lines = max_lines
+        console_handler = TkinterTextHandler(console_widget, flush_ms=flush_ms, max_pending=max_lines)
         console_formatter = logging.Formatter('%(asctime)s - %(message)s', '%H:%M:%S')
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        console_handler.start()
+        handlers.append(console_handler)
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(rate_limits, rate_interval))
+    logger.addHandler(queue_handler)
+    _queue_handler = queue_handler
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
     logging.info("Logging configured.")
+
+def shutdown_logging():
+    """Detaches the queue handler from the root logger, writes out queued records and stops the listener thread."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        # records logged from here on would sit in a queue nobody reads
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
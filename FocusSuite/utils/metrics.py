@@ -0,0 +1,188 @@
+# process-wide stage timings and counters for the hot paths, exportable as JSON and Prometheus text
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Counter:
+    """A monotonically increasing total, e.g. cache hits or bytes uploaded."""
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int | float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """
+    Rolling latency histogram: count and sum cover every sample since the last
+    reset, quantiles and max only the newest `window` samples, so they follow
+    the current behaviour of a long session rather than its average.
+    """
+    def __init__(self, name: str, window: int = 1024):
+        self.name = name
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count, total, recent = self.count, self.sum, sorted(self._recent)
+        result = {'count': count, 'sum': total, 'mean': total / count if count else 0.0,
+                  'max': recent[-1] if recent else 0.0}
+        for q in QUANTILES:
+            result[f'p{round(q * 100)}'] = recent[min(int(q * len(recent)), len(recent) - 1)] if recent else 0.0
+        return result
+
+
+class MetricsRegistry:
+    """
+    Named histograms and counters, created on first use. `span` times a block
+    into the histogram of the same name and keeps the most recent spans, with
+    their thread and enclosing span, as a short trace. Disabled, every call is
+    a no-op apart from a flag check. Snapshots sent from another process
+    (the monitor engine) are merged in with `set_remote`.
+    """
+    def __init__(self, span_history: int = 256):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._spans = deque(maxlen=span_history)
+        self._local = threading.local()
+        self._remote = {}
+        self.started_at = time.time()
+
+    def counter(self, name: str) -> Counter:
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name))
+        return counter
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def inc(self, name: str, amount: int | float = 1):
+        if self.enabled and amount:
+            self.counter(name).inc(amount)
+
+    def observe(self, name: str, seconds: float):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        stack = self._local.__dict__.setdefault('stack', [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            self.histogram(name).observe(elapsed)
+            self._spans.append((time.time() - elapsed, elapsed, name, parent, threading.current_thread().name))
+
+    def recent_spans(self, limit: int = 50) -> list[dict]:
+        spans = list(self._spans)[-limit:]
+        return [{'start': start, 'seconds': seconds, 'name': name, 'parent': parent, 'thread': thread}
+                for start, seconds, name, parent, thread in spans]
+
+    def set_remote(self, source: str, snapshot: dict):
+        """Replaces the latest snapshot received from `source`; its metrics show up in ours."""
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._spans.clear()
+            self._remote.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters, histograms = dict(self._counters), dict(self._histograms)
+            remote = list(self._remote.values())
+        counter_values = {name: counter.value for name, counter in counters.items()}
+        histogram_stats = {name: histogram.snapshot() for name, histogram in histograms.items()}
+        spans = self.recent_spans()
+        for other in remote:
+            for name, value in other['counters'].items():
+                counter_values[name] = counter_values.get(name, 0) + value
+            # quantiles can't be combined; the few stages timed in both processes show the remote numbers
+            histogram_stats.update(other['histograms'])
+            spans += other['spans']
+        return {
+            'started_at': self.started_at,
+            'taken_at': time.time(),
+            'counters': dict(sorted(counter_values.items())),
+            'histograms': dict(sorted(histogram_stats.items())),
+            'spans': sorted(spans, key=lambda s: s['start'])[-50:],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'focussuite') -> str:
+        """Text exposition format: counters as `_total`, histograms as summaries in seconds."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot['counters'].items():
+            metric = _prometheus_name(prefix, name) + '_total'
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, stats in snapshot['histograms'].items():
+            metric = _prometheus_name(prefix, name) + '_seconds'
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {stats[f"p{round(q * 100)}"]:.6f}')
+            lines += [f"{metric}_sum {stats['sum']:.6f}", f"{metric}_count {stats['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str, stem: str = 'metrics') -> tuple[str, str]:
+        """Writes `<stem>.json` and `<stem>.prom` into `directory`, each replaced atomically."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for extension, text in (('json', self.to_json()), ('prom', self.to_prometheus())):
+            path = os.path.join(directory, f"{stem}.{extension}")
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return tuple(paths)
+
+
+def _prometheus_name(prefix: str, name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', f"{prefix}_{name}")
+
+
+# the registry every stage reports to
+metrics = MetricsRegistry()
+span = metrics.span
@@ -0,0 +1,116 @@
+# opt-in tools for long sessions: a sampling profiler and tracemalloc snapshots
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every other thread each `interval` seconds from a
+    daemon thread. Costs nothing while stopped and little while running, as
+    the profiled code is never instrumented. Results are collapsed stacks
+    ("thread;outer;...;inner count"), the input format of flamegraph.pl and
+    speedscope.
+    """
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = 20) -> list[tuple[str, int]]:
+        """Innermost frames by sample count: where the time is actually spent."""
+        leaves = Counter()
+        for stack, count in list(self._stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write(self, path: str) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def reset(self):
+        self._stacks.clear()
+        self.samples = 0
+
+
+class MemoryTracer:
+    """
+    Toggles tracemalloc. Each snapshot is written as the top allocation sites
+    plus their growth since the previous snapshot, which is what finds a leak
+    in a session that has run for hours.
+    """
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._previous = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, path: str, limit: int = 30) -> str:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# {time.strftime('%Y-%m-%d %H:%M:%S')}  traced {current / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)\n")
+            f.write("\n## top allocation sites\n")
+            for stat in snapshot.statistics('lineno')[:limit]:
+                f.write(f"{stat}\n")
+            if self._previous is not None:
+                f.write("\n## growth since the previous snapshot\n")
+                for stat in snapshot.compare_to(self._previous, 'lineno')[:limit]:
+                    f.write(f"{stat}\n")
+        self._previous = snapshot
+        return path
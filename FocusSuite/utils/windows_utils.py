@@ -3,11 +3,15 @@ Contains Windows-specific utility functions using the pywin32
 library. This isolates platform-dependent code.
 """
 
+import ctypes
 import logging
 
+from core.models import WindowInfo
+
 logger = logging.getLogger(__name__)
 
 try:
+    import win32api
     import win32gui
     IS_WINDOWS = True
 except ImportError:
@@ -29,6 +33,81 @@ def get_active_window_bbox() -> tuple | None:
         return None
 
 
+def get_active_window() -> WindowInfo | None:
+    #Gets the title, bounding box and handle of the active window
+    if not IS_WINDOWS:
+        return None
+    try:
+        hwnd = win32gui.GetForegroundWindow()
+        title = win32gui.GetWindowText(hwnd)
+        if title in ["Program Manager",""]:
+            return None
+        return WindowInfo(title, win32gui.GetWindowRect(hwnd), hwnd)
+    except Exception as e:
+        logger.warning(f"Could not get active window: {e}")
+        return None
+
+
+GWL_EXSTYLE = -20
+WS_EX_TOOLWINDOW = 0x80
+DWMWA_CLOAKED = 14
+
+
+def is_cloaked(hwnd) -> bool:
+    #Windows on another virtual desktop and suspended UWP apps are 'visible' but cloaked by DWM
+    cloaked = ctypes.c_uint(0)
+    try:
+        result = ctypes.windll.dwmapi.DwmGetWindowAttribute(
+            hwnd, DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked)
+        )
+    except (AttributeError, OSError):
+        return False
+    return result == 0 and cloaked.value != 0
+
+
+def list_visible_windows() -> list[WindowInfo]:
+    #Lists visible, non-minimized top-level windows in z-order, topmost first, with the foreground window leading
+    if not IS_WINDOWS:
+        return []
+    windows = []
+
+    def collect(hwnd, _):
+        if not win32gui.IsWindowVisible(hwnd) or win32gui.IsIconic(hwnd):
+            return True
+        #Tool windows (floating palettes, tray popups) and cloaked windows are not on screen as apps
+        if win32gui.GetWindowLong(hwnd, GWL_EXSTYLE) & WS_EX_TOOLWINDOW or is_cloaked(hwnd):
+            return True
+        title = win32gui.GetWindowText(hwnd)
+        if title in ["Program Manager", ""]:
+            return True
+        x1, y1, x2, y2 = win32gui.GetWindowRect(hwnd)
+        if x2 > x1 and y2 > y1:
+            windows.append(WindowInfo(title, (x1, y1, x2, y2), hwnd))
+        return True
+
+    try:
+        win32gui.EnumWindows(collect, None)
+        foreground = win32gui.GetForegroundWindow()
+    except Exception as e:
+        logger.warning(f"Could not enumerate windows: {e}")
+        return []
+    windows.sort(key=lambda w: w.handle != foreground)
+    return windows
+
+
+def get_virtual_screen_bbox() -> tuple | None:
+    #Gets the bounding box (x1,y1,x2,y2) spanning all monitors
+    if not IS_WINDOWS:
+        return None
+    try:
+        # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN
+        x, y, w, h = (win32api.GetSystemMetrics(i) for i in (76, 77, 78, 79))
+        return x, y, x + w, y + h
+    except Exception as e:
+        logger.warning(f"Could not get virtual screen size: {e}")
+        return None
+
+
 def is_whitelisted(whitelist: list) -> bool:
     #Checks if the active window's title matches any item in the whitelist
     if not IS_WINDOWS or not whitelist: